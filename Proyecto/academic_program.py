@@ -16,12 +16,15 @@ Uso:
 
 Ejemplo:
     python academic_program.py "IngSoftware" 2025-2 3 1 tcp://10.43.103.58:6000 1
+
+Con CLASSROOM_WIRE=bin la solicitud viaja en formato binario compacto (wire).
 """
 import zmq
-import json
 import sys
 import time
 
+import wire
+
 # Importar la función necesaria de datastore.py
 # Esto asume que datastore.py está en el mismo directorio o en el PYTHONPATH.
 try:
@@ -45,6 +48,7 @@ OUTCOME_MAP = {
     "DENIED": 2.0,
     "CANCELED": 3.0,
     "TIMEOUT": 4.0,
+    "BUSY": 5.0, # Servidor saturado (control de admisión)
     "INVALID_RESPONSE": -2.0, # Añadido para respuesta JSON inválida
     "UNKNOWN": 0.0,
     "NO_RESPONSE": -1.0,
@@ -84,20 +88,20 @@ def main():
     print("🚀 ENVIANDO SOLICITUD…")
     
     t_start_total = time.perf_counter_ns()
-    sock.send_json(req)
+    sock.send(wire.encode(req))
     
     res = None
     status_final_str = "NO_RESPONSE" 
 
     try:
-        res_raw = sock.recv_json() # Guardar la respuesta parseada
+        res_raw = wire.decode(sock.recv()) # Guardar la respuesta parseada (JSON o binario)
         status_final_str = res_raw.get('status', 'UNKNOWN') 
         res = res_raw # Asignar a res si el parseo fue exitoso
     except zmq.Again:
         print("⚠️  Timeout: la facultad no respondió.")
         status_final_str = "TIMEOUT" 
-    except json.JSONDecodeError:
-        print("⚠️  Error: Respuesta recibida no es un JSON válido.")
+    except (ValueError, UnicodeDecodeError):
+        print("⚠️  Error: Respuesta recibida no es un mensaje válido.")
         status_final_str = "INVALID_RESPONSE"
     finally:
         t_end_total = time.perf_counter_ns()
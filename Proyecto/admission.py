@@ -0,0 +1,146 @@
+"""
+Admission · Control de admisión y descarte de carga en el frontend
+==================================================================
+• HWM: el ROUTER frontend usa FRONTEND_HWM (envío y recepción) y el backend
+  (DEALER del proxy y sockets de workers/parsers) BACKEND_HWM por worker, así
+  la cola interna queda acotada.
+• proxy() reemplaza a zmq.proxy: reenvía al backend con NOBLOCK. Si la cola
+  del backend está llena (zmq.Again), una SOL se responde al instante con
+  RES BUSY; un ACK espera lugar, porque completa una TX ya admitida. Los
+  ACK en espera se guardan en el proxy y se reintentan cuando el backend
+  tiene lugar (POLLOUT), así el proxy sigue reenviando RES mientras tanto.
+  Con FRONTEND_HWM ACK en espera deja de leer el frontend.
+• MAX_INFLIGHT: tope de transacciones abiertas (reserva esperando ACK + SOL
+  en cola, según el motor). Alcanzado el tope, también se responde BUSY a
+  cada SOL nueva, antes de que llegue a un worker.
+• El mensaje sólo se decodifica cuando hay que descartar: con carga normal
+  el proxy no mira el payload.
+• Descartes: contadores en memoria (stats()) y, cada REPORT_S s con
+  descartes, las métricas shed_inflight / shed_queue (dst="admission").
+"""
+
+import threading, time
+from collections import deque
+
+import zmq
+
+from applog import LOG
+from datastore import record_event_metric
+
+FRONTEND_HWM = 1000    # mensajes por par en el ROUTER frontend
+BACKEND_HWM  = 100     # mensajes encolados por worker/parser en el backend
+MAX_INFLIGHT = 1000    # transacciones abiertas; 0 = sin tope
+REPORT_S     = 1.0
+BUSY_REASON  = "Servidor saturado, reintente más tarde"
+
+
+def set_hwm(sock: zmq.Socket, hwm: int):
+    sock.setsockopt(zmq.SNDHWM, hwm)
+    sock.setsockopt(zmq.RCVHWM, hwm)
+
+
+class Admission:
+    """
+    `inflight()` devuelve las transacciones abiertas del motor; `wire` es el
+    Negotiator del servidor (la RES BUSY va en el formato de la facultad).
+    """
+
+    def __init__(self, inflight, wire, src: str, max_inflight: int = None):
+        self.inflight, self.wire, self.src = inflight, wire, src
+        self.max_inflight = MAX_INFLIGHT if max_inflight is None else max_inflight
+        self._lock = threading.Lock()
+        self._stats = {"shed_inflight": 0, "shed_queue": 0}
+        self._unreported = {"shed_inflight": 0, "shed_queue": 0}
+        self._next_report = time.monotonic() + REPORT_S
+
+    def saturated(self) -> bool:
+        return 0 < self.max_inflight <= self.inflight()
+
+    def admit(self, frames: list) -> list | None:
+        """None si el mensaje pasa; si no, los frames de la RES BUSY."""
+        if not self.saturated():
+            return None
+        return self.reject(frames, "shed_inflight")
+
+    def reject(self, frames: list, kind: str) -> list | None:
+        """Frames de la RES BUSY si `frames` trae una SOL; None para el resto (ACK, ilegibles)."""
+        if len(frames) != 3:
+            return None
+        ident, _, payload = frames
+        try:
+            msg = self.wire.decode(ident, payload)
+        except (ValueError, UnicodeDecodeError):
+            return None                                 # lo informa el worker
+        if not isinstance(msg, dict) or msg.get("tipo") != "SOL":
+            return None
+        return self.busy(ident, msg.get("transaction_id"), kind)
+
+    def busy(self, ident: bytes, tx_id, kind: str) -> list:
+        with self._lock:
+            self._stats[kind] += 1
+            self._unreported[kind] += 1
+        res = {"tipo": "RES", "status": "BUSY", "reason": BUSY_REASON, "transaction_id": tx_id}
+        return [ident, b'', self.wire.encode(ident, res)]
+
+    def tick(self):
+        """Publica los descartes acumulados cada REPORT_S s (llamar seguido, es barato)."""
+        now = time.monotonic()
+        if now < self._next_report:
+            return
+        self._next_report = now + REPORT_S
+        with self._lock:
+            pending, self._unreported = self._unreported, {k: 0 for k in self._unreported}
+        for kind, n in pending.items():
+            if n:
+                record_event_metric(kind, n, self.src, "admission")
+        if any(pending.values()):
+            LOG.warning(f"\n⚠️ WARNING: Admisión: {pending['shed_inflight']} SOL descartadas por tope de TX abiertas, "
+                        f"{pending['shed_queue']} por cola llena (abiertas: {self.inflight()}).")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+def proxy(frontend: zmq.Socket, backend: zmq.Socket, admission: Admission, outbound=()):
+    """
+    Proxy frontend ⇄ backend con admisión. Lo que llega por `outbound`
+    (p. ej. RES del monitor de ACKs) se reenvía al frontend.
+    """
+    poller = zmq.Poller()
+    for sock in (frontend, backend, *outbound):
+        poller.register(sock, zmq.POLLIN)
+    report_ms = int(REPORT_S * 1000)
+    parked: deque = deque()                               # ACK esperando lugar en el backend, en orden
+    try:
+        while True:
+            ready = dict(poller.poll(report_ms))
+            if parked and ready.get(backend, 0) & zmq.POLLOUT:
+                try:
+                    while parked:
+                        backend.send_multipart(parked[0], zmq.NOBLOCK)
+                        parked.popleft()
+                except zmq.Again:
+                    pass
+            if ready.get(frontend, 0) & zmq.POLLIN:
+                frames = frontend.recv_multipart()
+                busy = admission.admit(frames)
+                if busy is None:
+                    try:
+                        if parked:
+                            raise zmq.Again()                 # no adelantar a los ACK en espera
+                        backend.send_multipart(frames, zmq.NOBLOCK)
+                    except zmq.Again:
+                        busy = admission.reject(frames, "shed_queue")
+                        if busy is None:
+                            parked.append(frames)             # ACK: espera lugar en la cola
+                if busy is not None:
+                    frontend.send_multipart(busy)
+            for sock in (backend, *outbound):
+                if ready.get(sock, 0) & zmq.POLLIN:
+                    frontend.send_multipart(sock.recv_multipart())
+            poller.modify(backend, zmq.POLLIN | (zmq.POLLOUT if parked else 0))
+            poller.modify(frontend, zmq.POLLIN if len(parked) < FRONTEND_HWM else 0)
+            admission.tick()
+    except zmq.ZMQError:
+        pass                                              # sockets cerrados por deactivate()
@@ -0,0 +1,132 @@
+"""
+Allocator · Asignación por micro-lotes que maximiza programas completos
+======================================================================
+• Sin lotes, cada SOL se atiende al llegar con min(pedido, libre): bajo
+  contención las primeras se llevan lo que queda y las siguientes reciben
+  propuestas parciales o vacías.
+• plan(): para las SOL de un lote y lo libre, elige qué programas quedan
+  COMPLETOS. Ordena por tamaño (salones + laboratorios; a igual tamaño,
+  menos salones primero) y toma cada SOL que entre. Los laboratorios que
+  falten se cubren con aulas adaptadas (1 aula por lab, como
+  allocate_rooms). Lo que sobra se reparte en orden de llegada con el
+  criterio greedy de siempre (propuestas parciales).
+• BatchAllocator (--alloc-window MS): los workers llaman submit() y
+  esperan su Future. Un hilo junta las SOL que llegan en los `window_ms`
+  siguientes a la primera (o hasta `max_batch`), lee lo libre, aplica plan() y reserva el lote entero
+  con una llamada a allocate_rooms_batch (una transacción). Mismo patrón
+  que group_commit.GroupCommitter.
+• La propuesta coincide con lo reservado: las aulas móviles también se
+  reservan (allocate_* las adapta al faltar laboratorios), y el lote se
+  reserva en el orden en que plan() repartió los laboratorios
+  (allocate_rooms_batch los toma en orden de llegada).
+"""
+
+import queue, threading, time
+from concurrent.futures import Future
+
+from applog import LOG
+
+WINDOW_MS = 0      # >0: ventana de agrupación de SOL (ms); 0 = asignación inmediata
+MAX_BATCH = 64     # SOL por lote como máximo
+
+
+def greedy(requests: list[tuple[int, int]], cls_free: int, lab_free: int) -> list[tuple[int, int, int]]:
+    """Criterio por orden de llegada: (salones, labs, aulas móviles) de cada SOL."""
+    out = []
+    for salones, labs in requests:
+        s_prop, l_prop = min(salones, cls_free), min(labs, lab_free)
+        mob = min(labs - l_prop, cls_free - s_prop)
+        cls_free -= s_prop + mob
+        lab_free -= l_prop
+        out.append((s_prop, l_prop, mob))
+    return out
+
+
+def plan(requests: list[tuple[int, int]], cls_free: int, lab_free: int) -> list[tuple[int, int, int]]:
+    """(salones, labs, aulas móviles) de cada SOL, maximizando las SOL atendidas completas."""
+    return _plan(requests, cls_free, lab_free)[0]
+
+
+def _plan(requests: list[tuple[int, int]], cls_free: int, lab_free: int) -> tuple[list, list[int]]:
+    """plan() y el orden (índices) en que repartió lo libre: completas por tamaño, luego el resto por llegada."""
+    out: list = [None] * len(requests)
+    order = []
+    for i in sorted(range(len(requests)), key=lambda i: (requests[i][0] + requests[i][1], requests[i][0])):
+        salones, labs = requests[i]
+        l_prop = min(labs, lab_free)
+        mob = labs - l_prop
+        if salones + mob <= cls_free:
+            out[i] = (salones, l_prop, mob)
+            order.append(i)
+            cls_free -= salones + mob
+            lab_free -= l_prop
+    rest = [i for i, p in enumerate(out) if p is None]
+    for i, partial in zip(rest, greedy([requests[i] for i in rest], cls_free, lab_free)):
+        out[i] = partial
+    return out, order + rest
+
+
+def proposal(s_prop: int, l_prop: int, mob: int) -> dict:
+    return {"salones_propuestos": s_prop, "laboratorios_propuestos": l_prop, "aulas_moviles": mob}
+
+
+class BatchAllocator:
+    """
+    `free_counts()` → (aulas, labs) libres; `allocate_batch(requests)` es
+    datastore.allocate_rooms_batch. El Future de submit() se resuelve con
+    (propuesta, reservation_id, None) o (propuesta, None, motivo).
+    """
+
+    def __init__(self, free_counts, allocate_batch, window_ms: float = None, max_batch: int = MAX_BATCH):
+        self._free_counts, self._allocate_batch = free_counts, allocate_batch
+        self.window = (WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_batch = max(1, max_batch)
+        self._q: queue.Queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {"batches": 0, "sols": 0, "full": 0}
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, salones: int, labs: int, faculty_id: int, program_id: int) -> Future:
+        fut = Future()
+        self._q.put((salones, labs, faculty_id, program_id, fut))
+        return fut
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    # ──────────────────────────────────────────────────────────
+    def _run(self):
+        while True:
+            group = [self._q.get()]
+            deadline = time.monotonic() + self.window   # la ventana cuenta desde la primera SOL
+            while len(group) < self.max_batch:
+                try:
+                    group.append(self._q.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._solve(group)
+            except Exception as e:
+                LOG.error(f"\n❗ ERROR: Allocator: lote de {len(group)} SOL falló: {e!r}")
+                for *_, fut in group:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+    def _solve(self, group: list):
+        cls_free, lab_free = self._free_counts()
+        plans, order = _plan([(g[0], g[1]) for g in group], cls_free, lab_free)
+        # Mismo orden que plan(): cada SOL recibe los labs reales que el plan le dio
+        ordered = self._allocate_batch([(plans[i][0], plans[i][1] + plans[i][2], group[i][2], group[i][3])
+                                        for i in order])
+        outcomes: list = [None] * len(group)
+        for i, outcome in zip(order, ordered):
+            outcomes[i] = outcome
+        full = sum(p[0] == g[0] and p[1] + p[2] == g[1] for p, g in zip(plans, group))
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["sols"] += len(group)
+            self._stats["full"] += full
+        LOG.debug(f"\n📦 Allocator: lote de {len(group)} SOL ({full} completas; libres: {cls_free} aulas, {lab_free} labs)")
+        for p, g, (res_id, reason) in zip(plans, group, outcomes):
+            g[4].set_result((proposal(*p), res_id, reason))
@@ -0,0 +1,178 @@
+"""
+AppLog · Registro por niveles, asíncrono y con límite de frecuencia
+===================================================================
+• Reemplaza los print(..., flush=True) del camino de cada transacción:
+  LOG.debug/info/warning/error() sólo agregan la línea a un deque; un hilo
+  de fondo lo vacía cada FLUSH_S s (antes si llega un warning/error) y
+  escribe en stdout por lotes (un write + un flush por lote).
+• Niveles: debug (flujo SOL/PROP/ACK/RES de cada TX), info (arranque,
+  activación, failover), warning, error. Se eligen con --log-level o
+  CLASSROOM_LOG_LEVEL (por defecto "info").
+• Anillo en memoria con las últimas RING_SIZE líneas de TODOS los niveles,
+  también las que no se imprimen. dump() lo vuelca con hora y nivel;
+  install_dump_signal() lo hace al recibir SIGUSR1.
+• key="...": eventos repetitivos (p. ej. "TX desconocida") pasan como mucho
+  RATE_BURST veces por RATE_WINDOW s; el resto se descarta (tampoco entra al
+  anillo) y al abrir la siguiente ventana se informa cuántos se suprimieron.
+• Pendientes acotados a QUEUE_MAX: si se llena, la línea se descarta y se
+  cuenta; nunca bloquea.
+• close() (registrado con atexit) drena lo pendiente. Tras un fork el hijo
+  arranca su propio hilo escritor (procpool).
+"""
+
+import atexit, collections, os, signal, sys, tempfile, threading, time
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+_NAMES = {v: k.upper() for k, v in LEVELS.items()}
+
+DEFAULT_LEVEL = os.environ.get("CLASSROOM_LOG_LEVEL", "info")
+RING_SIZE     = int(os.environ.get("CLASSROOM_LOG_RING", "2000"))
+DUMP_DIR      = os.environ.get("CLASSROOM_LOG_DIR", tempfile.gettempdir())
+QUEUE_MAX     = 10_000    # líneas pendientes de escribir
+FLUSH_S       = 0.1       # cada cuánto escribe el hilo de fondo
+BATCH_MAX     = 512       # líneas por write
+RATE_WINDOW   = 1.0       # s
+RATE_BURST    = 5         # eventos con la misma key por ventana
+
+
+class AppLog:
+
+    def __init__(self, level: str = DEFAULT_LEVEL, ring_size: int = RING_SIZE, stream=None):
+        self.level = LEVELS[level]
+        self._stream = stream                     # None → sys.stdout al escribir
+        self.ring: collections.deque = collections.deque(maxlen=ring_size)
+        self._rate: dict[str, list] = {}          # key → [inicio de ventana, admitidos, suprimidos]
+        self._rate_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"written": 0, "batches": 0, "dropped": 0, "suppressed": 0}
+        self._start()
+
+    def _start(self):
+        self._pending: collections.deque = collections.deque()   # append/popleft atómicos: sin lock
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # ──────────────────────────────────────────────────────────
+    def set_level(self, level: str):
+        self.level = LEVELS[level]
+
+    def enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def debug(self, msg: str, key: str = None):
+        self.log(DEBUG, msg, key)
+
+    def info(self, msg: str, key: str = None):
+        self.log(INFO, msg, key)
+
+    def warning(self, msg: str, key: str = None):
+        self.log(WARNING, msg, key)
+
+    def error(self, msg: str, key: str = None):
+        self.log(ERROR, msg, key)
+
+    def log(self, level: int, msg: str, key: str = None):
+        if key is not None:
+            suppressed = self._admit(key)
+            if suppressed is None:
+                return
+            if suppressed:
+                self._emit(level, f"… {suppressed} mensajes '{key}' suprimidos en {RATE_WINDOW:g} s")
+        self._emit(level, msg)
+
+    def _emit(self, level: int, msg: str):
+        self.ring.append((time.time(), level, msg))
+        if level < self.level:
+            return
+        if len(self._pending) >= QUEUE_MAX:
+            self._count("dropped")
+            return
+        self._pending.append(msg)
+        if level >= WARNING:
+            self._wake.set()
+
+    def _admit(self, key: str) -> int | None:
+        """None si se suprime; si no, cuántos se suprimieron en la ventana anterior."""
+        now = time.monotonic()
+        with self._rate_lock:
+            window = self._rate.get(key)
+            if window is None or now - window[0] >= RATE_WINDOW:
+                self._rate[key] = [now, 1, 0]
+                return window[2] if window else 0
+            if window[1] < RATE_BURST:
+                window[1] += 1
+                return 0
+            window[2] += 1
+        self._count("suppressed")
+        return None
+
+    # ──────────────────────────────────────────────────────────
+    def dump(self, path: str = None) -> str:
+        """Vuelca el anillo (hora, nivel, mensaje) a `path`, o a stderr si es None."""
+        lines = [f"{time.strftime('%H:%M:%S', time.localtime(ts))}.{int(ts * 1000) % 1000:03d} "
+                 f"{_NAMES[level]:<7} {msg.strip()}\n" for ts, level, msg in list(self.ring)]
+        if path is None:
+            sys.stderr.writelines(lines)
+            sys.stderr.flush()
+            return "<stderr>"
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        return path
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {**self._stats, "queued": len(self._pending), "ring": len(self.ring)}
+
+    def close(self, timeout: float = 2.0):
+        """Detiene el hilo tras escribir todo lo que quede en la cola."""
+        self._closed.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    # ──────────────────────────────────────────────────────────
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def _run(self):
+        while True:
+            closed = self._closed.is_set()
+            self._wake.wait(FLUSH_S)
+            self._wake.clear()
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(BATCH_MAX, len(self._pending)))]
+                self._write(batch)
+            if closed:
+                return
+
+    def _write(self, batch: list[str]):
+        stream = self._stream or sys.stdout
+        try:
+            stream.write("\n".join(batch) + "\n")
+            stream.flush()
+        except (OSError, ValueError):
+            self._count("dropped", len(batch))         # stdout cerrado o roto
+            return
+        self._count("written", len(batch))
+        self._count("batches")
+
+    def _after_fork(self):
+        self._rate_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._start()
+
+
+LOG = AppLog()
+atexit.register(LOG.close)
+os.register_at_fork(after_in_child=LOG._after_fork)
+
+
+def install_dump_signal(sig: int = signal.SIGUSR1):
+    """Al recibir `sig`, vuelca el anillo a DUMP_DIR/classroom-ring-<pid>-<hora>.log."""
+    def _handler(signum, frame):
+        path = os.path.join(DUMP_DIR, f"classroom-ring-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.log")
+        LOG.warning(f"⚠️ WARNING: Anillo de log volcado en {LOG.dump(path)}")
+    signal.signal(sig, _handler)
@@ -0,0 +1,80 @@
+"""
+Backend · Interfaz de almacenamiento de datastore
+=================================================
+• Las funciones públicas de datastore.py (allocate_rooms, free_counts,
+  record_event_metric, …) delegan en el Backend activo (datastore._BACKEND).
+• Implementaciones:
+      datastore.SqliteBackend        → SQLite (modos nfs/local, inventario en
+                                       memoria, group-commit, replicación)
+      memory_backend.MemoryBackend   → todo en memoria + journal y snapshots
+• Un método nuevo se declara aquí con @abstractmethod: una implementación
+  que no lo tenga falla al instanciarse, no en la primera llamada.
+"""
+
+from abc import ABC, abstractmethod
+
+
+class Backend(ABC):
+
+    # ──────────────────────────────────────────────────────────
+    # Inventario y semestres
+    @abstractmethod
+    def seed_inventory(self, n_class: int, n_lab: int, semester: str):
+        """Stock inicial si el semestre actual (o `semester`) no tiene salas."""
+
+    @abstractmethod
+    def current_semester(self) -> str: ...
+
+    @abstractmethod
+    def open_semester(self, name: str, copy_from: str, make_current: bool, n_class: int, n_lab: int):
+        """Abre `name` copiando el inventario de `copy_from` (o n_class/n_lab si no tiene salas)."""
+
+    @abstractmethod
+    def close_semester(self, name: str): ...
+
+    @abstractmethod
+    def free_counts(self) -> tuple[int, int]:
+        """(aulas libres, laboratorios libres) del semestre actual."""
+
+    # ──────────────────────────────────────────────────────────
+    # Reservas
+    @abstractmethod
+    def allocate_rooms(self, n_class: int, n_lab: int, faculty_id: int, program_id: int) -> int:
+        """reservation_id, o ValueError si no alcanza el inventario."""
+
+    @abstractmethod
+    def allocate_rooms_batch(self, requests: list) -> list[tuple]:
+        """Por cada (n_class, n_lab, faculty_id, program_id): (reservation_id, None) o (None, motivo)."""
+
+    @abstractmethod
+    def confirm_reservation(self, res_id: int) -> bool: ...
+
+    @abstractmethod
+    def fail_reservation(self, res_id: int): ...
+
+    @abstractmethod
+    def expire_leases(self, cutoff: int, limit: int) -> int:
+        """Falla hasta `limit` reservas PENDING con ts_req < cutoff; devuelve cuántas."""
+
+    # ──────────────────────────────────────────────────────────
+    # Catálogo y servidores
+    @abstractmethod
+    def ensure_faculty(self, faculty_id: int, name: str, semester: str): ...
+
+    @abstractmethod
+    def ensure_program(self, program_id: int, faculty_id: int, name: str, semester: str): ...
+
+    @abstractmethod
+    def register_server(self, host: str, role: str): ...
+
+    # ──────────────────────────────────────────────────────────
+    # Métricas
+    @abstractmethod
+    def record_event_metric(self, kind: str, value: float, src: str, dst: str = None): ...
+
+    @abstractmethod
+    def metric_percentiles(self, kind: str, since: int = None, until: int = None,
+                           src: str = None, res_s: int = 60) -> dict: ...
+
+    def close(self):
+        """Libera recursos al cambiar de backend (por defecto nada)."""
@@ -1,54 +1,371 @@
 """
 Datastore · SQLite inventory & reservation manager
 ==================================================
-• Usa un único archivo SQLite sobre la ruta compartida NFS.
-• Conexión “singleton” por proceso + RLock para hilos.
+• Modo "nfs" (por defecto): un único archivo SQLite sobre la ruta compartida
+  NFS, conexión “singleton” por proceso + RLock para hilos, journal DELETE.
+• Modo "local": archivo en disco local con WAL y una conexión por hilo;
+  las lecturas corren en paralelo con un único escritor (el _LOCK).
+  Se elige con CLASSROOM_DB_MODE / CLASSROOM_DB_PATH o configure_storage().
 • 380 aulas y 60 laboratorios iniciales (semilla).
+• Inventario particionado por semestre: asignación y conteos sólo tocan el
+  semestre actual (tabla `semester`); open_semester() / close_semester()
+  son operaciones por conjuntos, no una actualización por sala.
+• Leases: una reserva PENDING vence a los LEASE_S segundos; el barrido
+  (expire_leases / start_lease_sweeper) libera sus salas por lotes cortos.
 • Si faltan LAB, se “adaptan” aulas libres (flag adapted = 1).
+• Opcional: inventario en memoria con write-behind (inventory.py).
+• Contadores de salas libres (room_counters) mantenidos por triggers y
+  reflejados en una caché en memoria → free_counts() es O(1).
+• Métricas asíncronas: timed() / record_event_metric() encolan en un
+  MetricSink (metric_sink.py) que escribe por lotes en segundo plano, en
+  formato compacto (metric_sample + dimensiones metric_kind / endpoint) y
+  con agregados por segundo / minuto en metric_rollup (rollup.py).
+• Group-commit opcional (group_commit.py): allocate/confirm/fail de varios
+  hilos comparten un solo BEGIN IMMEDIATE … COMMIT.
+• Backend intercambiable (backend.Backend): SqliteBackend (este módulo) o
+  MemoryBackend (memory_backend.py: todo en memoria + journal append-only y
+  snapshots). Las funciones públicas delegan en _BACKEND. Se elige con
+  CLASSROOM_BACKEND / CLASSROOM_JOURNAL_DIR o configure_backend().
+• Replicación (replication.py): set_change_listener() recibe, tras cada
+  commit, la imagen de las filas tocadas; apply_changes() las aplica en el
+  standby y dump_state() da el estado completo para resincronizar.
 """
 
-import sqlite3, threading, time, pathlib
+import atexit, os, re, sqlite3, threading, time, pathlib
+
+from applog import LOG
+from backend import Backend
 from contextlib import contextmanager
 
 INITIAL_CLASSROOMS = 380
 INITIAL_LABS       = 60
-SEMESTER           = "2025-2"
+SEMESTER           = "2025-2"   # semestre inicial si la BD aún no tiene uno actual
+
+STORAGE_MODE = os.environ.get("CLASSROOM_DB_MODE", "nfs")   # "nfs" | "local"
+BACKEND_KIND = os.environ.get("CLASSROOM_BACKEND", "sqlite")   # "sqlite" | "memory"
 
 _LOCK      = threading.RLock()
-_DB_PATH   = pathlib.Path("/srv/classroom_db/classroom.db")
-_CONN      = None     # se crea lazy
+_DB_PATH   = pathlib.Path(os.environ.get("CLASSROOM_DB_PATH", "/srv/classroom_db/classroom.db"))
+_SCHEMA    = pathlib.Path(__file__).with_name("schema.sql")
+_CONN      = None     # se crea lazy (modo nfs)
+_TLS       = threading.local()   # conexión por hilo (modo local)
+_OPENED: dict[sqlite3.Connection, threading.Thread] = {}   # conexión → hilo dueño (None: compartida)
+_SCHEMA_READY = False
+_INVENTORY = None     # RoomInventory si el modo memoria está activo
+_FREE_CACHE = {"version": None, "CLASS": 0, "LAB": 0}   # espejo de room_counters
+_METRICS   = None     # MetricSink, se crea lazy
+_GROUP     = None     # GroupCommitter si el group-commit está activo
+_CATALOG: dict[str, set[int]] = None   # ids conocidos de faculty / program
+_BACKEND: Backend = None   # SqliteBackend o MemoryBackend (se crea al final del módulo)
+_LISTENER  = None     # callable(images) tras cada commit (replicación)
+_CURRENT   = None     # nombre del semestre actual (caché de la tabla semester)
+_SWEEPER   = None     # threading.Event de parada del barrido de leases
+
+METRICS_ASYNC = True  # False → INSERT + commit síncrono por métrica (comportamiento anterior)
+LEASE_S     = 30      # s que una reserva puede seguir PENDING (> ACK_TIMEOUT de los servidores)
+SWEEP_CHUNK = 200     # reservas vencidas por transacción del barrido
+RAW_METRIC_RETENTION_S = None   # p. ej. 7*86400: borra muestras crudas más viejas (los rollups quedan)
+
+# Objetos de esquema que las migraciones crean si la BD es anterior a ellos.
+# El DDL sale de schema.sql (_schema_ddl), así una BD nueva y una migrada
+# tienen las mismas sentencias.
+_COUNTERS_OBJECTS = ("room_counters", "trg_room_counters_ins", "trg_room_counters_del", "trg_room_counters_upd")
+
+# Métricas compactas: kind/src/dst internados en tablas de dimensión. La vista
+# `metric` conserva columnas y orden (id,kind,value,ts,src,dst) para los CSV.
+_METRIC_OBJECTS = ("metric_kind", "endpoint", "metric_sample", "idx_metric_sample_kind_ts",
+                   "metric", "trg_metric_insert")
+
+# Partición por semestre: índice (semester, …) y tabla `semester`.
+_SEMESTER_OBJECTS = ("idx_room_semester", "semester", "idx_semester_current")
+
+_DDL_NAME = re.compile(r"^CREATE\s+(?:UNIQUE\s+)?(?:TABLE|INDEX|VIEW|TRIGGER)\s+IF\s+NOT\s+EXISTS\s+(\w+)",
+                       re.IGNORECASE | re.MULTILINE)
 
 # ──────────────────────────────────────────────────────────────
 def _conn():
     global _CONN
+    if STORAGE_MODE == "local":
+        conn = getattr(_TLS, "conn", None)
+        if conn is None:
+            _close_dead_threads()
+            conn = _TLS.conn = _open(threading.current_thread())
+        return conn
     if _CONN is None:
-        _CONN = sqlite3.connect(
-            _DB_PATH,
-            check_same_thread=False,
-            isolation_level=None      #  ← autocommit
-        )
-        _CONN.row_factory = sqlite3.Row
-        # No usamos WAL en NFS, que da corrupción.
-        _CONN.execute("PRAGMA journal_mode=DELETE;")
-        _CONN.execute("PRAGMA foreign_keys=ON;")
+        _CONN = _open()
     return _CONN
 
+def _journal_pragma() -> str:
+    # No usamos WAL en NFS, que da corrupción; en disco local sí.
+    return "PRAGMA journal_mode=WAL;" if STORAGE_MODE == "local" else "PRAGMA journal_mode=DELETE;"
 
-# ──────────────────────────────────────────────────────────────
-def seed_inventory():
-    """Inserta stock inicial sólo si la tabla está vacía."""
+def _close_dead_threads():
+    """Cierra las conexiones de hilos que ya terminaron (el pool adaptativo crea y retira workers)."""
     with _LOCK:
-        cur = _conn().execute("SELECT COUNT(*) FROM room")
-        if cur.fetchone()[0]:
-            return
-        cur = _conn().cursor()
-        cur.executemany(
-            "INSERT INTO room(type, adapted, status, semester) VALUES('CLASS',0,'FREE',?)",
-            [(SEMESTER,)] * INITIAL_CLASSROOMS)
-        cur.executemany(
-            "INSERT INTO room(type, adapted, status, semester) VALUES('LAB',0,'FREE',?)",
-            [(SEMESTER,)] * INITIAL_LABS)
-        _conn().commit()
+        for conn, owner in list(_OPENED.items()):
+            if owner is not None and not owner.is_alive():
+                del _OPENED[conn]
+                conn.close()
+
+def _open(owner: threading.Thread = None) -> sqlite3.Connection:
+    global _SCHEMA_READY
+    conn = sqlite3.connect(
+        _DB_PATH,
+        timeout=30,
+        check_same_thread=False,
+        isolation_level=None      #  ← autocommit
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute(_journal_pragma())
+    if STORAGE_MODE == "local":
+        conn.execute("PRAGMA synchronous=NORMAL;")   # suficiente con WAL en disco local
+    conn.execute("PRAGMA foreign_keys=ON;")
+    with _LOCK:
+        _OPENED[conn] = owner
+    if not _SCHEMA_READY:
+        _ensure_schema(conn)
+        _SCHEMA_READY = True
+    return conn
+
+def configure_storage(mode: str = None, path=None):
+    """
+    Cambia el modo ("nfs" | "local") y/o la ruta de la BD en caliente.
+    Cierra las conexiones abiertas; las siguientes llamadas reconectan.
+    """
+    global STORAGE_MODE, _DB_PATH, _CONN, _TLS, _SCHEMA_READY, _CATALOG, _CURRENT
+    flush_metrics()
+    disable_memory_inventory()
+    with _LOCK:
+        for conn in _OPENED:
+            conn.close()
+        _OPENED.clear()
+        if mode is not None:
+            if mode not in ("nfs", "local"):
+                raise ValueError(f"Modo de almacenamiento desconocido: {mode}")
+            STORAGE_MODE = mode
+        if path is not None:
+            _DB_PATH = pathlib.Path(path)
+        _CONN, _TLS, _SCHEMA_READY = None, threading.local(), False
+        _CATALOG = _CURRENT = None
+        _FREE_CACHE["version"] = None
+
+def configure_backend(kind: str = "sqlite", journal_dir=None, **opts):
+    """
+    "sqlite" → SqliteBackend (modo nfs/local de configure_storage).
+    "memory" → MemoryBackend con journal/snapshots en `journal_dir`
+               (por defecto CLASSROOM_JOURNAL_DIR o junto a la BD).
+    Sólo para despliegues de un nodo y benchmarks: el estado no se comparte
+    con el servidor par.
+    """
+    global BACKEND_KIND, _BACKEND
+    if kind not in ("sqlite", "memory"):
+        raise ValueError(f"Backend desconocido: {kind}")
+    if _BACKEND is not None:
+        _BACKEND.close()
+    if kind == "memory":
+        from memory_backend import MemoryBackend
+        journal_dir = journal_dir or os.environ.get(
+            "CLASSROOM_JOURNAL_DIR", _DB_PATH.with_name("journal"))
+        _BACKEND = MemoryBackend(journal_dir, **opts)
+    else:
+        _BACKEND = SqliteBackend()
+    BACKEND_KIND = kind
+    return _BACKEND
+
+def _ensure_schema(conn: sqlite3.Connection):
+    """
+    BD nueva → aplica schema.sql. BD existente → aplica, una sola vez, las
+    migraciones cuyo objeto marcador aún no exista (_MIGRATIONS); cada una
+    toma su DDL de schema.sql.
+    """
+    with _LOCK:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name='room'").fetchone():
+            conn.executescript(_SCHEMA.read_text(encoding="utf-8"))
+            conn.execute(_journal_pragma())   # schema.sql fija WAL; respetar el modo
+        for marker, step in _MIGRATIONS:
+            if _has_object(conn, marker):
+                continue
+            conn.execute("BEGIN IMMEDIATE;")
+            try:
+                if not _has_object(conn, marker):   # el servidor par pudo migrar antes
+                    step(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+def _has_object(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (name,)).fetchone() is not None
+
+def _schema_ddl(*names: str) -> list[str]:
+    """Sentencias CREATE de schema.sql para los objetos `names`, en ese orden."""
+    by_name = {}
+    for stmt in _split_ddl(_SCHEMA.read_text(encoding="utf-8")):
+        m = _DDL_NAME.search(stmt)
+        if m:
+            by_name[m.group(1)] = stmt
+    missing = [n for n in names if n not in by_name]
+    if missing:
+        raise RuntimeError(f"schema.sql no define {missing}")
+    return [by_name[n] for n in names]
+
+def _migrate_room_counters(conn: sqlite3.Connection):
+    """Crea room_counters + triggers y los puebla desde room."""
+    fresh = not _has_object(conn, "room_counters")
+    for stmt in _schema_ddl(*_COUNTERS_OBJECTS):
+        conn.execute(stmt)
+    if fresh:
+        conn.execute(
+            "INSERT INTO room_counters(semester, type, free) "
+            "SELECT semester, type, SUM(status='FREE') FROM room GROUP BY semester, type")
+
+def _migrate_metric_rollup(conn: sqlite3.Connection):
+    """Crea metric_rollup y la reconstruye desde las muestras ya guardadas."""
+    import rollup
+    for stmt in _schema_ddl("metric_rollup"):
+        conn.execute(stmt)
+    for res_s in rollup.RESOLUTIONS:
+        conn.execute(rollup.backfill_sql(res_s))
+
+def _migrate_metric_storage(conn: sqlite3.Connection):
+    """Pasa la tabla `metric` de texto libre al formato compacto + vista `metric`."""
+    legacy = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name='metric' AND type='table'").fetchone()
+    if legacy:
+        conn.execute("ALTER TABLE metric RENAME TO metric_legacy")
+    for stmt in _schema_ddl(*_METRIC_OBJECTS):
+        conn.execute(stmt)
+    if legacy:
+        conn.execute("INSERT OR IGNORE INTO metric_kind(name) SELECT DISTINCT kind FROM metric_legacy")
+        conn.execute("INSERT OR IGNORE INTO endpoint(name) "
+                     "SELECT src FROM metric_legacy WHERE src IS NOT NULL "
+                     "UNION SELECT dst FROM metric_legacy WHERE dst IS NOT NULL")
+        conn.execute(
+            "INSERT INTO metric_sample(id, kind_id, value, ts, src_id, dst_id) "
+            "SELECT m.id, k.id, m.value, m.ts, se.id, de.id FROM metric_legacy m "
+            "JOIN metric_kind k ON k.name = m.kind "
+            "LEFT JOIN endpoint se ON se.name = m.src "
+            "LEFT JOIN endpoint de ON de.name = m.dst")
+        conn.execute("DROP TABLE metric_legacy")
+
+def _migrate_semesters(conn: sqlite3.Connection):
+    """Crea `semester` + índice por semestre; registra los semestres existentes."""
+    conn.execute("DROP INDEX IF EXISTS idx_room_fast")      # índice previo a los semestres
+    for stmt in _schema_ddl(*_SEMESTER_OBJECTS):
+        conn.execute(stmt)
+    now = int(time.time())
+    conn.execute("INSERT OR IGNORE INTO semester(name, opened_ts) "
+                 "SELECT DISTINCT semester, ? FROM room", (now,))
+    current = conn.execute("SELECT name FROM semester WHERE name=?", (SEMESTER,)).fetchone() \
+        or conn.execute("SELECT MAX(name) FROM semester").fetchone()
+    if current and current[0]:
+        conn.execute("UPDATE semester SET is_current=1 WHERE name=?", (current[0],))
+
+def _migrate_metric_view_rollup(conn: sqlite3.Connection):
+    """Trigger que acumula en metric_rollup lo que se inserta por la vista `metric`."""
+    for stmt in _schema_ddl("trg_metric_rollup"):
+        conn.execute(stmt)
+
+def _migrate_leases(conn: sqlite3.Connection):
+    """Índice del barrido de leases (reservas PENDING por antigüedad)."""
+    for stmt in _schema_ddl("idx_reservation_pending"):
+        conn.execute(stmt)
+
+_MIGRATIONS = [
+    ("trg_room_counters_upd", _migrate_room_counters),
+    ("trg_metric_insert",     _migrate_metric_storage),
+    ("metric_rollup",         _migrate_metric_rollup),
+    ("trg_metric_rollup",     _migrate_metric_view_rollup),
+    ("idx_room_semester",     _migrate_semesters),
+    ("idx_reservation_pending", _migrate_leases),
+]
+
+def _split_ddl(script: str) -> list[str]:
+    """Separa un script DDL en sentencias completas (respeta BEGIN…END de triggers)."""
+    stmts, buf = [], ""
+    for line in script.strip().splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            stmts.append(buf.strip())
+            buf = ""
+    return stmts
+
+
+# ──────────────────────────────────────────────────────────────
+def seed_inventory(n_class: int = None, n_lab: int = None):
+    """
+    Inserta stock inicial sólo si el semestre actual no tiene salas
+    (por defecto INITIAL_CLASSROOMS / INITIAL_LABS).
+    """
+    n_class = INITIAL_CLASSROOMS if n_class is None else n_class
+    n_lab = INITIAL_LABS if n_lab is None else n_lab
+    return _BACKEND.seed_inventory(n_class, n_lab, SEMESTER)
+
+def _insert_rooms(cur: sqlite3.Cursor, semester: str, n_class: int, n_lab: int):
+    cur.executemany(
+        "INSERT INTO room(type, adapted, status, semester) VALUES('CLASS',0,'FREE',?)",
+        [(semester,)] * n_class)
+    cur.executemany(
+        "INSERT INTO room(type, adapted, status, semester) VALUES('LAB',0,'FREE',?)",
+        [(semester,)] * n_lab)
+
+def _register_semester(cur: sqlite3.Cursor, semester: str):
+    """Alta del semestre; pasa a ser el actual si no hay otro."""
+    current = cur.execute("SELECT 1 FROM semester WHERE is_current=1").fetchone() is None
+    cur.execute("INSERT OR IGNORE INTO semester(name, is_current, opened_ts) VALUES(?,?,?)",
+                (semester, int(current), int(time.time())))
+
+# ──────────────────────────────────────────────────────────────
+# Semestres
+def current_semester() -> str:
+    """Semestre sobre el que se asigna (caché de semester.is_current)."""
+    return _BACKEND.current_semester()
+
+def open_semester(name: str, copy_from: str = None, make_current: bool = True):
+    """
+    Abre `name` con el inventario de `copy_from` (por defecto el semestre
+    actual; si no tiene salas, la semilla inicial), todas las salas libres y
+    sin adaptar. Un INSERT … SELECT y, si make_current, mover el puntero.
+    """
+    return _BACKEND.open_semester(name, copy_from, make_current, INITIAL_CLASSROOMS, INITIAL_LABS)
+
+def close_semester(name: str):
+    """Marca el semestre como cerrado (sus salas quedan como histórico)."""
+    return _BACKEND.close_semester(name)
+
+# ──────────────────────────────────────────────────────────────
+def enable_memory_inventory():
+    """
+    Activa (o recarga) el inventario en memoria. Debe llamarlo sólo el
+    servidor activo: recarga desde SQLite lo que haya escrito el par.
+    """
+    global _INVENTORY
+    if not isinstance(_BACKEND, SqliteBackend):
+        return            # el backend ya trabaja en memoria
+    from inventory import RoomInventory
+    if _INVENTORY is None:
+        _INVENTORY = RoomInventory(_conn, _LOCK, on_commit=_publish_changes)
+    else:
+        _INVENTORY.flush()
+    _INVENTORY.load(current_semester())
+
+def disable_memory_inventory():
+    """Vacía el write-behind y vuelve al camino SQL directo."""
+    global _INVENTORY
+    if _INVENTORY is not None:
+        _INVENTORY.flush()
+        _INVENTORY = None
+        _FREE_CACHE["version"] = None   # el write-behind no pasó por _bump_free()
+
+def free_counts() -> tuple[int, int]:
+    """(aulas libres, laboratorios libres) del semestre actual."""
+    return _BACKEND.free_counts()
+
+def _bump_free(d_class: int, d_lab: int):
+    """Aplica a la caché el delta de un commit propio (llamar con _LOCK)."""
+    if _FREE_CACHE["version"] is not None:
+        _FREE_CACHE["CLASS"] += d_class
+        _FREE_CACHE["LAB"] += d_lab
 
 # ──────────────────────────────────────────────────────────────
 def allocate_rooms(n_class: int, n_lab: int,
@@ -57,97 +374,406 @@ def allocate_rooms(n_class: int, n_lab: int,
     Reserva ‘n_class’ aulas y ‘n_lab’ labs. Si no hay labs libres,
     adapta aulas libres. Devuelve reservation_id o lanza ValueError.
     """
-    with _LOCK:
-        cur = _conn().cursor()
-        cur.execute("BEGIN IMMEDIATE;")
+    return _BACKEND.allocate_rooms(n_class, n_lab, faculty_id, program_id)
 
-        # 1. Salones
-        cur.execute("SELECT id FROM room "
-                    "WHERE type='CLASS' AND status='FREE' AND adapted=0 "
-                    "LIMIT ?", (n_class,))
-        class_rows = [r["id"] for r in cur.fetchall()]
-        if len(class_rows) < n_class:
-            _conn().rollback()
-            raise ValueError("No hay suficientes aulas libres")
-
-        # 2. Laboratorios (o aulas adaptadas)
+def _allocate_tx(cur: sqlite3.Cursor, n_class: int, n_lab: int,
+                 faculty_id: int, program_id: int):
+    semester = current_semester()
+    # 1. Salones
+    cur.execute("SELECT id FROM room "
+                "WHERE semester=? AND type='CLASS' AND status='FREE' AND adapted=0 "
+                "ORDER BY id LIMIT ?", (semester, n_class))
+    class_rows = [r["id"] for r in cur.fetchall()]
+    if len(class_rows) < n_class:
+        raise ValueError("No hay suficientes aulas libres")
+
+    # 2. Laboratorios (o aulas adaptadas)
+    cur.execute("SELECT id FROM room "
+                "WHERE semester=? AND type='LAB' AND status='FREE' LIMIT ?", (semester, n_lab))
+    lab_rows = [r["id"] for r in cur.fetchall()]
+
+    n_real_labs = len(lab_rows)
+    lab_deficit = n_lab - n_real_labs
+    if lab_deficit > 0:
+        # usar aulas como mobile labs (OFFSET: saltar las ya elegidas en el paso 1,
+        # que todavía figuran FREE dentro de esta transacción)
         cur.execute("SELECT id FROM room "
-                    "WHERE type='LAB' AND status='FREE' LIMIT ?", (n_lab,))
-        lab_rows = [r["id"] for r in cur.fetchall()]
-
-        lab_deficit = n_lab - len(lab_rows)
-        if lab_deficit > 0:
-            # usar aulas como mobile labs
-            cur.execute("SELECT id FROM room "
-                        "WHERE type='CLASS' AND status='FREE' AND adapted=0 "
-                        "LIMIT ?", (lab_deficit,))
-            adapt_rows = [r["id"] for r in cur.fetchall()]
-            if len(adapt_rows) < lab_deficit:
-                _conn().rollback()
-                raise ValueError("No hay recursos para adaptar laboratorios")
-            # marcar como adaptadas
-            cur.executemany(
-                "UPDATE room SET adapted=1 WHERE id=?", [(rid,) for rid in adapt_rows])
-            lab_rows.extend(adapt_rows)
-
-        # 3. Crear reserva
-        cur.execute("INSERT INTO reservation(faculty_id,program_id,ts_req,status) "
-                    "VALUES(?,?,?, 'PENDING')",
-                    (faculty_id, program_id, int(time.time())))
-        res_id = cur.lastrowid
-
-        # 4. Asignar rooms
-        all_rows = class_rows + lab_rows
-        cur.executemany(
-            "INSERT INTO reservation_room(reservation_id, room_id) VALUES(?,?)",
-            [(res_id, rid) for rid in all_rows])
+                    "WHERE semester=? AND type='CLASS' AND status='FREE' AND adapted=0 "
+                    "ORDER BY id LIMIT ? OFFSET ?", (semester, lab_deficit, n_class))
+        adapt_rows = [r["id"] for r in cur.fetchall()]
+        if len(adapt_rows) < lab_deficit:
+            raise ValueError("No hay recursos para adaptar laboratorios")
+        # marcar como adaptadas
         cur.executemany(
-            "UPDATE room SET status='BUSY' WHERE id=?",
-            [(rid,) for rid in all_rows])
+            "UPDATE room SET adapted=1 WHERE id=?", [(rid,) for rid in adapt_rows])
+        lab_rows.extend(adapt_rows)
 
-        _conn().commit()
-        return res_id
+    # 3. Crear reserva
+    cur.execute("INSERT INTO reservation(faculty_id,program_id,ts_req,status) "
+                "VALUES(?,?,?, 'PENDING')",
+                (faculty_id, program_id, int(time.time())))
+    res_id = cur.lastrowid
+
+    # 4. Asignar rooms
+    all_rows = class_rows + lab_rows
+    cur.executemany(
+        "INSERT INTO reservation_room(reservation_id, room_id) VALUES(?,?)",
+        [(res_id, rid) for rid in all_rows])
+    cur.executemany(
+        "UPDATE room SET status='BUSY' WHERE id=?",
+        [(rid,) for rid in all_rows])
+
+    return res_id, (-(len(all_rows) - n_real_labs), -n_real_labs)
 
 # ──────────────────────────────────────────────────────────────
-def confirm_reservation(res_id: int):
-    with _LOCK, _conn() as conn:
-        conn.execute(
-            "UPDATE reservation SET status='CONFIRMED', ts_ack=? WHERE id=?",
-            (int(time.time()), res_id))
+_SQL_CHUNK = 500      # filas por sentencia multi-fila (límite de variables SQLite)
+
+def allocate_rooms_batch(requests: list[tuple[int, int, int, int]]) -> list[tuple]:
+    """
+    Asigna varias solicitudes (n_class, n_lab, faculty_id, program_id) en una
+    sola transacción con SQL por conjuntos. Se atienden en orden; cada una
+    obtiene (reservation_id, None) o (None, motivo) con la misma semántica
+    que allocate_rooms (incluida la adaptación de aulas).
+    """
+    if not requests:
+        return []
+    return _BACKEND.allocate_rooms_batch(requests)
+
+def _allocate_batch_tx(cur: sqlite3.Cursor, requests: list[tuple[int, int, int, int]]):
+    need_class = sum(r[0] + r[1] for r in requests)   # peor caso: todos los labs adaptados
+    need_lab = sum(r[1] for r in requests)
+    semester = current_semester()
+    cur.execute("SELECT id FROM room WHERE semester=? AND type='CLASS' AND status='FREE' "
+                "AND adapted=0 ORDER BY id LIMIT ?", (semester, need_class))
+    classes = [r["id"] for r in cur.fetchall()]
+    cur.execute("SELECT id FROM room WHERE semester=? AND type='LAB' AND status='FREE' "
+                "ORDER BY id LIMIT ?", (semester, need_lab))
+    labs = [r["id"] for r in cur.fetchall()]
+
+    # Reparto en memoria, en orden de llegada
+    plans, outcomes = [], []
+    ci = li = 0
+    for n_class, n_lab, fid, pid in requests:
+        real_labs = min(n_lab, len(labs) - li)
+        deficit = n_lab - real_labs
+        if len(classes) - ci < n_class:
+            outcomes.append((None, "No hay suficientes aulas libres"))
+            continue
+        if len(classes) - ci - n_class < deficit:
+            outcomes.append((None, "No hay recursos para adaptar laboratorios"))
+            continue
+        cls_rows = classes[ci:ci + n_class]
+        adapt_rows = classes[ci + n_class:ci + n_class + deficit]
+        lab_rows = labs[li:li + real_labs]
+        ci += n_class + deficit
+        li += real_labs
+        plans.append((len(outcomes), fid, pid, cls_rows + lab_rows + adapt_rows, adapt_rows))
+        outcomes.append(None)
+
+    if plans:
+        # Reservas: un INSERT multi-fila; AUTOINCREMENT dentro de BEGIN IMMEDIATE
+        # asigna ids consecutivos → se derivan de last_insert_rowid().
+        ts = int(time.time())
+        for chunk in _chunks(plans, _SQL_CHUNK):
+            cur.execute(
+                "INSERT INTO reservation(faculty_id,program_id,ts_req,status) VALUES "
+                + ",".join(["(?,?,?,'PENDING')"] * len(chunk)),
+                [v for p in chunk for v in (p[1], p[2], ts)])
+            first_id = cur.lastrowid - len(chunk) + 1
+            for offset, p in enumerate(chunk):
+                outcomes[p[0]] = (first_id + offset, None)
+
+        pairs = [(outcomes[p[0]][0], rid) for p in plans for rid in p[3]]
+        for chunk in _chunks(pairs, _SQL_CHUNK):
+            cur.execute(
+                "INSERT INTO reservation_room(reservation_id, room_id) VALUES "
+                + ",".join(["(?,?)"] * len(chunk)),
+                [v for pair in chunk for v in pair])
+        adapt_all = [rid for p in plans for rid in p[4]]
+        for chunk in _chunks(adapt_all, _SQL_CHUNK):
+            cur.execute("UPDATE room SET adapted=1 WHERE id IN (%s)" % ",".join("?" * len(chunk)),
+                        chunk)
+        busy_all = [rid for p in plans for rid in p[3]]
+        for chunk in _chunks(busy_all, _SQL_CHUNK):
+            cur.execute("UPDATE room SET status='BUSY' WHERE id IN (%s)" % ",".join("?" * len(chunk)),
+                        chunk)
+
+    return outcomes, (-ci, -li)
+
+def _chunks(seq: list, size: int):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+# ──────────────────────────────────────────────────────────────
+def confirm_reservation(res_id: int) -> bool:
+    """Confirma sólo si sigue PENDING; False si su lease ya venció (o no existe)."""
+    return _BACKEND.confirm_reservation(res_id)
+
+def _confirm_tx(cur: sqlite3.Cursor, res_id: int):
+    cur.execute(
+        "UPDATE reservation SET status='CONFIRMED', ts_ack=? WHERE id=? AND status='PENDING'",
+        (int(time.time()), res_id))
+    return cur.rowcount == 1, None
 
 def fail_reservation(res_id: int):
-    """Libera rooms y marca reserva fallida."""
+    """Libera rooms y marca reserva fallida (no-op si ya estaba FAILED)."""
+    return _BACKEND.fail_reservation(res_id)
+
+def _fail_tx(cur: sqlite3.Cursor, res_id: int):
+    _, delta = _release_tx(cur, [res_id])
+    return None, delta
+
+def _release_tx(cur: sqlite3.Cursor, res_ids: list[int]):
+    """
+    Devuelve a FREE las salas de las reservas que aún no están FAILED y las
+    marca FAILED (una ya liberada no libera otra vez salas reasignadas).
+    → (ids liberados, delta de libres del semestre actual)
+    """
+    semester = current_semester()
+    released, d_class, d_lab = [], 0, 0
+    ts = int(time.time())
+    for chunk in _chunks(res_ids, _SQL_CHUNK):
+        cur.execute("SELECT id FROM reservation WHERE status!='FAILED' AND id IN (%s)"
+                    % ",".join("?" * len(chunk)), chunk)
+        live = [r["id"] for r in cur.fetchall()]
+        if not live:
+            continue
+        marks = ",".join("?" * len(live))
+        cur.execute("SELECT room.id, room.type, room.status, room.semester FROM reservation_room rr "
+                    f"JOIN room ON room.id = rr.room_id WHERE rr.reservation_id IN ({marks})", live)
+        fetched = cur.fetchall()
+        # el delta de la caché sólo cuenta salas del semestre actual
+        busy = [r["type"] for r in fetched if r["status"] == "BUSY" and r["semester"] == semester]
+        d_class += busy.count("CLASS")
+        d_lab += busy.count("LAB")
+        cur.executemany("UPDATE room SET status='FREE', adapted=0 WHERE id=?",
+                        [(r["id"],) for r in fetched])
+        cur.execute(f"UPDATE reservation SET status='FAILED', ts_ack=? WHERE id IN ({marks})",
+                    [ts] + live)
+        released += live
+    return released, (d_class, d_lab)
+
+# ──────────────────────────────────────────────────────────────
+# Leases: el barrido recorre idx_reservation_pending (status, ts_req) por
+# lotes de SWEEP_CHUNK, cada uno en su propia transacción corta, así que una
+# asignación nunca espera más que un lote.
+def expire_leases(lease_s: int = None, chunk: int = SWEEP_CHUNK) -> int:
+    """Falla las reservas PENDING con ts_req < ahora - lease_s. Devuelve cuántas."""
+    cutoff = int(time.time()) - (LEASE_S if lease_s is None else lease_s)
+    total = 0
+    while True:
+        n = _BACKEND.expire_leases(cutoff, chunk)
+        total += n
+        if n < chunk:
+            return total
+
+def _expire_tx(cur: sqlite3.Cursor, cutoff: int, chunk: int):
+    cur.execute("SELECT id FROM reservation WHERE status='PENDING' AND ts_req < ? "
+                "ORDER BY ts_req LIMIT ?", (cutoff, chunk))
+    return _release_tx(cur, [r["id"] for r in cur.fetchall()])
+
+def start_lease_sweeper(interval: float = 5.0):
+    """Hilo que llama a expire_leases() cada `interval` s (sólo el servidor activo)."""
+    global _SWEEPER
+    if _SWEEPER is not None:
+        return
+    stop = _SWEEPER = threading.Event()
+
+    def sweep():
+        while not stop.wait(interval):
+            try:
+                n = expire_leases()
+                if n:
+                    LOG.info(f"\n⏰ LEASES: {n} reservas PENDING vencidas liberadas.", key="leases")
+            except Exception as e:
+                LOG.error(f"\n❗ LEASES: el barrido falló: {e!r}", key="leases_error")
+    threading.Thread(target=sweep, daemon=True).start()
+
+def stop_lease_sweeper():
+    global _SWEEPER
+    if _SWEEPER is not None:
+        _SWEEPER.set()
+        _SWEEPER = None
+
+# ──────────────────────────────────────────────────────────────
+def _run_tx(fn, *args):
+    """
+    Ejecuta fn(cursor, *args) → (resultado, delta_libres) en su propia
+    transacción, o en la del grupo si el group-commit está activo.
+    """
+    if _GROUP is not None:
+        return _GROUP.submit(fn, *args).result()
     with _LOCK:
-        cur = _conn().cursor()
+        conn = _conn()
+        cur = conn.cursor()
         cur.execute("BEGIN IMMEDIATE;")
-        cur.execute("SELECT room_id FROM reservation_room WHERE reservation_id=?", (res_id,))
-        rows = [r["room_id"] for r in cur.fetchall()]
-        # devolver recursos
-        cur.executemany(
-            "UPDATE room SET status='FREE', adapted = CASE WHEN adapted=1 THEN 0 ELSE adapted END "
-            "WHERE id=?", [(rid,) for rid in rows])
-        cur.execute(
-            "UPDATE reservation SET status='FAILED', ts_ack=? WHERE id=?",
-            (int(time.time()), res_id))
-        _conn().commit()
+        try:
+            result, delta = fn(cur, *args)
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        if delta is not None:
+            _bump_free(*delta)
+        return result
+
+def enable_group_commit(window: float = 0.002, max_batch: int = 64):
+    """
+    Agrupa allocate/confirm/fail concurrentes en un único COMMIT
+    (una transacción por ventana de `window` s). Cada operación conserva
+    su atomicidad mediante SAVEPOINT.
+    """
+    global _GROUP
+    if _GROUP is None:
+        from group_commit import GroupCommitter
+        _GROUP = GroupCommitter(_conn, _LOCK, on_commit=lambda d: _bump_free(*d),
+                                window=window, max_batch=max_batch)
+    return _GROUP
+
 # ──────────────────────────────────────────────────────────────
 # utilidades genéricas de alta (las puede usar server.py / faculty.py)
+# Caché de catálogo (_CATALOG): ids de facultad/programa ya presentes en la BD.
+# Sólo un fallo real de caché escribe, y lo hace por _run_tx (group-commit si está activo).
+def preload_catalog():
+    """Carga en memoria los ids de `faculty` y `program` (una lectura por tabla)."""
+    global _CATALOG
+    if not isinstance(_BACKEND, SqliteBackend):
+        return
+    conn = _conn()
+    _CATALOG = {
+        "faculty": {r[0] for r in conn.execute("SELECT id FROM faculty")},
+        "program": {r[0] for r in conn.execute("SELECT id FROM program")},
+    }
+
 def ensure_faculty(faculty_id: int, name: str, semester: str):
-    _conn().execute(
+    return _BACKEND.ensure_faculty(faculty_id, name, semester)
+
+def _ensure_faculty_tx(cur: sqlite3.Cursor, faculty_id: int, name: str, semester: str):
+    cur.execute(
         """INSERT INTO faculty(id,name,semester)
            VALUES(?,?,?)
            ON CONFLICT(id) DO NOTHING""",
         (faculty_id, name, semester))
-    _conn().commit()
+    return None, None
 
 def ensure_program(program_id: int, faculty_id: int,
                    name: str, semester: str):
-    _conn().execute(
+    return _BACKEND.ensure_program(program_id, faculty_id, name, semester)
+
+def _ensure_program_tx(cur: sqlite3.Cursor, program_id: int, faculty_id: int,
+                       name: str, semester: str):
+    cur.execute(
         """INSERT INTO program(id,faculty_id,name,semester)
            VALUES(?,?,?,?)
            ON CONFLICT(id) DO NOTHING""",
         (program_id, faculty_id, name, semester))
-    _conn().commit()
+    return None, None
+
+def register_server(host: str, role: str):
+    """Registra / refresca el rol de este servidor (tabla server)."""
+    return _BACKEND.register_server(host, role)
+
+# ──────────────────────────────────────────────────────────────
+# Replicación por imágenes de fila: cada cambio se envía como el estado
+# actual de las filas afectadas, así que aplicarlo dos veces es inocuo y
+# el standby converge si los aplica en orden.
+_IMAGE_COLS = {
+    "semester":         ("name", "state", "is_current", "opened_ts", "closed_ts"),
+    "faculty":          ("id", "name", "semester"),
+    "program":          ("id", "faculty_id", "name", "semester"),
+    "room":             ("id", "type", "adapted", "status", "semester"),
+    "reservation":      ("id", "faculty_id", "program_id", "ts_req", "ts_ack", "status"),
+    "reservation_room": ("reservation_id", "room_id"),
+}
+
+def set_change_listener(fn):
+    """fn(images: dict) se llama con _LOCK tomado tras cada commit (None = desactivar)."""
+    global _LISTENER
+    _LISTENER = fn
+
+def _select_images(conn, table: str, where: str = "", params=()) -> list[list]:
+    cols = ", ".join(_IMAGE_COLS[table])
+    return [list(r) for r in conn.execute(f"SELECT {cols} FROM {table} {where}", params)]
+
+def _publish_changes(res_ids=(), faculty_ids=(), program_ids=(), semester: str = None):
+    """semester: envía todas las filas de `semester` y las salas de ese semestre."""
+    if _LISTENER is None or not (res_ids or faculty_ids or program_ids or semester):
+        return
+    with _LOCK:
+        conn = _conn()
+        images = {table: [] for table in _IMAGE_COLS}
+        if semester is not None:
+            images["semester"] = _select_images(conn, "semester")
+            images["room"] = _select_images(conn, "room", "WHERE semester=?", (semester,))
+        for chunk in _chunks(list(faculty_ids), _SQL_CHUNK):
+            images["faculty"] += _select_images(
+                conn, "faculty", f"WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        for chunk in _chunks(list(program_ids), _SQL_CHUNK):
+            images["program"] += _select_images(
+                conn, "program", f"WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        for chunk in _chunks(list(res_ids), _SQL_CHUNK):
+            marks = ",".join("?" * len(chunk))
+            images["reservation"] += _select_images(conn, "reservation", f"WHERE id IN ({marks})", chunk)
+            images["reservation_room"] += _select_images(
+                conn, "reservation_room", f"WHERE reservation_id IN ({marks})", chunk)
+            images["room"] += _select_images(
+                conn, "room", "WHERE id IN (SELECT room_id FROM reservation_room "
+                f"WHERE reservation_id IN ({marks}))", chunk)
+        _LISTENER(images)
+
+def dump_state() -> dict:
+    """Imagen completa de catálogo, salas y reservas (snapshot para el standby)."""
+    with _LOCK:
+        conn = _conn()
+        return {table: _select_images(conn, table) for table in _IMAGE_COLS}
+
+def apply_changes(images: dict, full: bool = False):
+    """
+    Aplica imágenes de fila recibidas del servidor activo (por clave, en
+    orden de claves foráneas). full=True: `images` es un dump_state() y lo que no
+    aparezca en él se borra.
+    """
+    global _CURRENT
+    with _LOCK:
+        conn = _conn()
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE;")
+        try:
+            if full:
+                for table in ("reservation_room", "reservation", "room", "program", "faculty",
+                              "semester"):
+                    cur.execute(f"DELETE FROM {table}")
+            if images.get("semester"):
+                # Sólo puede haber un semestre actual: el del par manda.
+                cur.execute("UPDATE semester SET is_current=0 WHERE is_current=1")
+            for table, cols in _IMAGE_COLS.items():
+                rows = images.get(table)
+                if not rows:
+                    continue
+                # UPDATE + INSERT OR IGNORE en vez de UPSERT: el ON CONFLICT de un
+                # UPSERT anula el OR IGNORE de los triggers de room_counters.
+                n_keys = 2 if table == "reservation_room" else 1
+                keys, values = cols[:n_keys], cols[n_keys:]
+                if values:
+                    cur.executemany(
+                        f"UPDATE {table} SET {', '.join(f'{c}=?' for c in values)} "
+                        f"WHERE {' AND '.join(f'{k}=?' for k in keys)}",
+                        [r[n_keys:] + r[:n_keys] for r in rows])
+                cur.executemany(
+                    f"INSERT OR IGNORE INTO {table}({', '.join(cols)}) "
+                    f"VALUES({','.join('?' * len(cols))})", rows)
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        _FREE_CACHE["version"] = None      # data_version no cambia con commits propios
+        if images.get("semester"):
+            _CURRENT = None
+        if full:
+            preload_catalog()              # reemplaza el dict completo de una vez
+        elif _CATALOG is not None:
+            _CATALOG["faculty"].update(r[0] for r in images.get("faculty", ()))
+            _CATALOG["program"].update(r[0] for r in images.get("program", ()))
 
 # ──────────────────────────────────────────────────────────────
 @contextmanager
@@ -155,12 +781,8 @@ def timed(kind: str, src: str, dst: str):
     t0 = time.perf_counter_ns()
     yield
     dt_ms = (time.perf_counter_ns() - t0) / 1e6
-    with _LOCK:
-        _conn().execute(
-            "INSERT INTO metric(kind,value,ts,src,dst) VALUES(?,?,?,?,?)",
-            (kind, dt_ms, int(time.time()), src, dst))
-        _conn().commit()
-        
+    record_event_metric(kind, dt_ms, src, dst)
+
 # ──────────────────────────────────────────────────────────────
 def record_event_metric(kind: str, value: float, src: str, dst: str = None):
     """
@@ -172,15 +794,254 @@ def record_event_metric(kind: str, value: float, src: str, dst: str = None):
         src (str): El origen de la métrica (ej: "Programa:IngSoftware").
         dst (str, optional): El destino relacionado con la métrica (ej: "Facultad:1").
     """
-    # Se utiliza el _LOCK y _conn() existentes en datastore.py para asegurar la consistencia
-    # y el manejo adecuado de la conexión a la base de datos.
-    with _LOCK:
-        current_ts = int(time.time()) # Timestamp actual en epoch segundos
-        conn = _conn() # Obtiene la conexión singleton a la BD
-        conn.execute(
-            "INSERT INTO metric(kind, value, ts, src, dst) VALUES(?,?,?,?,?)",
-            (kind, value, current_ts, src, dst)
-        )
-        conn.commit() # Realiza el commit para asegurar que los datos se escriban
-                      # Consistente con otras funciones en datastore.py que modifican datos.
+    return _BACKEND.record_event_metric(kind, value, src, dst)
+
+def _metric_sink():
+    global _METRICS
+    if _METRICS is None:
+        with _LOCK:
+            if _METRICS is None:
+                from metric_sink import MetricSink
+                _METRICS = MetricSink(_conn, _LOCK, maintenance=_metric_maintenance)
+                atexit.register(_METRICS.close)
+    return _METRICS
+
+def metric_sink_stats() -> dict:
+    """Contadores del sink: encoladas, escritas, lotes, backpressure, descartadas."""
+    return _metric_sink().stats() if _METRICS is not None else {}
+
+def flush_metrics():
+    """Drena el sink de métricas (se llama también automáticamente al salir)."""
+    global _METRICS
+    if _METRICS is not None:
+        _METRICS.close()
+        _METRICS = None
+
+# ──────────────────────────────────────────────────────────────
+# Lectura de agregados y retención de muestras crudas
+def metric_percentiles(kind: str, since: int = None, until: int = None,
+                       src: str = None, res_s: int = 60) -> dict:
+    """
+    count / mean / min / max / p50 / p90 / p99 de `kind` entre [since, until)
+    leyendo sólo metric_rollup (res_s = 1 ó 60). `src` filtra por origen.
+    """
+    return _BACKEND.metric_percentiles(kind, since, until, src, res_s)
+
+def prune_raw_metrics(max_age_s: int, chunk: int = 5000) -> int:
+    """Borra muestras crudas con ts < ahora - max_age_s, por tipo y en trozos."""
+    cutoff = int(time.time()) - max_age_s
+    deleted = 0
+    kinds = [r[0] for r in _conn().execute("SELECT id FROM metric_kind")]
+    for kind_id in kinds:
+        while True:
+            with _LOCK:
+                cur = _conn().execute(
+                    "DELETE FROM metric_sample WHERE id IN (SELECT id FROM metric_sample "
+                    "WHERE kind_id = ? AND ts < ? LIMIT ?)", (kind_id, cutoff, chunk))
+                n = cur.rowcount
+            deleted += n
+            if n < chunk:
+                break
+    return deleted
+
+def _metric_maintenance():
+    if RAW_METRIC_RETENTION_S:
+        prune_raw_metrics(RAW_METRIC_RETENTION_S)
+
+# ──────────────────────────────────────────────────────────────
+class SqliteBackend(Backend):
+    """
+    Backend SQLite: modos nfs/local (configure_storage), inventario en
+    memoria con write-behind (enable_memory_inventory), group-commit y
+    publicación de cambios para la replicación.
+    """
+
+    # ──────────────────────────────────────────────────────────
+    # Inventario y semestres
+    def seed_inventory(self, n_class: int, n_lab: int, semester: str):
+        with _LOCK:
+            semester = self.current_semester()
+            if _conn().execute("SELECT 1 FROM room WHERE semester=? LIMIT 1", (semester,)).fetchone():
+                return
+            cur = _conn().cursor()
+            cur.execute("BEGIN IMMEDIATE;")
+            _register_semester(cur, semester)
+            _insert_rooms(cur, semester, n_class, n_lab)
+            _conn().commit()
+            _FREE_CACHE["version"] = None
+
+    def current_semester(self) -> str:
+        global _CURRENT
+        if _CURRENT is None:
+            row = _conn().execute("SELECT name FROM semester WHERE is_current=1").fetchone()
+            _CURRENT = row[0] if row else SEMESTER
+        return _CURRENT
+
+    def open_semester(self, name: str, copy_from: str, make_current: bool, n_class: int, n_lab: int):
+        global _CURRENT
+        copy_from = copy_from or self.current_semester()
+        if _INVENTORY is not None:
+            _INVENTORY.flush()        # fuera del _LOCK: el write-behind lo necesita
+        with _LOCK:
+            conn = _conn()
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE;")
+            try:
+                if cur.execute("SELECT 1 FROM semester WHERE name=?", (name,)).fetchone():
+                    raise ValueError(f"El semestre {name} ya existe")
+                cur.execute("INSERT INTO semester(name, opened_ts) VALUES(?,?)",
+                            (name, int(time.time())))
+                cur.execute("INSERT INTO room(type, adapted, status, semester) "
+                            "SELECT type, 0, 'FREE', ? FROM room WHERE semester=? ORDER BY id",
+                            (name, copy_from))
+                if cur.rowcount <= 0:
+                    _insert_rooms(cur, name, n_class, n_lab)
+                if make_current:
+                    cur.execute("UPDATE semester SET is_current=0 WHERE is_current=1")
+                    cur.execute("UPDATE semester SET is_current=1 WHERE name=?", (name,))
+            except Exception:
+                conn.rollback()
+                raise
+            conn.commit()
+            if make_current:
+                _CURRENT = name
+                _FREE_CACHE["version"] = None
+            _publish_changes(semester=name)
+        if make_current and _INVENTORY is not None:
+            enable_memory_inventory()   # recarga las listas libres del nuevo semestre
+
+    def close_semester(self, name: str):
+        if name == self.current_semester():
+            raise ValueError("No se puede cerrar el semestre actual; abra otro primero")
+        with _LOCK:
+            cur = _conn().execute(
+                "UPDATE semester SET state='CLOSED', closed_ts=? WHERE name=? AND state='OPEN'",
+                (int(time.time()), name))
+            if cur.rowcount:
+                _publish_changes(semester=name)
+
+    def free_counts(self) -> tuple[int, int]:
+        global _CURRENT
+        if _INVENTORY is not None:
+            return _INVENTORY.free_counts()
+        if STORAGE_MODE == "local":
+            # WAL: lectura en la conexión del hilo, sin esperar al escritor.
+            cur = _conn().execute(
+                "SELECT type, free FROM room_counters WHERE semester=?", (self.current_semester(),))
+            data = {row["type"]: row["free"] for row in cur.fetchall()}
+            return data.get("CLASS", 0), data.get("LAB", 0)
+        with _LOCK:
+            # data_version sólo cambia si OTRA conexión (p. ej. el servidor par)
+            # hizo commit; nuestros propios cambios se aplican con _bump_free().
+            version = _conn().execute("PRAGMA data_version").fetchone()[0]
+            if _FREE_CACHE["version"] != version:
+                _CURRENT = None         # el par pudo abrir otro semestre
+                cur = _conn().execute(
+                    "SELECT type, free FROM room_counters WHERE semester=?", (self.current_semester(),))
+                data = {row["type"]: row["free"] for row in cur.fetchall()}
+                _FREE_CACHE.update(version=version,
+                                   CLASS=data.get("CLASS", 0), LAB=data.get("LAB", 0))
+            return _FREE_CACHE["CLASS"], _FREE_CACHE["LAB"]
+
+    # ──────────────────────────────────────────────────────────
+    # Reservas
+    def allocate_rooms(self, n_class: int, n_lab: int, faculty_id: int, program_id: int) -> int:
+        if _INVENTORY is not None:
+            return _INVENTORY.allocate(n_class, n_lab, faculty_id, program_id)
+        res_id = _run_tx(_allocate_tx, n_class, n_lab, faculty_id, program_id)
+        _publish_changes([res_id])
+        return res_id
+
+    def allocate_rooms_batch(self, requests: list) -> list[tuple]:
+        if _INVENTORY is not None:
+            outcomes = []
+            for n_class, n_lab, fid, pid in requests:
+                try:
+                    outcomes.append((_INVENTORY.allocate(n_class, n_lab, fid, pid), None))
+                except ValueError as e:
+                    outcomes.append((None, str(e)))
+            return outcomes
+        outcomes = _run_tx(_allocate_batch_tx, requests)
+        _publish_changes([res_id for res_id, _ in outcomes if res_id is not None])
+        return outcomes
+
+    def confirm_reservation(self, res_id: int) -> bool:
+        if _INVENTORY is not None:
+            return _INVENTORY.confirm(res_id)
+        confirmed = _run_tx(_confirm_tx, res_id)
+        if confirmed:
+            _publish_changes([res_id])
+        return confirmed
+
+    def fail_reservation(self, res_id: int):
+        if _INVENTORY is not None:
+            return _INVENTORY.fail(res_id)
+        _run_tx(_fail_tx, res_id)
+        _publish_changes([res_id])
+
+    def expire_leases(self, cutoff: int, limit: int) -> int:
+        if _INVENTORY is not None:
+            return _INVENTORY.expire(cutoff, limit)
+        released = _run_tx(_expire_tx, cutoff, limit)
+        _publish_changes(released)
+        return len(released)
+
+    # ──────────────────────────────────────────────────────────
+    # Catálogo y servidores
+    def ensure_faculty(self, faculty_id: int, name: str, semester: str):
+        if _CATALOG is None:
+            preload_catalog()
+        if faculty_id in _CATALOG["faculty"]:
+            return
+        _run_tx(_ensure_faculty_tx, faculty_id, name, semester)
+        _CATALOG["faculty"].add(faculty_id)
+        _publish_changes(faculty_ids=[faculty_id])
+
+    def ensure_program(self, program_id: int, faculty_id: int, name: str, semester: str):
+        if _CATALOG is None:
+            preload_catalog()
+        if program_id in _CATALOG["program"]:
+            return
+        _run_tx(_ensure_program_tx, program_id, faculty_id, name, semester)
+        _CATALOG["program"].add(program_id)
+        _publish_changes(program_ids=[program_id])
+
+    def register_server(self, host: str, role: str):
+        with _LOCK:
+            _conn().execute("INSERT OR REPLACE INTO server(host,role,last_hb) VALUES(?,?,?)",
+                            (host, role, int(time.time())))
+
+    # ──────────────────────────────────────────────────────────
+    # Métricas
+    def record_event_metric(self, kind: str, value: float, src: str, dst: str = None):
+        if METRICS_ASYNC:
+            _metric_sink().record(kind, value, int(time.time()), src, dst)
+            return
+        # Modo síncrono: se utiliza el _LOCK y _conn() existentes en datastore.py para
+        # asegurar la consistencia y el manejo adecuado de la conexión a la base de datos.
+        # El INSERT por la vista también acumula en metric_rollup (trg_metric_rollup).
+        with _LOCK:
+            current_ts = int(time.time()) # Timestamp actual en epoch segundos
+            conn = _conn() # Obtiene la conexión singleton a la BD
+            conn.execute(
+                "INSERT INTO metric(kind, value, ts, src, dst) VALUES(?,?,?,?,?)",
+                (kind, value, current_ts, src, dst)
+            )
+            conn.commit() # Realiza el commit para asegurar que los datos se escriban
+                          # Consistente con otras funciones en datastore.py que modifican datos.
+
+    def metric_percentiles(self, kind: str, since: int = None, until: int = None,
+                           src: str = None, res_s: int = 60) -> dict:
+        import rollup
+        sql = ("SELECT r.* FROM metric_rollup r JOIN metric_kind k ON k.id = r.kind_id "
+               "WHERE k.name = ? AND r.res_s = ?")
+        params: list = [kind, res_s]
+        if since is not None:
+            sql += " AND r.bucket_ts >= ?"; params.append(since - since % res_s)
+        if until is not None:
+            sql += " AND r.bucket_ts < ?"; params.append(until)
+        if src is not None:
+            sql += " AND r.src_id = (SELECT id FROM endpoint WHERE name = ?)"; params.append(src)
+        return rollup.percentiles(_conn().execute(sql, params).fetchall())
 
+configure_backend(BACKEND_KIND)
@@ -0,0 +1,326 @@
+"""
+Dispatch · Pool de workers adaptable según la espera en cola
+============================================================
+• FrontendPump (un hilo) reemplaza a zmq.proxy:
+      frontend ROUTER ──► cola de trabajo (con marca de tiempo de llegada)
+      backend DEALER (+ extras, p. ej. RES del monitor de ACKs) ──► frontend
+  Los workers sólo ENVÍAN por el backend (DEALER conectado); ya no reciben
+  del reparto round-robin, sino de la cola. Con `admission`, una SOL que
+  supera el tope de TX abiertas se responde BUSY sin encolarse.
+• WorkerPool mantiene entre `min_workers` y `max_workers` hilos:
+  - cada POOL_TICK s mira la espera media en cola (llegada → recogida por un
+    worker) y la profundidad; si la espera supera GROW_WAIT_MS o hay más
+    mensajes encolados que workers, crece (hasta duplicar por tick);
+  - un worker sin trabajo durante IDLE_S s se retira si quedan más de
+    `min_workers`.
+• Métricas (datastore.record_event_metric, dst="dispatch"):
+      worker_pool_size  → al cambiar el tamaño
+      queue_wait_ms     → espera media del tick (si hubo mensajes)
+      queue_wait_max_ms → espera máxima del tick
+• FairQueue (--fair) reemplaza la cola FIFO del pool por un carril por
+  facultad (faculty_id de la SOL) atendidos por deficit round-robin con
+  pesos: una facultad que inunda el servidor sólo alarga su propio carril.
+  ACKs y demás mensajes van a un carril prioritario. Por facultad se
+  registran fair_queue_depth, fair_wait_ms y fair_wait_max_ms
+  (dst="Facultad:<id>").
+"""
+
+import collections, queue, threading, time
+
+import zmq
+
+from applog import LOG
+from datastore import record_event_metric
+
+POOL_TICK    = 0.5     # s entre decisiones del controlador
+GROW_WAIT_MS = 10.0    # espera media en cola que dispara crecimiento
+IDLE_S       = 15.0    # s sin trabajo tras los que un worker sobrante se retira
+STOP_S       = 5.0     # s que stop() espera a que terminen controlador y workers
+
+
+class FrontendPump:
+
+    def __init__(self, frontend: zmq.Socket, backend: zmq.Socket, work: queue.Queue, extra_outbound=(),
+                 admission=None):
+        self.frontend, self.backend, self.work = frontend, backend, work
+        self.admission = admission              # admission.Admission: RES BUSY en vez de encolar
+        self.outbound = [backend, *extra_outbound]
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        poller = zmq.Poller()
+        poller.register(self.frontend, zmq.POLLIN)
+        for sock in self.outbound:
+            poller.register(sock, zmq.POLLIN)
+        try:
+            while not self._stop.is_set():
+                ready = dict(poller.poll(200))
+                if self.frontend in ready:
+                    frames = self.frontend.recv_multipart()
+                    busy = self.admission.admit(frames) if self.admission else None
+                    if busy is None:
+                        self.work.put((time.monotonic(), frames))
+                    else:
+                        self.frontend.send_multipart(busy)
+                for sock in self.outbound:
+                    if sock in ready:
+                        self.frontend.send_multipart(sock.recv_multipart())
+                if self.admission:
+                    self.admission.tick()
+        finally:
+            for sock in (self.frontend, *self.outbound):   # sólo este hilo los usa
+                sock.close(linger=0)
+
+    def stop(self):
+        self._stop.set()
+        self.thread.join()
+
+
+def parse_weights(spec: str) -> dict:
+    """'1=3,4=0.5' → {'1': 3.0, '4': 0.5}. ValueError si el formato o un peso no es válido."""
+    weights = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        key, _, weight = part.partition("=")
+        key, weight = key.strip(), float(weight)
+        if not weight > 0:
+            raise ValueError(f"peso no positivo para la facultad {key}")
+        weights[key] = weight
+    return weights
+
+
+def parse_bounds(spec: str) -> tuple[int, int]:
+    """'2:8' → (2, 8). ValueError si no son dos enteros con 1 <= MIN <= MAX."""
+    parts = spec.split(":")
+    if len(parts) != 2 or not all(p.strip().isdigit() for p in parts):
+        raise ValueError(f"se esperaba MIN:MAX enteros, no '{spec}'")
+    lo, hi = (int(p) for p in parts)
+    if not 1 <= lo <= hi:
+        raise ValueError(f"se requiere 1 <= MIN <= MAX ({lo}:{hi})")
+    return lo, hi
+
+
+def faculty_classifier(wire):
+    """Clave de FairQueue: faculty_id de una SOL; None (carril prioritario) para el resto."""
+    def classify(frames: list):
+        if len(frames) != 3:
+            return None
+        try:
+            msg = wire.decode(frames[0], frames[2])
+        except (ValueError, UnicodeDecodeError):
+            return None                                  # lo informa el worker
+        if isinstance(msg, dict) and msg.get("tipo") == "SOL":
+            return msg.get("faculty_id", "?")
+        return None
+    return classify
+
+
+class FairQueue:
+    """
+    Cola de trabajo del pool con la interfaz de queue.Queue que usan el pump
+    y los workers: put((llegada, frames)), get(timeout), get_nowait(), qsize().
+    `classify(frames)` da la facultad del mensaje, o None para el carril
+    prioritario. Al llegar su turno, un carril con déficit < 1 suma su peso
+    (por defecto 1) y atiende un mensaje por unidad de déficit.
+    """
+
+    def __init__(self, classify, weights: dict = None):
+        self.classify = classify
+        self.weights = {str(k): float(w) for k, w in (weights or {}).items()}
+        self._cond = threading.Condition()
+        self._priority: collections.deque = collections.deque()
+        self._lanes: dict[str, collections.deque] = {}
+        self._deficit: dict[str, float] = {}
+        self._turns: collections.deque = collections.deque()    # facultades con mensajes, en orden de turno
+        self._size = 0
+        self._waits: dict[str, list[float]] = {}                # esperas (s) por facultad desde el último report()
+
+    def put(self, item: tuple):
+        key = self.classify(item[1])
+        with self._cond:
+            if key is None:
+                self._priority.append(item)
+            else:
+                key = str(key)
+                lane = self._lanes.get(key)
+                if lane is None:
+                    lane = self._lanes[key] = collections.deque()
+                    self._deficit[key] = 0.0
+                    self._turns.append(key)
+                lane.append(item)
+            self._size += 1
+            self._cond.notify()
+
+    def get(self, block: bool = True, timeout: float = None) -> tuple:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._size, timeout if block else 0):
+                raise queue.Empty
+            self._size -= 1
+            if self._priority:
+                return self._priority.popleft()
+            return self._next()
+
+    def get_nowait(self) -> tuple:
+        return self.get(block=False)
+
+    def qsize(self) -> int:
+        return self._size
+
+    def _next(self) -> tuple:
+        while True:
+            key = self._turns[0]
+            if self._deficit[key] < 1.0:
+                self._deficit[key] += self.weights.get(key, 1.0)
+                if self._deficit[key] < 1.0:               # peso < 1: junta déficit en otra vuelta
+                    self._turns.rotate(-1)
+                    continue
+            lane = self._lanes[key]
+            item = lane.popleft()
+            self._deficit[key] -= 1.0
+            self._waits.setdefault(key, []).append(time.monotonic() - item[0])
+            if not lane:                                   # sin mensajes: pierde el turno y el déficit
+                del self._lanes[key], self._deficit[key]
+                self._turns.popleft()
+            elif self._deficit[key] < 1.0:
+                self._turns.rotate(-1)
+            return item
+
+    def stats(self) -> dict:
+        """Profundidad por facultad (y del carril prioritario)."""
+        with self._cond:
+            return {"priority": len(self._priority), **{key: len(lane) for key, lane in self._lanes.items()}}
+
+    def report(self, src: str):
+        """Registra profundidad y espera de cada facultad con actividad desde la llamada anterior."""
+        with self._cond:
+            waits, self._waits = self._waits, {}
+            depths = {key: len(lane) for key, lane in self._lanes.items()}
+        for key in sorted(depths.keys() | waits.keys()):
+            dst = f"Facultad:{key}"
+            record_event_metric("fair_queue_depth", depths.get(key, 0), src, dst)
+            if waits.get(key):
+                record_event_metric("fair_wait_ms", sum(waits[key]) / len(waits[key]) * 1000, src, dst)
+                record_event_metric("fair_wait_max_ms", max(waits[key]) * 1000, src, dst)
+
+
+class WorkerPool:
+    """
+    `handle(sock, worker_id, batch)` procesa una lista de mensajes (frames)
+    y responde por `sock`, un DEALER propio del worker conectado a
+    `backend_ep`. Cada worker toma hasta `batch_max` mensajes por vuelta
+    de `work` (por defecto una queue.Queue FIFO; FairQueue con --fair).
+    """
+
+    def __init__(self, ctx: zmq.Context, backend_ep: str, handle, min_workers: int, max_workers: int,
+                 batch_max: int = 1, src: str = "Servidor", work=None):
+        self.ctx, self.backend_ep, self.handle = ctx, backend_ep, handle
+        self.min_workers, self.max_workers = max(1, min_workers), max(1, min_workers, max_workers)
+        self.batch_max, self.src = max(1, batch_max), src
+        self.work: queue.Queue = queue.Queue() if work is None else work
+        self._lock = threading.Lock()
+        self._size = 0
+        self._next_id = 0
+        self._waits: list[float] = []          # esperas (s) del tick en curso
+        self._stop = threading.Event()
+        self._threads: set[threading.Thread] = set()   # workers vivos (para stop())
+        for _ in range(self.min_workers):
+            self._spawn()
+        record_event_metric("worker_pool_size", self._size, self.src, "dispatch")
+        self._controller = threading.Thread(target=self._control, daemon=True)
+        self._controller.start()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    # ──────────────────────────────────────────────────────────
+    def _spawn(self):
+        with self._lock:
+            worker_id = self._next_id
+            self._next_id += 1
+            self._size += 1
+            thread = threading.Thread(target=self._worker, args=(worker_id,), daemon=True)
+            self._threads.add(thread)
+        thread.start()
+
+    def _retire(self) -> bool:
+        with self._lock:
+            if self._size <= self.min_workers:
+                return False
+            self._size -= 1
+        return True
+
+    def _worker(self, worker_id: int):
+        sock = self.ctx.socket(zmq.DEALER)
+        sock.connect(self.backend_ep)
+        idle_since = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                try:
+                    # Espera corta: stop() no tiene que esperar IDLE_S para unir al worker
+                    t_in, frames = self.work.get(timeout=POOL_TICK)
+                except queue.Empty:
+                    if time.monotonic() - idle_since < IDLE_S:
+                        continue
+                    idle_since = time.monotonic()
+                    if self._retire():
+                        LOG.info(f"\nℹ️ INFO: Pool: W-{worker_id} ocioso se retira (workers: {self._size}).")
+                        record_event_metric("worker_pool_size", self._size, self.src, "dispatch")
+                        return
+                    continue
+                now = time.monotonic()
+                waits, batch = [now - t_in], [frames]
+                while len(batch) < self.batch_max:
+                    try:
+                        t_in, frames = self.work.get_nowait()
+                    except queue.Empty:
+                        break
+                    waits.append(now - t_in)
+                    batch.append(frames)
+                idle_since = now
+                with self._lock:
+                    self._waits.extend(waits)
+                try:
+                    self.handle(sock, worker_id, batch)
+                except Exception as e:
+                    LOG.error(f"\n❗ ERROR: Pool: W-{worker_id}: Excepción procesando lote: {e!r}")
+        finally:
+            sock.close(linger=0)
+            with self._lock:
+                self._threads.discard(threading.current_thread())
+
+    def _control(self):
+        while not self._stop.wait(POOL_TICK):
+            with self._lock:
+                waits, self._waits = self._waits, []
+                size = self._size
+            depth = self.work.qsize()
+            if isinstance(self.work, FairQueue):
+                self.work.report(self.src)
+            if waits:
+                mean_ms = sum(waits) / len(waits) * 1000
+                record_event_metric("queue_wait_ms", mean_ms, self.src, "dispatch")
+                record_event_metric("queue_wait_max_ms", max(waits) * 1000, self.src, "dispatch")
+            else:
+                mean_ms = 0.0
+            if size < self.max_workers and (mean_ms > GROW_WAIT_MS or depth > size):
+                grow = min(self.max_workers - size, max(1, depth - size), size)   # como mucho duplica
+                for _ in range(grow):
+                    self._spawn()
+                LOG.info(f"\nℹ️ INFO: Pool: +{grow} workers (total: {self._size}, espera media "
+                         f"{mean_ms:.1f} ms, en cola {depth}).")
+                record_event_metric("worker_pool_size", self._size, self.src, "dispatch")
+
+    def stop(self):
+        """Detiene controlador y workers y espera (hasta STOP_S) a que cierren sus sockets."""
+        self._stop.set()
+        deadline = time.monotonic() + STOP_S
+        self._controller.join(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        alive = sum(t.is_alive() for t in threads)
+        if alive:
+            LOG.warning(f"\n⚠️ WARNING: Pool: {alive} workers siguen ocupados tras {STOP_S:.0f} s de stop().")
@@ -5,16 +5,21 @@ faculty.py    Puerta de enlace Facultad ⇄ Servidor (Asíncrono)
 • REP  para los Programas Académicos  (tcp://*:6000)
 • DEALER para los brokers primario + backup (se conecta al activo)
 • Métricas de procesamiento y roundtrip integradas.
+• --wire bin: SOL/ACK en formato binario compacto (wire); a cada programa
+  se le responde en el formato en que preguntó.
 • Salida en consola optimizada.
 """
 
 import argparse
-import json
 import threading
 import time
 import uuid
 import zmq
 
+import applog
+import wire
+from applog import LOG, install_dump_signal
+
 # Importar funciones de datastore.py
 try:
     from datastore import ensure_faculty, ensure_program, record_event_metric
@@ -33,6 +38,7 @@ BACKUP_HB_EP  = "tcp://10.43.103.51:7000"
 
 HB_INTERVAL = 1.0
 HB_LIVENESS = 3
+WIRE_FORMAT = wire.DEFAULT_FORMAT  # "json" | "bin" hacia el servidor
 
 # --- Iconos ---
 ICON_HB_PRIMARY_UP = "🟢"
@@ -55,6 +61,12 @@ ICON_CLOCK = "⏱️"
 # Para gestionar la conexión del socket DEALER y el estado del servidor activo
 active_server_endpoint_faculty = None
 faculty_dealer_socket_lock = threading.Lock()
+# Último mensaje (SOL o ACK) de cada TX sin RES, ya codificado. Al cambiar de
+# servidor se reenvía: el nuevo activo adoptó la TX (--mirror) y responde la
+# misma PROP/RES. Sin --mirror (o si vuelve al mismo servidor) éste reconoce
+# la SOL por transaction_id y no reserva dos veces. Protegido por
+# faculty_dealer_socket_lock.
+unanswered: dict[str, bytes] = {}
 
 def heartbeat_monitor_faculty(dealer_socket: zmq.Socket, faculty_id: int):
     global active_server_endpoint_faculty
@@ -75,7 +87,7 @@ def heartbeat_monitor_faculty(dealer_socket: zmq.Socket, faculty_id: int):
     last_primary_hb = 0.0
     last_backup_hb = 0.0
     
-    print(f"{ICON_HB} FACULTY (ID:{faculty_id}) [HBMon]: Monitor de Heartbeats (Async) iniciado.", flush=True)
+    LOG.info(f"{ICON_HB} FACULTY (ID:{faculty_id}) [HBMon]: Monitor de Heartbeats (Async) iniciado.")
 
     while True:
         socks_hb = dict(poller_hb.poll(int(HB_INTERVAL * 1000)))
@@ -98,9 +110,9 @@ def heartbeat_monitor_faculty(dealer_socket: zmq.Socket, faculty_id: int):
                 if active_server_endpoint_faculty:
                     try:
                         dealer_socket.disconnect(active_server_endpoint_faculty)
-                        print(f"{ICON_HB} FACULTY (ID:{faculty_id}) [HBMon]: Desconectado de {active_server_endpoint_faculty}.", flush=True)
+                        LOG.info(f"{ICON_HB} FACULTY (ID:{faculty_id}) [HBMon]: Desconectado de {active_server_endpoint_faculty}.")
                     except zmq.ZMQError as e:
-                        print(f"{ICON_ERROR} FACULTY (ID:{faculty_id}) [HBMon]: Error al desconectar de {active_server_endpoint_faculty}: {e}", flush=True)
+                        LOG.error(f"{ICON_ERROR} FACULTY (ID:{faculty_id}) [HBMon]: Error al desconectar de {active_server_endpoint_faculty}: {e}")
                 
                 active_server_endpoint_faculty = new_chosen_endpoint
                 
@@ -108,12 +120,16 @@ def heartbeat_monitor_faculty(dealer_socket: zmq.Socket, faculty_id: int):
                     try:
                         dealer_socket.connect(active_server_endpoint_faculty)
                         status_icon = ICON_HB_PRIMARY_UP if active_server_endpoint_faculty == PRIMARY_EP else ICON_HB_BACKUP_UP
-                        print(f"{ICON_HB} FACULTY (ID:{faculty_id}) [HBMon]: Conectado a {active_server_endpoint_faculty} {status_icon}.", flush=True)
+                        LOG.info(f"{ICON_HB} FACULTY (ID:{faculty_id}) [HBMon]: Conectado a {active_server_endpoint_faculty} {status_icon}.")
+                        for payload in unanswered.values():
+                            dealer_socket.send_multipart([b'', payload])
+                        if unanswered:
+                            LOG.info(f"{ICON_HB} FACULTY (ID:{faculty_id}) [HBMon]: {len(unanswered)} TX en curso reenviadas a {active_server_endpoint_faculty}.")
                     except zmq.ZMQError as e:
-                        print(f"{ICON_ERROR} FACULTY (ID:{faculty_id}) [HBMon]: Error al conectar a {active_server_endpoint_faculty}: {e}", flush=True)
+                        LOG.error(f"{ICON_ERROR} FACULTY (ID:{faculty_id}) [HBMon]: Error al conectar a {active_server_endpoint_faculty}: {e}")
                         active_server_endpoint_faculty = None # Falló la conexión
                 elif not active_server_endpoint_faculty : # No hay primario ni backup vivo
-                    print(f"{ICON_HB} {ICON_HB_ALL_DOWN} FACULTY (ID:{faculty_id}) [HBMon]: Ningún servidor disponible.", flush=True)
+                    LOG.info(f"{ICON_HB} {ICON_HB_ALL_DOWN} FACULTY (ID:{faculty_id}) [HBMon]: Ningún servidor disponible.")
         
         time.sleep(HB_INTERVAL / 2)
 
@@ -147,14 +163,21 @@ def faculty_worker(ctx: zmq.Context, dealer_socket: zmq.Socket, faculty_id: int,
     # pero el poller nos dirá cuándo rep_socket es legible.
     # Como REP es síncrono, cuando recibimos en rep_socket, la próxima respuesta es para ese cliente.
 
-    print(f"\n🏫 Facultad Async '{faculty_name}' (ID={faculty_id}) lista en tcp://*:{port}", flush=True)
+    LOG.info(f"\n🏫 Facultad Async '{faculty_name}' (ID={faculty_id}) lista en tcp://*:{port}")
 
     while True:
         socks = dict(poller_worker.poll(timeout=1000)) # Poll con timeout
 
         if rep_socket in socks and socks[rep_socket] == zmq.POLLIN:
             t_start_faculty_processing = time.perf_counter_ns()
-            prog_req = rep_socket.recv_json()
+            prog_raw = rep_socket.recv()
+            prog_fmt = "bin" if wire.is_binary(prog_raw) else "json"
+            try:
+                prog_req = wire.decode(prog_raw)
+            except (ValueError, UnicodeDecodeError) as e:
+                LOG.error(f"{ICON_ERROR} FACULTY (ID:{faculty_id}): Solicitud de programa ilegible: {e}. Payload: {prog_raw}", key="payload")
+                rep_socket.send(wire.encode({"tipo":"RES", "status":"ERROR_FACULTY_BAD_REQUEST", "reason":str(e)}, prog_fmt))
+                continue
             prog_name = prog_req.get("programa", "UnknownProg")
             prog_id = ProgramMapper.next_id(prog_name, faculty_id, semester)
             tx_id = uuid.uuid4().hex[:8]
@@ -165,13 +188,13 @@ def faculty_worker(ctx: zmq.Context, dealer_socket: zmq.Socket, faculty_id: int,
                 "facultad": faculty_name, "semester": semester
             }
             
-            print(f"\n{ICON_SOL_RECEIVED} FACULTY (ID:{faculty_id}): SOL (tx:{tx_id}) de Prog:'{prog_name}'.", flush=True)
+            LOG.debug(f"\n{ICON_SOL_RECEIVED} FACULTY (ID:{faculty_id}): SOL (tx:{tx_id}) de Prog:'{prog_name}'.")
 
             with faculty_dealer_socket_lock: # Asegurar que el endpoint no cambie durante el send
                 if not active_server_endpoint_faculty:
-                    print(f"{ICON_ERROR} FACULTY (ID:{faculty_id}): No hay servidor activo para enviar SOL (tx:{tx_id}).", flush=True)
+                    LOG.error(f"{ICON_ERROR} FACULTY (ID:{faculty_id}): No hay servidor activo para enviar SOL (tx:{tx_id}).", key="sin_servidor")
                     final_response_to_program = {"tipo":"RES", "status":"ERROR_FACULTY_NO_SERVER", "reason":"No active server", "transaction_id":tx_id}
-                    rep_socket.send_json(final_response_to_program)
+                    rep_socket.send(wire.encode(final_response_to_program, prog_fmt))
                     # Registrar métrica de tiempo de procesamiento aunque falle
                     t_end_faculty_processing = time.perf_counter_ns()
                     record_event_metric("faculty_processing_total_ms", (t_end_faculty_processing - t_start_faculty_processing)/1e6, f"FacultadAsync:{faculty_id}", f"Programa:{prog_name}")
@@ -179,38 +202,41 @@ def faculty_worker(ctx: zmq.Context, dealer_socket: zmq.Socket, faculty_id: int,
             
                 try:
                     # El socket DEALER envía [empty_frame, message_payload]
-                    dealer_socket.send_multipart([b'', json.dumps(sol_to_server).encode('utf-8')])
+                    unanswered[tx_id] = wire.encode(sol_to_server, WIRE_FORMAT)
+                    dealer_socket.send_multipart([b'', unanswered[tx_id]])
                     transaction_info[tx_id] = {
                         'sol_sent_ts': time.perf_counter_ns(),
                         'program_name': prog_name, # Guardar para la métrica de procesamiento total
+                        'program_fmt': prog_fmt, # Formato (json/bin) en que se responde al programa
                         'start_faculty_processing_ts': t_start_faculty_processing # Para faculty_processing_total_ms
                     }
-                    print(f"{ICON_SOL_SENT} FACULTY (ID:{faculty_id}): SOL (tx:{tx_id}) enviada a {active_server_endpoint_faculty}.", flush=True)
+                    LOG.debug(f"{ICON_SOL_SENT} FACULTY (ID:{faculty_id}): SOL (tx:{tx_id}) enviada a {active_server_endpoint_faculty}.")
                 except zmq.ZMQError as e:
-                    print(f"{ICON_ERROR} FACULTY (ID:{faculty_id}): ZMQError al enviar SOL (tx:{tx_id}): {e}", flush=True)
+                    LOG.error(f"{ICON_ERROR} FACULTY (ID:{faculty_id}): ZMQError al enviar SOL (tx:{tx_id}): {e}")
                     final_response_to_program = {"tipo":"RES", "status":"ERROR_FACULTY_SEND_FAILED", "reason":str(e), "transaction_id":tx_id}
-                    rep_socket.send_json(final_response_to_program)
+                    rep_socket.send(wire.encode(final_response_to_program, prog_fmt))
                     t_end_faculty_processing = time.perf_counter_ns()
                     record_event_metric("faculty_processing_total_ms", (t_end_faculty_processing - t_start_faculty_processing)/1e6, f"FacultadAsync:{faculty_id}", f"Programa:{prog_name}")
                     if tx_id in transaction_info: del transaction_info[tx_id] # Limpiar
+                    unanswered.pop(tx_id, None)
 
         elif dealer_socket in socks and socks[dealer_socket] == zmq.POLLIN:
             # Mensaje del servidor (PROP o RES)
             # DEALER recibe [empty_frame, message_payload] del ROUTER del servidor
             frames = dealer_socket.recv_multipart()
             if len(frames) < 2: # Debería tener al menos el frame vacío y el payload
-                print(f"{ICON_ERROR} FACULTY (ID:{faculty_id}): Mensaje incompleto del servidor: {frames}", flush=True)
+                LOG.error(f"{ICON_ERROR} FACULTY (ID:{faculty_id}): Mensaje incompleto del servidor: {frames}")
                 continue
             
             try:
-                server_msg = json.loads(frames[1].decode('utf-8')) # El payload está en el segundo frame
-            except (json.JSONDecodeError, UnicodeDecodeError) as e:
-                print(f"{ICON_ERROR} FACULTY (ID:{faculty_id}): Error decodificando mensaje del servidor: {e}. Payload: {frames[1]}", flush=True)
+                server_msg = wire.decode(frames[1]) # El payload está en el segundo frame (JSON o binario)
+            except (ValueError, UnicodeDecodeError) as e:
+                LOG.error(f"{ICON_ERROR} FACULTY (ID:{faculty_id}): Error decodificando mensaje del servidor: {e}. Payload: {frames[1]}", key="decode")
                 continue
 
             tx_id_recv = server_msg.get("transaction_id")
             if not tx_id_recv or tx_id_recv not in transaction_info:
-                print(f"{ICON_WARNING} FACULTY (ID:{faculty_id}): Mensaje del servidor para TX desconocida o no rastreada: {tx_id_recv}", flush=True)
+                LOG.warning(f"{ICON_WARNING} FACULTY (ID:{faculty_id}): Mensaje del servidor para TX desconocida o no rastreada: {tx_id_recv}", key="tx_desconocida")
                 continue
             
             current_tx_info = transaction_info[tx_id_recv]
@@ -220,24 +246,25 @@ def faculty_worker(ctx: zmq.Context, dealer_socket: zmq.Socket, faculty_id: int,
                 if 'sol_sent_ts' in current_tx_info:
                     roundtrip_ms = (t_prop_received_ns - current_tx_info['sol_sent_ts']) / 1e6
                     record_event_metric("faculty_server_sol_prop_roundtrip_ms", roundtrip_ms, f"FacultadAsync:{faculty_id}", "ServidorAsync")
-                    print(f"{ICON_CLOCK} FACULTY (ID:{faculty_id}): Métrica 'sol_prop_roundtrip' (tx:{tx_id_recv}): {roundtrip_ms:.2f} ms.", flush=True)
+                    LOG.debug(f"{ICON_CLOCK} FACULTY (ID:{faculty_id}): Métrica 'sol_prop_roundtrip' (tx:{tx_id_recv}): {roundtrip_ms:.2f} ms.")
                 
-                print(f"{ICON_PROP_RECEIVED} FACULTY (ID:{faculty_id}): PROP (tx:{tx_id_recv}) recibida. Enviando ACK.", flush=True)
+                LOG.debug(f"{ICON_PROP_RECEIVED} FACULTY (ID:{faculty_id}): PROP (tx:{tx_id_recv}) recibida. Enviando ACK.")
                 ack_to_server = {"tipo":"ACK", "transaction_id":tx_id_recv, "confirm":"ACCEPT", "facultad": faculty_name} # Añadir facultad para métricas del servidor
                 
                 with faculty_dealer_socket_lock: # Proteger el envío
+                    unanswered[tx_id_recv] = wire.encode(ack_to_server, WIRE_FORMAT)
                     if not active_server_endpoint_faculty:
-                        print(f"{ICON_ERROR} FACULTY (ID:{faculty_id}): No hay servidor activo para enviar ACK (tx:{tx_id_recv}).", flush=True)
-                        # ¿Cómo notificar al programa? La transacción está a medias.
-                        # Podríamos intentar guardar el estado y reintentar o marcar como fallida.
-                        # Por ahora, logueamos. El servidor eventualmente hará timeout del ACK.
+                        LOG.error(f"{ICON_ERROR} FACULTY (ID:{faculty_id}): No hay servidor activo para enviar ACK (tx:{tx_id_recv}).", key="sin_servidor")
+                        # La transacción está a medias: el ACK queda en 'unanswered' y el
+                        # monitor de HB lo reenvía al conectar con el próximo activo
+                        # (o el servidor hará timeout del ACK).
                         continue
                     try:
-                        dealer_socket.send_multipart([b'', json.dumps(ack_to_server).encode('utf-8')])
+                        dealer_socket.send_multipart([b'', unanswered[tx_id_recv]])
                         current_tx_info['ack_sent_ts'] = time.perf_counter_ns()
-                        print(f"{ICON_ACK_SENT} FACULTY (ID:{faculty_id}): ACK (tx:{tx_id_recv}) enviado a {active_server_endpoint_faculty}.", flush=True)
+                        LOG.debug(f"{ICON_ACK_SENT} FACULTY (ID:{faculty_id}): ACK (tx:{tx_id_recv}) enviado a {active_server_endpoint_faculty}.")
                     except zmq.ZMQError as e:
-                         print(f"{ICON_ERROR} FACULTY (ID:{faculty_id}): ZMQError al enviar ACK (tx:{tx_id_recv}): {e}", flush=True)
+                         LOG.error(f"{ICON_ERROR} FACULTY (ID:{faculty_id}): ZMQError al enviar ACK (tx:{tx_id_recv}): {e}")
                          # La transacción podría quedar inconsistente aquí
             
             elif server_msg.get("tipo") == "RES":
@@ -245,27 +272,28 @@ def faculty_worker(ctx: zmq.Context, dealer_socket: zmq.Socket, faculty_id: int,
                 if 'ack_sent_ts' in current_tx_info:
                     roundtrip_ms = (t_res_received_ns - current_tx_info['ack_sent_ts']) / 1e6
                     record_event_metric("faculty_server_ack_res_roundtrip_ms", roundtrip_ms, f"FacultadAsync:{faculty_id}", "ServidorAsync")
-                    print(f"{ICON_CLOCK} FACULTY (ID:{faculty_id}): Métrica 'ack_res_roundtrip' (tx:{tx_id_recv}): {roundtrip_ms:.2f} ms.", flush=True)
+                    LOG.debug(f"{ICON_CLOCK} FACULTY (ID:{faculty_id}): Métrica 'ack_res_roundtrip' (tx:{tx_id_recv}): {roundtrip_ms:.2f} ms.")
                 elif server_msg.get("status") != "ACCEPTED": # Ej. RES DENIED o CANCELED directo
                     # Si es una RES sin ACK previo (DENIED/CANCELED por el servidor tras SOL)
                     # podemos calcular el roundtrip desde sol_sent_ts si lo tenemos
                     if 'sol_sent_ts' in current_tx_info:
                         sol_res_direct_ms = (t_res_received_ns - current_tx_info['sol_sent_ts']) / 1e6
                         # Podríamos loguear esto como un tipo de métrica diferente si es útil
-                        print(f"{ICON_CLOCK} FACULTY (ID:{faculty_id}): Métrica 'sol_res_direct_roundtrip' (tx:{tx_id_recv}): {sol_res_direct_ms:.2f} ms.", flush=True)
+                        LOG.debug(f"{ICON_CLOCK} FACULTY (ID:{faculty_id}): Métrica 'sol_res_direct_roundtrip' (tx:{tx_id_recv}): {sol_res_direct_ms:.2f} ms.")
 
-                print(f"{ICON_RES_RECEIVED} FACULTY (ID:{faculty_id}): RES (tx:{tx_id_recv}, status:{server_msg.get('status')}) recibida.", flush=True)
-                rep_socket.send_json(server_msg) # Enviar al programa académico
-                print(f"{ICON_RES_SENT} FACULTY (ID:{faculty_id}): Respuesta final (tx:{tx_id_recv}) enviada a Prog:'{current_tx_info.get('program_name')}'.", flush=True)
+                LOG.debug(f"{ICON_RES_RECEIVED} FACULTY (ID:{faculty_id}): RES (tx:{tx_id_recv}, status:{server_msg.get('status')}) recibida.")
+                rep_socket.send(wire.encode(server_msg, current_tx_info.get('program_fmt', 'json'))) # Enviar al programa académico
+                LOG.debug(f"{ICON_RES_SENT} FACULTY (ID:{faculty_id}): Respuesta final (tx:{tx_id_recv}) enviada a Prog:'{current_tx_info.get('program_name')}'.")
                 
                 # Registrar métrica de tiempo de procesamiento total
                 if 'start_faculty_processing_ts' in current_tx_info:
                     t_end_faculty_processing = time.perf_counter_ns()
                     total_proc_time_ms = (t_end_faculty_processing - current_tx_info['start_faculty_processing_ts']) / 1e6
                     record_event_metric("faculty_processing_total_ms", total_proc_time_ms, f"FacultadAsync:{faculty_id}", f"Programa:{current_tx_info.get('program_name')}")
-                    print(f"{ICON_METRIC} FACULTY (ID:{faculty_id}): Métrica 'faculty_processing_total_ms' (tx:{tx_id_recv}): {total_proc_time_ms:.2f} ms.", flush=True)
+                    LOG.debug(f"{ICON_METRIC} FACULTY (ID:{faculty_id}): Métrica 'faculty_processing_total_ms' (tx:{tx_id_recv}): {total_proc_time_ms:.2f} ms.")
 
                 if tx_id_recv in transaction_info: del transaction_info[tx_id_recv] # Limpiar transacción
+                with faculty_dealer_socket_lock: unanswered.pop(tx_id_recv, None)
         
         # Limpieza de transacciones muy antiguas que no recibieron respuesta (timeout implícito)
         # Esto es para evitar que transaction_info crezca indefinidamente si el servidor nunca responde
@@ -276,22 +304,29 @@ def faculty_worker(ctx: zmq.Context, dealer_socket: zmq.Socket, faculty_id: int,
             if (now_clean_ts - info.get('ack_sent_ts', info.get('sol_sent_ts', 0))) / 1e9 > 30 # Timeout de 30s (ejemplo)
         ]
         for tx in tx_to_remove:
-            print(f"{ICON_WARNING} FACULTY (ID:{faculty_id}): Limpiando TX antigua/sin respuesta: {tx}", flush=True)
+            LOG.warning(f"{ICON_WARNING} FACULTY (ID:{faculty_id}): Limpiando TX antigua/sin respuesta: {tx}", key="tx_antigua")
             # Aquí podríamos necesitar enviar un error al REP socket si aún está esperando,
             # pero el REP es síncrono y ya habría procesado una nueva solicitud si esta está muy vieja.
             # Esto es más para limpiar el diccionario transaction_info.
             if tx in transaction_info: del transaction_info[tx]
+            with faculty_dealer_socket_lock: unanswered.pop(tx, None)
 
 
 def main():
-    global active_server_endpoint_faculty # Necesario para que HB monitor lo actualice
+    global active_server_endpoint_faculty, WIRE_FORMAT # Necesario para que HB monitor lo actualice
 
     ap = argparse.ArgumentParser()
     ap.add_argument("--faculty-id", type=int, required=True)
     ap.add_argument("--semester", default="2025-2")
     ap.add_argument("--faculty-name", default="IngenieríaAsync") # Diferenciar
     ap.add_argument("--port", type=int, default=6000, help="Puerto para escuchar a los programas académicos")
+    ap.add_argument("--wire", choices=wire.FORMATS, default=WIRE_FORMAT, help="Formato de SOL/ACK hacia el servidor")
+    ap.add_argument("--log-level", choices=["debug", "info", "warning", "error"], default=applog.DEFAULT_LEVEL,
+                    help="debug muestra el flujo de cada transacción")
     args = ap.parse_args()
+    LOG.set_level(args.log_level)
+    install_dump_signal() # SIGUSR1 → vuelca el anillo de log
+    WIRE_FORMAT = args.wire
 
     ensure_faculty(args.faculty_id, args.faculty_name, args.semester)
     ctx = zmq.Context()
@@ -311,7 +346,7 @@ def main():
     hb_thread = threading.Thread(target=heartbeat_monitor_faculty, args=(dealer_socket, args.faculty_id), daemon=True)
     hb_thread.start()
     
-    print(f"{ICON_INFO} FACULTY (ID:{args.faculty_id}) [Main]: Esperando que HB monitor establezca conexión (3s)...", flush=True)
+    LOG.info(f"{ICON_INFO} FACULTY (ID:{args.faculty_id}) [Main]: Esperando que HB monitor establezca conexión (3s)...")
     time.sleep(3.0) # Dar tiempo al HB monitor para la conexión inicial
 
     faculty_worker(ctx, dealer_socket, args.faculty_id, args.faculty_name, args.semester, args.port)
@@ -320,6 +355,6 @@ if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
-        print("\nCerrando facultad Async (Ctrl+C)...", flush=True)
+        LOG.info("\nCerrando facultad Async (Ctrl+C)...")
     finally:
-        print("Facultad Async terminada.", flush=True)
\ No newline at end of file
+        LOG.info("Facultad Async terminada.")
\ No newline at end of file
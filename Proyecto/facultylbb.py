@@ -3,17 +3,24 @@
 """
 faculty_lbb.py - Facultad LBB con selección dinámica de servidor (mediante HB)
                  y creación de socket REQ por transacción.
+                 Si el servidor activo cambia mientras se espera PROP/RES,
+                 la SOL/ACK se reenvía al nuevo activo (que adoptó la TX
+                 con --mirror).
                  Métricas de roundtrip y procesamiento integradas.
+                 --wire bin: SOL/ACK en formato binario compacto (wire).
                  Salida en consola optimizada.
 """
 
 import argparse
-import json
 import threading
 import time
 import uuid
 import zmq
 
+import applog
+import wire
+from applog import LOG, install_dump_signal
+
 # Importar funciones de datastore.py (con fallback)
 try:
     from datastore import ensure_faculty, ensure_program, record_event_metric
@@ -45,6 +52,7 @@ BACKUP_HB_EP  = "tcp://10.43.103.51:7000"
 
 HB_INTERVAL = 1.0
 HB_LIVENESS = 3
+REPLY_TIMEOUT_S = 15.0  # espera total por cada PROP/RES (también a través de un failover)
 
 active_server_endpoint_shared = None
 active_endpoint_lock = threading.Lock()
@@ -69,7 +77,7 @@ def heartbeat_monitor_dynamic(faculty_id: int):
     last_backup_hb_time = 0.0
     current_reported_active_server = None
 
-    print(f"{ICON_HB} FACULTYLBB (ID:{faculty_id}) [HBMonDyn]: Monitor de Heartbeats Dinámico iniciado.", flush=True)
+    LOG.info(f"{ICON_HB} FACULTYLBB (ID:{faculty_id}) [HBMonDyn]: Monitor de Heartbeats Dinámico iniciado.")
 
     while True:
         socks = dict(poller.poll(int(HB_INTERVAL * 1000)))
@@ -96,12 +104,53 @@ def heartbeat_monitor_dynamic(faculty_id: int):
                 active_server_endpoint_shared = chosen_endpoint
             current_reported_active_server = chosen_endpoint
             if chosen_endpoint:
-                print(f"{ICON_HB} FACULTYLBB (ID:{faculty_id}) [HBMonDyn]: Servidor ACTIVO cambiado a: {chosen_endpoint}", flush=True)
+                LOG.info(f"{ICON_HB} FACULTYLBB (ID:{faculty_id}) [HBMonDyn]: Servidor ACTIVO cambiado a: {chosen_endpoint}")
             else:
-                print(f"{ICON_HB} FACULTYLBB (ID:{faculty_id}) [HBMonDyn]: NINGÚN servidor activo detectado.", flush=True)
+                LOG.info(f"{ICON_HB} FACULTYLBB (ID:{faculty_id}) [HBMonDyn]: NINGÚN servidor activo detectado.")
         
         time.sleep(HB_INTERVAL / 2)
 
+class FailoverReq:
+    """
+    REQ de una transacción que sigue al servidor activo: mientras espera la
+    respuesta mira el endpoint elegido por el monitor de HB y, si cambia,
+    abre un REQ nuevo contra el activo y reenvía el último mensaje. El
+    servidor deduplica la SOL por transaction_id: el reenvío nunca abre una
+    segunda reserva, haya --mirror o no.
+    """
+
+    def __init__(self, ctx: zmq.Context, endpoint: str, faculty_id: int):
+        self.ctx, self.faculty_id = ctx, faculty_id
+        self.sock, self.endpoint = None, None
+        self._connect(endpoint)
+
+    def _connect(self, endpoint: str):
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = self.ctx.socket(zmq.REQ)
+        self.sock.setsockopt(zmq.LINGER, 0)
+        self.sock.setsockopt(zmq.SNDTIMEO, 5000)
+        self.sock.connect(endpoint)
+        self.endpoint = endpoint
+
+    def request(self, payload: bytes, tx_id: str) -> bytes:
+        """Envía y espera la respuesta hasta REPLY_TIMEOUT_S (zmq.Again si no llega)."""
+        self.sock.send(payload)
+        deadline = time.monotonic() + REPLY_TIMEOUT_S
+        while (remaining := deadline - time.monotonic()) > 0:
+            if self.sock.poll(int(min(remaining, HB_INTERVAL) * 1000)):
+                return self.sock.recv()
+            with active_endpoint_lock:
+                current = active_server_endpoint_shared
+            if current and current != self.endpoint:
+                LOG.info(f"{ICON_HB} FACULTYLBB (ID:{self.faculty_id}): TX:{tx_id} reenviada a {current} (failover).")
+                self._connect(current)
+                self.sock.send(payload)
+        raise zmq.Again()
+
+    def close(self):
+        self.sock.close()
+
 class ProgramMapper:
     _map: dict[str,int] = {}
     _next_id_counter = 1
@@ -118,11 +167,18 @@ def main_faculty_loop_dynamic_server(args, ctx: zmq.Context):
 
     rep_socket = ctx.socket(zmq.REP)
     rep_socket.bind(f"tcp://*:{args.port}") 
-    print(f"\n🏫 Facultad LBB '{args.faculty_name}' (ID={args.faculty_id}) lista en tcp://*:{args.port} (con selección dinámica de servidor)", flush=True)
+    LOG.info(f"\n🏫 Facultad LBB '{args.faculty_name}' (ID={args.faculty_id}) lista en tcp://*:{args.port} (con selección dinámica de servidor)")
 
     while True:
         # print(f"FACULTYLBB (ID:{args.faculty_id}) [LoopDynServer]: Esperando solicitud...", flush=True)
-        prog_req = rep_socket.recv_json()
+        prog_raw = rep_socket.recv()
+        prog_fmt = "bin" if wire.is_binary(prog_raw) else "json"   # se responde en el mismo formato
+        try:
+            prog_req = wire.decode(prog_raw)
+        except (ValueError, UnicodeDecodeError) as e_decode:
+            LOG.error(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): Solicitud de programa ilegible: {repr(e_decode)}", key="payload")
+            rep_socket.send(wire.encode({"tipo":"RES", "status":"ERROR_FACULTY_BAD_REQUEST", "reason":str(e_decode)}, prog_fmt))
+            continue
         
         t_start_faculty_processing_ns = time.perf_counter_ns()
         prog_name = prog_req["programa"]; prog_id = ProgramMapper.next_id(prog_name, args.faculty_id, args.semester)
@@ -135,100 +191,88 @@ def main_faculty_loop_dynamic_server(args, ctx: zmq.Context):
         with active_endpoint_lock:
             current_target_server = active_server_endpoint_shared
         
-        print(f"\n{ICON_INFO} FACULTYLBB (ID:{args.faculty_id}): SOL (tx:{tx_id}) Prog:'{prog_name}' (Sal:{sol_to_server['salones']},Lab:{sol_to_server['laboratorios']}).", flush=True)
+        LOG.debug(f"\n{ICON_INFO} FACULTYLBB (ID:{args.faculty_id}): SOL (tx:{tx_id}) Prog:'{prog_name}' (Sal:{sol_to_server['salones']},Lab:{sol_to_server['laboratorios']}).")
 
         if not current_target_server:
-            print(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): No hay servidor activo para TX:{tx_id}.", flush=True)
+            LOG.error(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): No hay servidor activo para TX:{tx_id}.", key="sin_servidor")
             final_response_to_program['reason'] = "Ningún servidor activo disponible."
             final_response_to_program['status'] = "ERROR_FACULTY_NO_ACTIVE_SERVER"
         else:
-            print(f"{ICON_SOL_SENT} FACULTYLBB (ID:{args.faculty_id}): Enviando a Servidor: {current_target_server} (TX:{tx_id})", flush=True)
+            LOG.debug(f"{ICON_SOL_SENT} FACULTYLBB (ID:{args.faculty_id}): Enviando a Servidor: {current_target_server} (TX:{tx_id})")
             req_socket = None 
             try:
-                req_socket = ctx.socket(zmq.REQ)
-                req_socket.setsockopt(zmq.LINGER, 0)
-                req_socket.setsockopt(zmq.RCVTIMEO, 15000) 
-                req_socket.setsockopt(zmq.SNDTIMEO, 5000)  
-                req_socket.connect(current_target_server)
+                req_socket = FailoverReq(ctx, current_target_server, args.faculty_id)
 
-                json_sol_str = json.dumps(sol_to_server)
-                payload_sol_bytes = json_sol_str.encode('utf-8')
+                payload_sol_bytes = wire.encode(sol_to_server, args.wire)
 
                 t_sol_sent_ns = time.perf_counter_ns()
-                req_socket.send(payload_sol_bytes)
-                
-                prop_bytes = req_socket.recv() 
+                prop_bytes = req_socket.request(payload_sol_bytes, tx_id)
                 t_prop_received_ns = time.perf_counter_ns()
                 
                 sol_prop_roundtrip_ms = (t_prop_received_ns - t_sol_sent_ns) / 1e6
                 record_event_metric(kind="faculty_server_sol_prop_roundtrip_ms", value=sol_prop_roundtrip_ms, src=f"FacultadLBB:{args.faculty_id}", dst="ServidorLBB")
-                print(f"{ICON_CLOCK} FACULTYLBB (ID:{args.faculty_id}): Métrica 'sol_prop_roundtrip' (tx:{tx_id}): {sol_prop_roundtrip_ms:.2f} ms.", flush=True)
+                LOG.debug(f"{ICON_CLOCK} FACULTYLBB (ID:{args.faculty_id}): Métrica 'sol_prop_roundtrip' (tx:{tx_id}): {sol_prop_roundtrip_ms:.2f} ms.")
 
-                prop_str = prop_bytes.decode('utf-8')
-                prop_from_server = json.loads(prop_str)
+                prop_from_server = wire.decode(prop_bytes)
 
                 if prop_from_server and prop_from_server.get("tipo") == "PROP":
-                    print(f"{ICON_PROP_RECEIVED} FACULTYLBB (ID:{args.faculty_id}): PROP (tx:{tx_id}) recibida. Enviando ACK.", flush=True)
+                    LOG.debug(f"{ICON_PROP_RECEIVED} FACULTYLBB (ID:{args.faculty_id}): PROP (tx:{tx_id}) recibida. Enviando ACK.")
                     ack_to_server = {"tipo":"ACK", "transaction_id":tx_id, "confirm":"ACCEPT"}
-                    json_ack_str = json.dumps(ack_to_server)
-                    payload_ack_bytes = json_ack_str.encode('utf-8')
+                    payload_ack_bytes = wire.encode(ack_to_server, args.wire)
                     
                     t_ack_sent_ns = time.perf_counter_ns()
-                    req_socket.send(payload_ack_bytes)
-
-                    res_bytes = req_socket.recv()
+                    res_bytes = req_socket.request(payload_ack_bytes, tx_id)
                     t_res_received_ns = time.perf_counter_ns()
 
                     ack_res_roundtrip_ms = (t_res_received_ns - t_ack_sent_ns) / 1e6
                     record_event_metric(kind="faculty_server_ack_res_roundtrip_ms", value=ack_res_roundtrip_ms, src=f"FacultadLBB:{args.faculty_id}", dst="ServidorLBB")
-                    print(f"{ICON_CLOCK} FACULTYLBB (ID:{args.faculty_id}): Métrica 'ack_res_roundtrip' (tx:{tx_id}): {ack_res_roundtrip_ms:.2f} ms.", flush=True)
+                    LOG.debug(f"{ICON_CLOCK} FACULTYLBB (ID:{args.faculty_id}): Métrica 'ack_res_roundtrip' (tx:{tx_id}): {ack_res_roundtrip_ms:.2f} ms.")
 
-                    res_str = res_bytes.decode('utf-8')
-                    res_from_server = json.loads(res_str)
+                    res_from_server = wire.decode(res_bytes)
 
                     if res_from_server and res_from_server.get("tipo") == "RES":
                         final_response_to_program = res_from_server
-                        print(f"{ICON_RES_RECEIVED} FACULTYLBB (ID:{args.faculty_id}): RES (tx:{tx_id}, status:{res_from_server.get('status')}) recibida.", flush=True)
+                        LOG.debug(f"{ICON_RES_RECEIVED} FACULTYLBB (ID:{args.faculty_id}): RES (tx:{tx_id}, status:{res_from_server.get('status')}) recibida.")
                     else:
                         final_response_to_program['reason'] = "Respuesta inesperada o no RES tras ACK"
                         final_response_to_program['status'] = "ERROR_FACULTY_UNEXPECTED_FINAL_RES"
-                        print(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): {final_response_to_program['reason']} (TX:{tx_id})", flush=True)
+                        LOG.error(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): {final_response_to_program['reason']} (TX:{tx_id})")
                 
                 elif prop_from_server and prop_from_server.get("tipo") == "RES": 
                     final_response_to_program = prop_from_server
-                    print(f"{ICON_RES_RECEIVED} FACULTYLBB (ID:{args.faculty_id}): RES directa (tx:{tx_id}, status:{prop_from_server.get('status')}) recibida.", flush=True)
+                    LOG.debug(f"{ICON_RES_RECEIVED} FACULTYLBB (ID:{args.faculty_id}): RES directa (tx:{tx_id}, status:{prop_from_server.get('status')}) recibida.")
                 else: 
                     final_response_to_program['reason'] = f"Respuesta inesperada o timeout al esperar PROP. Recibido: {prop_from_server}"
                     final_response_to_program['status'] = "ERROR_FACULTY_TIMEOUT_OR_UNEXPECTED_PROP"
-                    print(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): {final_response_to_program['reason']} (TX:{tx_id})", flush=True)
+                    LOG.error(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): {final_response_to_program['reason']} (TX:{tx_id})")
 
             except zmq.Again as e_again: 
-                print(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): Timeout (RCVTIMEO) comunicando con servidor {current_target_server} (TX:{tx_id}): {e_again}", flush=True)
+                LOG.error(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): Timeout (RCVTIMEO) comunicando con servidor {current_target_server} (TX:{tx_id}): {e_again}")
                 final_response_to_program['reason'] = f"Timeout (RCVTIMEO) con servidor: {e_again}"
                 final_response_to_program['status'] = "ERROR_FACULTY_SERVER_TIMEOUT"
-            except (json.JSONDecodeError, UnicodeDecodeError) as e_decode:
-                print(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): Error de decodificación (TX:{tx_id}): {repr(e_decode)}", flush=True)
+            except (ValueError, UnicodeDecodeError) as e_decode:
+                LOG.error(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): Error de decodificación (TX:{tx_id}): {repr(e_decode)}", key="decode")
                 final_response_to_program['reason'] = f"Error decodificando respuesta: {e_decode}"
                 final_response_to_program['status'] = "ERROR_FACULTY_DECODE_ERROR"
             except zmq.ZMQError as e_zmq: 
-                print(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): ZMQError general (TX:{tx_id}): {repr(e_zmq)}", flush=True)
+                LOG.error(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): ZMQError general (TX:{tx_id}): {repr(e_zmq)}")
                 final_response_to_program['reason'] = f"Error ZMQ: {e_zmq}"
                 final_response_to_program['status'] = "ERROR_FACULTY_ZMQ_GENERAL"
             except Exception as e_general:
-                print(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): Excepción general (TX:{tx_id}): {repr(e_general)}", flush=True)
+                LOG.error(f"{ICON_ERROR} FACULTYLBB (ID:{args.faculty_id}): Excepción general (TX:{tx_id}): {repr(e_general)}")
                 final_response_to_program['reason'] = f"Excepción: {e_general}"
                 final_response_to_program['status'] = "ERROR_FACULTY_EXCEPTION_GENERAL"
             finally:
                 if req_socket:
                     req_socket.close()
         
-        rep_socket.send_json(final_response_to_program)
+        rep_socket.send(wire.encode(final_response_to_program, prog_fmt))
         # print(f"{ICON_INFO} FACULTYLBB (ID:{args.faculty_id}): Respuesta (tx:{final_response_to_program.get('transaction_id', tx_id)}, status:{final_response_to_program.get('status')}) enviada a Prog:'{prog_name}'.", flush=True)
 
         t_end_faculty_processing_ns = time.perf_counter_ns()
         processing_time_faculty_ms = (t_end_faculty_processing_ns - t_start_faculty_processing_ns) / 1e6
         record_event_metric(kind="faculty_processing_total_ms",value=processing_time_faculty_ms,src=f"FacultadLBB:{args.faculty_id}",dst=f"Programa:{prog_name}")
-        print(f"{ICON_METRIC} FACULTYLBB (ID:{args.faculty_id}): Métrica 'faculty_processing_total_ms' (tx:{tx_id}): {processing_time_faculty_ms:.2f} ms.", flush=True)
+        LOG.debug(f"{ICON_METRIC} FACULTYLBB (ID:{args.faculty_id}): Métrica 'faculty_processing_total_ms' (tx:{tx_id}): {processing_time_faculty_ms:.2f} ms.")
 
 
 def main():
@@ -239,7 +283,12 @@ def main():
     ap.add_argument("--semester", default="2025-2")
     ap.add_argument("--faculty-name", default="IngenieríaLBB")
     ap.add_argument("--port", type=int, default=6000, help="Puerto para escuchar a los programas académicos")
+    ap.add_argument("--wire", choices=wire.FORMATS, default=wire.DEFAULT_FORMAT, help="Formato de SOL/ACK hacia el servidor")
+    ap.add_argument("--log-level", choices=["debug", "info", "warning", "error"], default=applog.DEFAULT_LEVEL,
+                    help="debug muestra el flujo de cada transacción")
     args = ap.parse_args()
+    LOG.set_level(args.log_level)
+    install_dump_signal() # SIGUSR1 → vuelca el anillo de log
 
     ensure_faculty(args.faculty_id, args.faculty_name, args.semester)
     ctx = zmq.Context()
@@ -247,7 +296,7 @@ def main():
     hb_thread = threading.Thread(target=heartbeat_monitor_dynamic, args=(args.faculty_id,), daemon=True)
     hb_thread.start()
     
-    print(f"{ICON_INFO} FACULTYLBB (ID:{args.faculty_id}) [Main]: Esperando que el HB monitor dinámico establezca un endpoint (3s)...", flush=True)
+    LOG.info(f"{ICON_INFO} FACULTYLBB (ID:{args.faculty_id}) [Main]: Esperando que el HB monitor dinámico establezca un endpoint (3s)...")
     time.sleep(3.0)
 
     main_faculty_loop_dynamic_server(args, ctx)
@@ -256,6 +305,6 @@ if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
-        print("\nCerrando facultad LBB (Ctrl+C)...", flush=True)
+        LOG.info("\nCerrando facultad LBB (Ctrl+C)...")
     finally:
-        print("Facultad LBB terminada.", flush=True)
\ No newline at end of file
+        LOG.info("Facultad LBB terminada.")
\ No newline at end of file
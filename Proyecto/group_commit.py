@@ -0,0 +1,83 @@
+"""
+GroupCommit · Agrupa operaciones concurrentes en una sola transacción
+=====================================================================
+• Los hilos llaman submit(fn, *args) y esperan su propio resultado.
+• Un hilo "committer" junta lo que llegue en `window` segundos (o hasta
+  `max_batch` operaciones) y lo ejecuta dentro de un único
+  BEGIN IMMEDIATE … COMMIT.
+• Cada operación corre en su propio SAVEPOINT: si lanza excepción sólo se
+  deshace ella y el llamador recibe esa excepción; el resto del grupo sigue.
+• Contrato de fn: fn(cursor, *args) → (resultado, delta); `delta` se entrega
+  a on_commit() una vez confirmado el COMMIT.
+"""
+
+import queue, threading
+from concurrent.futures import Future
+
+
+class GroupCommitter:
+
+    def __init__(self, conn_fn, lock: threading.RLock, on_commit=None,
+                 window: float = 0.002, max_batch: int = 64):
+        self._conn_fn = conn_fn
+        self._db_lock = lock
+        self._on_commit = on_commit or (lambda delta: None)
+        self.window = window
+        self.max_batch = max_batch
+        self._q: queue.Queue = queue.Queue()
+        self.stats = {"groups": 0, "ops": 0}
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, fn, *args) -> Future:
+        fut = Future()
+        self._q.put((fn, args, fut))
+        return fut
+
+    # ──────────────────────────────────────────────────────────
+    def _run(self):
+        while True:
+            group = [self._q.get()]
+            while len(group) < self.max_batch:
+                try:
+                    group.append(self._q.get(timeout=self.window))
+                except queue.Empty:
+                    break
+            self._commit_group(group)
+
+    def _commit_group(self, group: list):
+        outcomes = []                     # (fut, result, delta, exc)
+        with self._db_lock:
+            conn = self._conn_fn()
+            cur = conn.cursor()
+            try:
+                cur.execute("BEGIN IMMEDIATE;")
+                for i, (fn, args, fut) in enumerate(group):
+                    cur.execute(f"SAVEPOINT op{i};")
+                    try:
+                        result, delta = fn(cur, *args)
+                    except Exception as e:
+                        cur.execute(f"ROLLBACK TO op{i};")
+                        cur.execute(f"RELEASE op{i};")
+                        outcomes.append((fut, None, None, e))
+                        continue
+                    cur.execute(f"RELEASE op{i};")
+                    outcomes.append((fut, result, delta, None))
+                conn.commit()
+            except Exception as e_commit:
+                if conn.in_transaction:
+                    conn.rollback()
+                for _, _, fut in group:
+                    if not fut.done():
+                        fut.set_exception(e_commit)
+                return
+            for _, _, delta, exc in outcomes:
+                if exc is None and delta is not None:
+                    self._on_commit(delta)
+            self.stats["groups"] += 1
+            self.stats["ops"] += len(group)
+
+        for fut, result, _, exc in outcomes:
+            if exc is not None:
+                fut.set_exception(exc)
+            else:
+                fut.set_result(result)
@@ -0,0 +1,205 @@
+"""
+Inventory · Motor de inventario de salas en memoria
+===================================================
+• Listas libres por clase (type, adapted) → asignación O(k) sin tocar SQLite.
+• Las reservas se numeran en memoria (continúa la secuencia de `reservation`).
+• Write-behind: un hilo de fondo persiste los cambios en SQLite por lotes,
+  una sola transacción por lote, fuera del camino de la petición.
+• Sólo debe existir UN proceso escritor (el servidor activo).
+• on_commit(res_ids) se llama tras cada lote persistido (replicación).
+• expire(cutoff) falla las reservas PENDING más antiguas (leases).
+"""
+
+import queue, threading, time
+
+from applog import LOG
+
+
+class RoomInventory:
+    """Inventario en memoria respaldado por SQLite (write-behind)."""
+
+    BATCH_MAX = 256          # operaciones por transacción de escritura
+
+    def __init__(self, conn_fn, lock: threading.RLock, on_commit=None):
+        self._conn_fn = conn_fn          # callable → sqlite3.Connection
+        self._db_lock = lock             # el mismo _LOCK de datastore
+        self._on_commit = on_commit or (lambda res_ids: None)
+        self._lock = threading.Lock()    # protege las listas en memoria
+        self._free: dict[tuple[str, int], list[int]] = {}
+        self._held: dict[int, list[tuple[int, str]]] = {}   # res_id → [(room_id, type)]
+        self._leases: dict[int, int] = {}   # res_id PENDING → ts_req (orden de llegada)
+        self._next_res_id = 1
+        self._ops: queue.Queue = queue.Queue()
+        self._writer = None
+
+    # ──────────────────────────────────────────────────────────
+    def load(self, semester: str):
+        """Carga las salas libres de `semester` y las reservas PENDING desde SQLite."""
+        with self._db_lock, self._lock:
+            conn = self._conn_fn()
+            self._free = {("CLASS", 0): [], ("CLASS", 1): [],
+                          ("LAB", 0): [], ("LAB", 1): []}
+            # Orden descendente: pop() entrega el id más bajo, como el LIMIT de SQL.
+            for r in conn.execute("SELECT id, type, adapted FROM room "
+                                  "WHERE semester=? AND status='FREE' ORDER BY id DESC",
+                                  (semester,)):
+                self._free[(r["type"], r["adapted"])].append(r["id"])
+
+            self._held, self._leases = {}, {}
+            for r in conn.execute("SELECT id, ts_req FROM reservation "
+                                  "WHERE status='PENDING' ORDER BY ts_req, id"):
+                self._held[r["id"]] = []
+                self._leases[r["id"]] = r["ts_req"]
+            for r in conn.execute(
+                    "SELECT rr.reservation_id AS res_id, rr.room_id, room.type, room.semester "
+                    "FROM reservation_room rr "
+                    "JOIN reservation res ON res.id = rr.reservation_id "
+                    "JOIN room ON room.id = rr.room_id "
+                    "WHERE res.status='PENDING'"):
+                # Salas de otro semestre: un FAIL las libera en la BD pero no
+                # vuelven a estas listas (type None).
+                rtype = r["type"] if r["semester"] == semester else None
+                self._held[r["res_id"]].append((r["room_id"], rtype))
+
+            seq = conn.execute("SELECT MAX(id) FROM reservation").fetchone()[0] or 0
+            row = conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name='reservation'").fetchone()
+            self._next_res_id = max(seq, row[0] if row else 0) + 1
+
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+
+    # ──────────────────────────────────────────────────────────
+    def free_counts(self) -> tuple[int, int]:
+        with self._lock:
+            cls = len(self._free[("CLASS", 0)]) + len(self._free[("CLASS", 1)])
+            lab = len(self._free[("LAB", 0)]) + len(self._free[("LAB", 1)])
+        return cls, lab
+
+    def allocate(self, n_class: int, n_lab: int,
+                 faculty_id: int, program_id: int) -> int:
+        """Misma semántica que datastore.allocate_rooms, resuelta en memoria."""
+        with self._lock:
+            classes = self._free[("CLASS", 0)]
+            labs_free = len(self._free[("LAB", 0)]) + len(self._free[("LAB", 1)])
+            if len(classes) < n_class:
+                raise ValueError("No hay suficientes aulas libres")
+            lab_deficit = max(0, n_lab - labs_free)
+            if len(classes) - n_class < lab_deficit:
+                raise ValueError("No hay recursos para adaptar laboratorios")
+
+            class_rows = [classes.pop() for _ in range(n_class)]
+            lab_rows = []
+            for key in (("LAB", 0), ("LAB", 1)):
+                pool = self._free[key]
+                while pool and len(lab_rows) < n_lab:
+                    lab_rows.append(pool.pop())
+            adapt_rows = [classes.pop() for _ in range(lab_deficit)]
+
+            res_id = self._next_res_id
+            self._next_res_id += 1
+            self._held[res_id] = ([(rid, "CLASS") for rid in class_rows + adapt_rows]
+                                  + [(rid, "LAB") for rid in lab_rows])
+            ts = int(time.time())
+            self._leases[res_id] = ts
+            # Encolar dentro del lock: el orden de escritura debe ser el de memoria
+            # (una sala liberada por FAIL puede reasignarse enseguida).
+            self._ops.put(("ALLOC", res_id, faculty_id, program_id, ts,
+                           class_rows + lab_rows + adapt_rows, adapt_rows))
+        return res_id
+
+    def confirm(self, res_id: int) -> bool:
+        with self._lock:
+            if self._leases.pop(res_id, None) is None:
+                return False            # ya no está PENDING (p. ej. lease vencido)
+            self._held.pop(res_id, None)
+            self._ops.put(("CONFIRM", res_id, int(time.time())))
+        return True
+
+    def fail(self, res_id: int):
+        with self._lock:
+            self._fail_locked(res_id)
+
+    def _fail_locked(self, res_id: int):
+        self._leases.pop(res_id, None)
+        rooms = self._held.pop(res_id, [])
+        for rid, rtype in rooms:
+            if rtype is not None:
+                self._free[(rtype, 0)].append(rid)
+        self._ops.put(("FAIL", res_id, int(time.time()), [rid for rid, _ in rooms]))
+
+    def expire(self, cutoff: int, limit: int) -> int:
+        """Falla hasta `limit` reservas PENDING con ts_req < cutoff, las más antiguas primero."""
+        with self._lock:
+            expired = []
+            for res_id, ts in self._leases.items():
+                if ts >= cutoff or len(expired) >= limit:
+                    break
+                expired.append(res_id)
+            for res_id in expired:
+                self._fail_locked(res_id)
+        return len(expired)
+
+    def flush(self):
+        """Bloquea hasta que todo lo pendiente quede escrito en SQLite."""
+        self._ops.join()
+
+    # ──────────────────────────────────────────────────────────
+    def _write_loop(self):
+        while True:
+            batch = [self._ops.get()]
+            while len(batch) < self.BATCH_MAX:
+                try:
+                    batch.append(self._ops.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._persist(batch)
+            except Exception as e:
+                LOG.error(f"❗ INVENTORY: lote de {len(batch)} ops falló ({e!r}); "
+                          f"reintentando una a una.", key="inventory_batch")
+                for op in batch:
+                    try:
+                        self._persist([op])
+                    except Exception as e_op:
+                        LOG.error(f"❗ INVENTORY: op descartada {op[:2]}: {e_op!r}", key="inventory_op")
+            finally:
+                for _ in batch:
+                    self._ops.task_done()
+
+    def _persist(self, batch: list[tuple]):
+        with self._db_lock:
+            conn = self._conn_fn()
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE;")
+            try:
+                for op in batch:
+                    if op[0] == "ALLOC":
+                        _, res_id, fid, pid, ts, rooms, adapt_rows = op
+                        cur.execute(
+                            "INSERT INTO reservation(id,faculty_id,program_id,ts_req,status) "
+                            "VALUES(?,?,?,?,'PENDING')", (res_id, fid, pid, ts))
+                        cur.executemany(
+                            "INSERT INTO reservation_room(reservation_id, room_id) VALUES(?,?)",
+                            [(res_id, rid) for rid in rooms])
+                        cur.executemany("UPDATE room SET adapted=1 WHERE id=?",
+                                        [(rid,) for rid in adapt_rows])
+                        cur.executemany("UPDATE room SET status='BUSY' WHERE id=?",
+                                        [(rid,) for rid in rooms])
+                    elif op[0] == "CONFIRM":
+                        cur.execute(
+                            "UPDATE reservation SET status='CONFIRMED', ts_ack=? WHERE id=?",
+                            (op[2], op[1]))
+                    elif op[0] == "FAIL":
+                        # Sólo las salas que esta reserva retenía en memoria
+                        cur.executemany("UPDATE room SET status='FREE', adapted=0 WHERE id=?",
+                                        [(rid,) for rid in op[3]])
+                        cur.execute(
+                            "UPDATE reservation SET status='FAILED', ts_ack=? WHERE id=?",
+                            (op[2], op[1]))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            self._on_commit(sorted({op[1] for op in batch}))
@@ -0,0 +1,306 @@
+"""
+MemoryBackend · Backend de datastore 100 % en memoria
+=====================================================
+• Implementa backend.Backend, igual que datastore.SqliteBackend;
+  se activa con CLASSROOM_BACKEND=memory o datastore.configure_backend().
+• Durabilidad: cada cambio de inventario/reservas se agrega a un journal
+  append-only (JSON por línea, con número de secuencia).
+• Cada `snapshot_every` registros se escribe snapshot.json (tmp + rename)
+  y se reinicia el journal. Al arrancar: snapshot + replay del journal.
+• Las métricas quedan sólo en memoria (últimas METRIC_BUFFER muestras).
+"""
+
+import collections, json, os, pathlib, threading, time
+
+import rollup
+from backend import Backend
+
+
+class MemoryBackend(Backend):
+    """
+    Backend de datastore en memoria: las funciones públicas de datastore.py
+    delegan aquí (contrato en backend.Backend).
+    """
+
+    METRIC_BUFFER = 100_000
+
+    def __init__(self, journal_dir, snapshot_every: int = 10_000, fsync: bool = True):
+        self.dir = pathlib.Path(journal_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self.metrics = collections.deque(maxlen=self.METRIC_BUFFER)
+        self._reset_state()
+        self._recover()
+        self._journal = open(self.dir / "journal.log", "a", encoding="utf-8")
+
+    # ──────────────────────────────────────────────────────────
+    # Estado y recuperación
+    def _reset_state(self):
+        self.rooms: dict[int, list] = {}          # id → [type, adapted, status, semester]
+        self.reservations: dict[int, dict] = {}   # id → {fid, pid, ts_req, ts_ack, status, rooms}
+        self.faculty: dict[int, tuple] = {}
+        self.program: dict[int, tuple] = {}
+        self.servers: dict[str, tuple] = {}
+        self.semesters: dict[str, list] = {}       # nombre → [state, is_current, opened_ts, closed_ts]
+        self.next_room_id = 1
+        self.next_res_id = 1
+        self.seq = 0                               # último registro aplicado
+        self._since_snapshot = 0
+        self._free: dict[tuple[str, int], list[int]] = {}
+        self._pending: dict[int, int] = {}          # res_id PENDING → ts_req (orden de llegada)
+
+    def _recover(self):
+        snap = self.dir / "snapshot.json"
+        if snap.exists():
+            data = json.loads(snap.read_text(encoding="utf-8"))
+            self.rooms = {int(k): v for k, v in data["rooms"].items()}
+            self.reservations = {int(k): v for k, v in data["reservations"].items()}
+            self.faculty = {int(k): tuple(v) for k, v in data["faculty"].items()}
+            self.program = {int(k): tuple(v) for k, v in data["program"].items()}
+            self.servers = {k: tuple(v) for k, v in data["servers"].items()}
+            self.semesters = data.get("semesters", {})
+            self.next_room_id, self.next_res_id = data["next_room_id"], data["next_res_id"]
+            self.seq = data["seq"]
+        journal = self.dir / "journal.log"
+        if journal.exists():
+            with open(journal, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        break                      # última línea truncada por un crash
+                    if rec["seq"] > self.seq:
+                        self._apply(rec)
+                        self.seq = rec["seq"]
+        self._rebuild_free()
+        self._pending = {rid: res["ts_req"] for rid, res in sorted(
+            self.reservations.items(), key=lambda kv: (kv[1]["ts_req"], kv[0]))
+            if res["status"] == "PENDING"}
+
+    def _rebuild_free(self):
+        """Listas libres sólo del semestre actual."""
+        self._free = {("CLASS", 0): [], ("CLASS", 1): [], ("LAB", 0): [], ("LAB", 1): []}
+        current = self.current_semester()
+        for rid in sorted(self.rooms, reverse=True):   # pop() → id más bajo
+            rtype, adapted, status, semester = self.rooms[rid]
+            if status == "FREE" and semester == current:
+                self._free[(rtype, adapted)].append(rid)
+
+    def _apply(self, rec: dict):
+        """Aplica un registro del journal a los diccionarios (no a las listas libres)."""
+        op = rec["op"]
+        if op in ("SEED", "OPEN_SEM"):
+            for rid, rtype in rec["rooms"]:
+                self.rooms[rid] = [rtype, 0, "FREE", rec["semester"]]
+                self.next_room_id = max(self.next_room_id, rid + 1)
+            make_current = rec.get("current", self.current_semester() is None)
+            if make_current:
+                for sem in self.semesters.values():
+                    sem[1] = 0
+            self.semesters.setdefault(rec["semester"], ["OPEN", 0, rec.get("ts"), None])
+            self.semesters[rec["semester"]][1] = int(make_current)
+        elif op == "CLOSE_SEM":
+            self.semesters[rec["semester"]][0] = "CLOSED"
+            self.semesters[rec["semester"]][3] = rec["ts"]
+        elif op == "ALLOC":
+            for rid in rec["rooms"]:
+                self.rooms[rid][2] = "BUSY"
+            for rid in rec["adapt"]:
+                self.rooms[rid][1] = 1
+            self.reservations[rec["res"]] = {"fid": rec["fid"], "pid": rec["pid"],
+                                             "ts_req": rec["ts"], "ts_ack": None,
+                                             "status": "PENDING", "rooms": rec["rooms"]}
+            self.next_res_id = max(self.next_res_id, rec["res"] + 1)
+        elif op == "CONFIRM":
+            res = self.reservations.get(rec["res"])
+            if res:
+                res["status"], res["ts_ack"] = "CONFIRMED", rec["ts"]
+        elif op == "FAIL":
+            res = self.reservations.get(rec["res"])
+            if res:
+                res["status"], res["ts_ack"] = "FAILED", rec["ts"]
+            for rid in rec["rooms"]:
+                self.rooms[rid][1], self.rooms[rid][2] = 0, "FREE"
+        elif op == "FACULTY":
+            self.faculty[rec["id"]] = (rec["name"], rec["semester"])
+        elif op == "PROGRAM":
+            self.program[rec["id"]] = (rec["fid"], rec["name"], rec["semester"])
+        elif op == "SERVER":
+            self.servers[rec["host"]] = (rec["role"], rec["ts"])
+
+    def _log(self, rec: dict):
+        """Aplica + agrega al journal (llamar con self._lock tomado)."""
+        self.seq += 1
+        rec["seq"] = self.seq
+        self._apply(rec)
+        self._journal.write(json.dumps(rec, separators=(",", ":")) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """Escribe el estado completo y reinicia el journal."""
+        with self._lock:
+            data = {"seq": self.seq, "next_room_id": self.next_room_id,
+                    "next_res_id": self.next_res_id, "rooms": self.rooms,
+                    "reservations": self.reservations, "faculty": self.faculty,
+                    "program": self.program, "servers": self.servers,
+                    "semesters": self.semesters}
+            tmp = self.dir / "snapshot.json.tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(data, fh, separators=(",", ":"))
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, self.dir / "snapshot.json")
+            self._journal.close()
+            self._journal = open(self.dir / "journal.log", "w", encoding="utf-8")
+            self._since_snapshot = 0
+
+    def close(self):
+        with self._lock:
+            self._journal.close()
+
+    # ──────────────────────────────────────────────────────────
+    # Inventario y reservas
+    def _new_rooms(self, types: list[str]) -> list[tuple[int, str]]:
+        first = self.next_room_id
+        return [(first + i, rtype) for i, rtype in enumerate(types)]
+
+    def seed_inventory(self, n_class: int, n_lab: int, semester: str):
+        with self._lock:
+            semester = self.current_semester() or semester
+            if any(r[3] == semester for r in self.rooms.values()):
+                return
+            rooms = self._new_rooms(["CLASS"] * n_class + ["LAB"] * n_lab)
+            self._log({"op": "SEED", "semester": semester, "rooms": rooms,
+                       "ts": int(time.time())})
+            self._rebuild_free()
+
+    def current_semester(self) -> str:
+        return next((name for name, sem in self.semesters.items() if sem[1]), None)
+
+    def open_semester(self, name: str, copy_from: str, make_current: bool,
+                      n_class: int, n_lab: int):
+        with self._lock:
+            if name in self.semesters:
+                raise ValueError(f"El semestre {name} ya existe")
+            copy_from = copy_from or self.current_semester()
+            types = [r[0] for rid, r in sorted(self.rooms.items()) if r[3] == copy_from] \
+                or ["CLASS"] * n_class + ["LAB"] * n_lab
+            self._log({"op": "OPEN_SEM", "semester": name, "rooms": self._new_rooms(types),
+                       "current": make_current, "ts": int(time.time())})
+            if make_current:
+                self._rebuild_free()
+
+    def close_semester(self, name: str):
+        with self._lock:
+            if name == self.current_semester():
+                raise ValueError("No se puede cerrar el semestre actual; abra otro primero")
+            if self.semesters.get(name, ["CLOSED"])[0] == "OPEN":
+                self._log({"op": "CLOSE_SEM", "semester": name, "ts": int(time.time())})
+
+    def free_counts(self) -> tuple[int, int]:
+        with self._lock:
+            return (len(self._free[("CLASS", 0)]) + len(self._free[("CLASS", 1)]),
+                    len(self._free[("LAB", 0)]) + len(self._free[("LAB", 1)]))
+
+    def allocate_rooms(self, n_class: int, n_lab: int,
+                       faculty_id: int, program_id: int) -> int:
+        with self._lock:
+            classes = self._free[("CLASS", 0)]
+            labs_free = len(self._free[("LAB", 0)]) + len(self._free[("LAB", 1)])
+            if len(classes) < n_class:
+                raise ValueError("No hay suficientes aulas libres")
+            lab_deficit = max(0, n_lab - labs_free)
+            if len(classes) - n_class < lab_deficit:
+                raise ValueError("No hay recursos para adaptar laboratorios")
+
+            rooms = [classes.pop() for _ in range(n_class)]
+            for key in (("LAB", 0), ("LAB", 1)):
+                pool = self._free[key]
+                while pool and len(rooms) < n_class + n_lab - lab_deficit:
+                    rooms.append(pool.pop())
+            adapt = [classes.pop() for _ in range(lab_deficit)]
+
+            res_id, ts = self.next_res_id, int(time.time())
+            self._log({"op": "ALLOC", "res": res_id, "fid": faculty_id, "pid": program_id,
+                       "ts": ts, "rooms": rooms + adapt, "adapt": adapt})
+            self._pending[res_id] = ts
+            return res_id
+
+    def allocate_rooms_batch(self, requests: list) -> list[tuple]:
+        outcomes = []
+        with self._lock:
+            for n_class, n_lab, fid, pid in requests:
+                try:
+                    outcomes.append((self.allocate_rooms(n_class, n_lab, fid, pid), None))
+                except ValueError as e:
+                    outcomes.append((None, str(e)))
+        return outcomes
+
+    def confirm_reservation(self, res_id: int) -> bool:
+        with self._lock:
+            if self._pending.pop(res_id, None) is None:
+                return False            # ya no está PENDING (p. ej. lease vencido)
+            self._log({"op": "CONFIRM", "res": res_id, "ts": int(time.time())})
+            return True
+
+    def fail_reservation(self, res_id: int):
+        with self._lock:
+            res = self.reservations.get(res_id)
+            if res is None or res["status"] == "FAILED":
+                return
+            self._pending.pop(res_id, None)
+            held = res["rooms"]
+            self._log({"op": "FAIL", "res": res_id, "ts": int(time.time()), "rooms": held})
+            current = self.current_semester()
+            for rid in held:
+                if self.rooms[rid][3] == current:
+                    self._free[(self.rooms[rid][0], 0)].append(rid)
+
+    def expire_leases(self, cutoff: int, limit: int) -> int:
+        with self._lock:
+            expired = []
+            for res_id, ts in self._pending.items():
+                if ts >= cutoff or len(expired) >= limit:
+                    break
+                expired.append(res_id)
+            for res_id in expired:
+                self.fail_reservation(res_id)
+        return len(expired)
+
+    # ──────────────────────────────────────────────────────────
+    # Catálogo, servidores y métricas
+    def ensure_faculty(self, faculty_id: int, name: str, semester: str):
+        with self._lock:
+            if faculty_id not in self.faculty:
+                self._log({"op": "FACULTY", "id": faculty_id, "name": name, "semester": semester})
+
+    def ensure_program(self, program_id: int, faculty_id: int, name: str, semester: str):
+        with self._lock:
+            if program_id not in self.program:
+                self._log({"op": "PROGRAM", "id": program_id, "fid": faculty_id,
+                           "name": name, "semester": semester})
+
+    def register_server(self, host: str, role: str):
+        with self._lock:
+            self._log({"op": "SERVER", "host": host, "role": role, "ts": int(time.time())})
+
+    def record_event_metric(self, kind: str, value: float, src: str, dst: str = None):
+        self.metrics.append((kind, value, int(time.time()), src, dst))
+
+    def metric_percentiles(self, kind: str, since: int = None, until: int = None,
+                           src: str = None, res_s: int = 60) -> dict:
+        """Mismo formato que datastore.metric_percentiles, sobre el buffer en memoria."""
+        samples = [(1, v, ts, 0, None) for k, v, ts, s, _ in list(self.metrics)
+                   if k == kind and (src is None or s == src)
+                   and (since is None or ts >= since) and (until is None or ts < until)]
+        rows = [dict(zip(["count", "sum", "min", "max"] + [f"h{i}" for i in range(rollup.N_BUCKETS)],
+                         agg[4:]))
+                for agg in rollup.aggregate(samples) if agg[2] == res_s]
+        return rollup.percentiles(rows)
@@ -0,0 +1,136 @@
+"""
+MetricSink · Escritor asíncrono de métricas por lotes
+=====================================================
+• Cola acotada: record() nunca hace I/O en el hilo que mide.
+• Un hilo de fondo vacía la cola por tamaño (batch_size) o por tiempo
+  (flush_interval) y escribe cada lote en UNA transacción.
+• Si la cola se llena se espera como máximo put_timeout (backpressure);
+  pasado ese tiempo la muestra se descarta y se cuenta.
+• close() drena lo pendiente (datastore lo registra con atexit). Lo que
+  llega a record() después ya no tiene escritor: se cuenta como dropped.
+• Escribe directo en metric_sample; kind/src/dst se internan con una caché
+  nombre → id, así que sólo los nombres nuevos tocan las dimensiones.
+• En la misma transacción acumula los agregados por intervalo (rollup.py).
+• maintenance() (p. ej. retención de crudos) corre cada maintenance_every s.
+"""
+
+import queue, threading, time
+
+import rollup
+from applog import LOG
+
+
+class MetricSink:
+
+    def __init__(self, conn_fn, lock: threading.RLock, maxsize: int = 10_000,
+                 batch_size: int = 200, flush_interval: float = 0.5,
+                 put_timeout: float = 0.005, maintenance=None,
+                 maintenance_every: float = 60.0):
+        self._conn_fn = conn_fn
+        self._db_lock = lock
+        self._q: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._maintenance = maintenance
+        self.maintenance_every = maintenance_every
+        self._stats_lock = threading.Lock()
+        self._stats = {"enqueued": 0, "written": 0, "batches": 0,
+                       "backpressure": 0, "dropped": 0, "write_errors": 0}
+        self._closed = threading.Event()
+        self._ids = {"metric_kind": {}, "endpoint": {}}   # caché de internado
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # ──────────────────────────────────────────────────────────
+    def record(self, kind: str, value: float, ts: int, src: str, dst: str = None):
+        if self._closed.is_set():
+            self._count("dropped")                       # sin hilo escritor tras close()
+            return
+        row = (kind, value, ts, src, dst)
+        try:
+            self._q.put_nowait(row)
+        except queue.Full:
+            self._count("backpressure")
+            try:
+                self._q.put(row, timeout=self.put_timeout)
+            except queue.Full:
+                self._count("dropped")
+                return
+        self._count("enqueued")
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {**self._stats, "queued": self._q.qsize()}
+
+    def close(self, timeout: float = 5.0):
+        """Detiene el hilo tras escribir todo lo que quede en la cola."""
+        self._closed.set()
+        self._thread.join(timeout)
+
+    # ──────────────────────────────────────────────────────────
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def _run(self):
+        next_maintenance = time.monotonic() + self.maintenance_every
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._q.get(timeout=min(remaining, 0.05)))
+                except queue.Empty:
+                    if self._closed.is_set():
+                        break
+            if batch:
+                self._write(batch)
+            if self._maintenance and time.monotonic() >= next_maintenance:
+                next_maintenance = time.monotonic() + self.maintenance_every
+                try:
+                    self._maintenance()
+                except Exception as e:
+                    LOG.error(f"❗ METRICS: mantenimiento falló: {e!r}", key="metrics_maintenance")
+            if self._closed.is_set() and self._q.empty():
+                return
+
+    def _write(self, batch: list[tuple]):
+        try:
+            with self._db_lock:
+                conn = self._conn_fn()
+                conn.execute("BEGIN;")
+                try:
+                    kinds = self._intern(conn, "metric_kind", {row[0] for row in batch})
+                    eps = self._intern(conn, "endpoint",
+                                       {n for row in batch for n in (row[3], row[4]) if n is not None})
+                    rows = [(kinds[k], v, ts, eps.get(s), eps.get(d)) for k, v, ts, s, d in batch]
+                    conn.executemany(
+                        "INSERT INTO metric_sample(kind_id, value, ts, src_id, dst_id) "
+                        "VALUES(?,?,?,?,?)", rows)
+                    conn.executemany(rollup.UPSERT_SQL, rollup.aggregate(rows))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    self._ids = {"metric_kind": {}, "endpoint": {}}   # ids no confirmados
+                    raise
+            self._count("written", len(batch))
+            self._count("batches")
+        except Exception as e:
+            self._count("write_errors")
+            self._count("dropped", len(batch))
+            LOG.error(f"❗ METRICS: no se pudo escribir un lote de {len(batch)} métricas: {e!r}",
+                      key="metrics_write")
+
+    def _intern(self, conn, table: str, names: set) -> dict:
+        cache = self._ids[table]
+        missing = [n for n in names if n not in cache]
+        if missing:
+            conn.executemany(f"INSERT OR IGNORE INTO {table}(name) VALUES(?)",
+                             [(n,) for n in missing])
+            for n in missing:
+                cache[n] = conn.execute(f"SELECT id FROM {table} WHERE name=?", (n,)).fetchone()[0]
+        return cache
@@ -0,0 +1,142 @@
+"""
+ProcPool · Workers en procesos + un único dueño de la asignación
+================================================================
+• N procesos "parser" sin estado, conectados con DEALER al backend del
+  proxy por ipc://. Decodifican el mensaje (JSON o binario, wire), validan la SOL/ACK y la pasan
+  (pickle) al dueño de la asignación por REQ → ROUTER, también ipc://.
+• El dueño (AllocationOwner) es un hilo del proceso servidor. Atiende las
+  peticiones de una en una, así que reservar/confirmar sigue siendo serial
+  y consistente. Es el único que toca datastore (inventario, BD, replicación).
+• El dueño responde con la lista de mensajes para la facultad (PROP, RES)
+  y el parser los codifica y envía por el mismo backend.
+• Una SOL inválida se responde DENIED en el parser, sin pasar por el dueño.
+Los parsers se crean con fork, antes del zmq.Context del servidor.
+"""
+
+import multiprocessing, os, pickle, tempfile, threading
+
+import zmq
+
+import admission, wire
+from applog import LOG
+
+IPC_DIR = os.environ.get("CLASSROOM_IPC_DIR", tempfile.gettempdir())
+WORKERS_EP = f"ipc://{IPC_DIR}/classroom-{os.getpid()}-workers.ipc"   # backend del proxy
+ALLOC_EP   = f"ipc://{IPC_DIR}/classroom-{os.getpid()}-alloc.ipc"     # dueño de la asignación
+OWNER_TIMEOUT_MS = 5000   # sin respuesta del dueño (p. ej. desactivado) se descarta el mensaje
+
+_INT_FIELDS = ("salones", "laboratorios", "faculty_id", "program_id")
+
+
+def validate(msg) -> str | None:
+    """Motivo por el que el mensaje es inválido, o None."""
+    if not isinstance(msg, dict):
+        return "el mensaje no es un objeto JSON"
+    if not isinstance(msg.get("transaction_id"), str):
+        return "transaction_id ausente"
+    tipo = msg.get("tipo")
+    if tipo == "SOL":
+        for field in _INT_FIELDS:
+            value = msg.get(field, 0)
+            if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                return f"campo '{field}' inválido"
+    elif tipo != "ACK":
+        return f"tipo '{tipo}' desconocido"
+    return None
+
+
+# ──────────────────────────────────────────────────────────
+# Procesos parser
+def _owner_socket(ctx: zmq.Context) -> zmq.Socket:
+    sock = ctx.socket(zmq.REQ)
+    sock.connect(ALLOC_EP)
+    return sock
+
+def _parser_main(worker_id: int):
+    ctx = zmq.Context()
+    backend = ctx.socket(zmq.DEALER)
+    backend.setsockopt(zmq.RCVHWM, admission.BACKEND_HWM)
+    backend.connect(WORKERS_EP)
+    owner = _owner_socket(ctx)
+    parent = os.getppid()
+
+    while os.getppid() == parent:                     # el servidor murió: salir
+        if not backend.poll(1000):
+            continue
+        frames = backend.recv_multipart()
+        if len(frames) != 3 or frames[1] != b'':
+            LOG.error(f"\n❗ ERROR: P-{worker_id}: Framing incorrecto recibido del proxy: {frames}", key="framing")
+            continue
+        ident, _, payload = frames
+        try:
+            msg = wire.decode(payload)
+        except (ValueError, UnicodeDecodeError) as e:
+            LOG.error(f"\n❗ ERROR: P-{worker_id}: Error decodificando mensaje: {e}. Payload: {payload}", key="decode")
+            continue
+        fmt = "bin" if wire.is_binary(payload) else "json"   # se responde en el formato recibido
+
+        problem = validate(msg)
+        if problem is not None:
+            LOG.warning(f"\n⚠️ WARNING: P-{worker_id}: Mensaje inválido ({problem}): {msg}", key="invalido")
+            if not (isinstance(msg, dict) and msg.get("tipo") == "SOL"):
+                continue
+            replies = [{"tipo": "RES", "status": "DENIED", "reason": f"Solicitud inválida: {problem}",
+                        "transaction_id": msg.get("transaction_id")}]
+        else:
+            owner.send(pickle.dumps((ident, msg)))
+            if not owner.poll(OWNER_TIMEOUT_MS):
+                LOG.warning(f"\n⚠️ WARNING: P-{worker_id}: El dueño de la asignación no responde "
+                            f"(TX:{msg['transaction_id']}); mensaje descartado.", key="sin_dueño")
+                owner.close(linger=0)                 # REQ quedó a medio ciclo: uno nuevo
+                owner = _owner_socket(ctx)
+                continue
+            replies = pickle.loads(owner.recv())
+
+        for reply in replies:
+            backend.send_multipart([ident, b'', wire.encode(reply, fmt)])
+
+def start_parsers(n: int) -> list:
+    """Arranca n procesos parser (fork: llamar antes de crear el zmq.Context)."""
+    mp = multiprocessing.get_context("fork")
+    procs = [mp.Process(target=_parser_main, args=(i,), name=f"parser-{i}", daemon=True) for i in range(n)]
+    for proc in procs:
+        proc.start()
+    LOG.info(f"\nℹ️ INFO: {n} procesos parser conectados a {WORKERS_EP}")
+    return procs
+
+
+# ──────────────────────────────────────────────────────────
+# Dueño de la asignación (proceso servidor)
+class AllocationOwner:
+    """
+    ROUTER en ALLOC_EP. `handle(ident, msg)` devuelve la lista de mensajes
+    para la facultad; se llama siempre desde el mismo hilo.
+    """
+
+    def __init__(self, ctx: zmq.Context, handle):
+        self.handle = handle
+        self.sock = ctx.socket(zmq.ROUTER)
+        self.sock.bind(ALLOC_EP)
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        try:
+            while not self._stop.is_set():
+                if not self.sock.poll(200):
+                    continue
+                req_id, _, body = self.sock.recv_multipart()
+                ident, msg = pickle.loads(body)
+                try:
+                    replies = self.handle(ident, msg)
+                except Exception as e:
+                    LOG.error(f"\n❗ ERROR: Dueño de la asignación (TX:{msg.get('transaction_id')}): {e!r}")
+                    replies = []
+                self.sock.send_multipart([req_id, b'', pickle.dumps(replies)])
+        finally:
+            self.sock.close(linger=0)                 # el socket sólo lo usa este hilo
+
+    def close(self):
+        self._stop.set()
+        self.thread.join()
@@ -0,0 +1,130 @@
+"""
+Replication · Envío de cambios PRIMARY → BACKUP por ZMQ
+=======================================================
+• Cada servidor usa su PROPIA BD local (CLASSROOM_DB_MODE=local, con WAL)
+  en vez del archivo compartido por NFS.
+• El servidor activo publica, tras cada commit, las imágenes de fila que
+  entrega datastore (set_change_listener) en un PUB junto al de heartbeats:
+      [b"CHG", epoch, seq, json(images)]
+  `epoch` identifica al proceso publicador; `seq` crece de 1 en 1.
+• El standby (SUB al par) las aplica en orden con datastore.apply_changes().
+  Si detecta un hueco o un epoch nuevo pide un snapshot (REQ/REP):
+      → b"SNAP"   ← [epoch, seq, activo, json(dump_state())]
+  y sigue desde ese seq.
+• Al arrancar, sync_from_active() copia el estado del par sólo si éste es
+  el servidor activo (p. ej. un PRIMARY que vuelve tras un failover).
+"""
+
+import json, threading, time, uuid
+
+import zmq
+
+import datastore
+from applog import LOG
+
+REPL_PORT = 7001          # PUB de cambios (el HB está en 7000)
+SNAP_PORT = 7002          # REP de snapshots
+SNAP_TIMEOUT = 2.0        # s de espera por un snapshot del par
+
+
+class ReplicationLink:
+
+    def __init__(self, ctx: zmq.Context, peer: str, is_active_fn):
+        self.ctx = ctx
+        self.peer = peer
+        self.is_active_fn = is_active_fn
+        self.epoch = uuid.uuid4().hex.encode()
+        self.seq = 0                                  # último seq publicado
+        self.peer_epoch, self.peer_seq = None, 0      # último cambio del par aplicado
+        self.stats = {"published": 0, "applied": 0, "snapshots": 0}
+
+        self._pub = ctx.socket(zmq.PUB)
+        self._pub.bind(f"tcp://*:{REPL_PORT}")
+        self._pub_lock = threading.Lock()
+        datastore.set_change_listener(self.publish)
+        threading.Thread(target=self._serve_snapshots, daemon=True).start()
+        threading.Thread(target=self._follow, daemon=True).start()
+        LOG.info(f"\n🔁 REPLICACIÓN: PUB en *:{REPL_PORT}, snapshots en *:{SNAP_PORT}, "
+                 f"siguiendo a {peer}:{REPL_PORT}")
+
+    # ──────────────────────────────────────────────────────────
+    # Lado activo
+    def publish(self, images: dict):
+        """Listener de datastore (se llama con el _LOCK de datastore tomado)."""
+        with self._pub_lock:
+            self.seq += 1
+            self._pub.send_multipart([b"CHG", self.epoch, str(self.seq).encode(),
+                                      json.dumps(images, separators=(",", ":")).encode()])
+            self.stats["published"] += 1
+
+    def _serve_snapshots(self):
+        rep = self.ctx.socket(zmq.REP)
+        rep.bind(f"tcp://*:{SNAP_PORT}")
+        while True:
+            rep.recv()
+            # Bajo el lock de datastore nadie publica: el dump corresponde a self.seq.
+            with datastore._LOCK:
+                images = datastore.dump_state()
+                seq = self.seq
+            rep.send_multipart([self.epoch, str(seq).encode(),
+                                b"1" if self.is_active_fn() else b"0",
+                                json.dumps(images, separators=(",", ":")).encode()])
+
+    # ──────────────────────────────────────────────────────────
+    # Lado standby
+    def _request_snapshot(self):
+        req = self.ctx.socket(zmq.REQ)
+        req.connect(f"tcp://{self.peer}:{SNAP_PORT}")
+        try:
+            req.send(b"SNAP")
+            if not req.poll(int(SNAP_TIMEOUT * 1000)):
+                return None
+            epoch, seq, active, body = req.recv_multipart()
+            return epoch, int(seq), active == b"1", json.loads(body)
+        finally:
+            req.close(linger=0)
+
+    def _install(self, snap) -> None:
+        epoch, seq, _, images = snap
+        datastore.apply_changes(images, full=True)
+        self.peer_epoch, self.peer_seq = epoch, seq
+        self.stats["snapshots"] += 1
+        LOG.info(f"\n🔁 REPLICACIÓN: snapshot del par aplicado (seq {seq}, "
+                 f"{len(images['reservation'])} reservas).", key="replicacion_snapshot")
+
+    def sync_from_active(self) -> bool:
+        """Copia el estado del par si responde y es el servidor activo."""
+        snap = self._request_snapshot()
+        if snap is None or not snap[2]:
+            return False
+        self._install(snap)
+        return True
+
+    def _follow(self):
+        sub = self.ctx.socket(zmq.SUB)
+        sub.connect(f"tcp://{self.peer}:{REPL_PORT}")
+        sub.setsockopt(zmq.SUBSCRIBE, b"CHG")
+        while True:
+            _, epoch, seq, body = sub.recv_multipart()
+            seq = int(seq)
+            if epoch == self.epoch:
+                continue                                  # --peer apunta a este mismo servidor
+            try:
+                if epoch == self.peer_epoch and seq <= self.peer_seq:
+                    continue                              # ya incluido (snapshot o duplicado)
+                if epoch != self.peer_epoch or seq != self.peer_seq + 1:
+                    snap = self._request_snapshot()
+                    if snap is None:
+                        LOG.warning(f"\n⚠️ REPLICACIÓN: hueco antes de seq {seq} y el par no "
+                                    f"entregó snapshot; se reintenta con el próximo cambio.", key="replicacion_hueco")
+                        continue
+                    self._install(snap)
+                    if epoch != self.peer_epoch or seq != self.peer_seq + 1:
+                        continue                          # el snapshot ya lo incluye
+                datastore.apply_changes(json.loads(body))
+                self.peer_seq = seq
+                self.stats["applied"] += 1
+            except Exception as e:
+                LOG.error(f"\n❗ REPLICACIÓN: no se pudo aplicar el cambio {seq}: {e!r}", key="replicacion_error")
+                self.peer_epoch = None                    # fuerza resincronización
+                time.sleep(0.1)
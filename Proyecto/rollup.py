@@ -0,0 +1,98 @@
+"""
+Rollup · Agregados de métricas por intervalo (1 s y 60 s)
+=========================================================
+• metric_rollup guarda, por (kind, src, resolución, inicio del intervalo):
+  count, sum, min, max y un histograma de buckets fijos en ms.
+• MetricSink actualiza los agregados en la misma transacción que inserta
+  las muestras crudas (UPSERT acumulativo), así que los reportes pueden
+  leer percentiles sin recorrer metric_sample. Lo que se inserta por la
+  vista `metric` (modo síncrono) lo acumula el trigger trg_metric_rollup
+  de schema.sql, con los mismos buckets.
+• percentiles() estima p50/p90/p99 interpolando dentro de cada bucket.
+"""
+
+import bisect, math
+
+RESOLUTIONS = (1, 60)                                    # segundos
+BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)   # límites superiores; +inf al final
+N_BUCKETS = len(BOUNDS_MS) + 1
+_H = [f"h{i}" for i in range(N_BUCKETS)]
+
+# La tabla metric_rollup está en schema.sql (h0…h11 = buckets de BOUNDS_MS).
+
+UPSERT_SQL = (
+    "INSERT INTO metric_rollup(kind_id, src_id, res_s, bucket_ts, count, sum, min, max, "
+    + ", ".join(_H) + ") VALUES(" + ",".join("?" * (8 + N_BUCKETS)) + ") "
+    "ON CONFLICT(kind_id, res_s, bucket_ts, src_id) DO UPDATE SET "
+    "count = count + excluded.count, sum = sum + excluded.sum, "
+    "min = MIN(min, excluded.min), max = MAX(max, excluded.max), "
+    + ", ".join(f"{h} = {h} + excluded.{h}" for h in _H))
+
+
+def bucket_of(value: float) -> int:
+    return bisect.bisect_left(BOUNDS_MS, value)
+
+
+def aggregate(rows) -> list[tuple]:
+    """rows: (kind_id, value, ts, src_id, dst_id) → parámetros para UPSERT_SQL."""
+    acc: dict[tuple, list] = {}
+    for kind_id, value, ts, src_id, _ in rows:
+        b = bucket_of(value)
+        for res in RESOLUTIONS:
+            key = (kind_id, src_id or 0, res, ts - ts % res)
+            a = acc.get(key)
+            if a is None:
+                a = acc[key] = [0, 0.0, value, value] + [0] * N_BUCKETS
+            a[0] += 1
+            a[1] += value
+            a[2] = min(a[2], value)
+            a[3] = max(a[3], value)
+            a[4 + b] += 1
+    return [key + tuple(a) for key, a in acc.items()]
+
+
+def backfill_sql(res_s: int) -> str:
+    """INSERT … SELECT que reconstruye los agregados desde metric_sample."""
+    edges = (-math.inf,) + BOUNDS_MS + (math.inf,)
+    cases = []
+    for i in range(N_BUCKETS):
+        lo, hi = edges[i], edges[i + 1]
+        cond = [f"value > {lo}"] if lo != -math.inf else []
+        if hi != math.inf:
+            cond.append(f"value <= {hi}")
+        cases.append(f"SUM({' AND '.join(cond) or '1'})")
+    return ("INSERT OR REPLACE INTO metric_rollup(kind_id, src_id, res_s, bucket_ts, count, sum, "
+            "min, max, " + ", ".join(_H) + ") "
+            f"SELECT kind_id, COALESCE(src_id, 0), {res_s}, ts - ts % {res_s}, COUNT(*), SUM(value), "
+            "MIN(value), MAX(value), " + ", ".join(cases) + " FROM metric_sample "
+            "GROUP BY kind_id, COALESCE(src_id, 0), ts - ts % " + str(res_s))
+
+
+def percentiles(rows, qs=(0.5, 0.9, 0.99)) -> dict:
+    """
+    rows: filas de metric_rollup (count, sum, min, max, h0..hN).
+    Devuelve count, mean, min, max y los percentiles pedidos (estimados).
+    """
+    count, total = 0, 0.0
+    lo, hi = math.inf, -math.inf
+    hist = [0] * N_BUCKETS
+    for r in rows:
+        count += r["count"]
+        total += r["sum"]
+        lo, hi = min(lo, r["min"]), max(hi, r["max"])
+        for i, h in enumerate(_H):
+            hist[i] += r[h]
+    if not count:
+        return {"count": 0}
+
+    out = {"count": count, "mean": total / count, "min": lo, "max": hi}
+    for q in qs:
+        target, seen = q * count, 0
+        for i, n in enumerate(hist):
+            if n and seen + n >= target:
+                b_lo = max(lo, BOUNDS_MS[i - 1] if i > 0 else lo)
+                b_hi = min(hi, BOUNDS_MS[i] if i < len(BOUNDS_MS) else hi)
+                out[f"p{round(q * 100)}"] = b_lo + (b_hi - b_lo) * (target - seen) / n
+                break
+            seen += n
+    return out
@@ -46,8 +46,53 @@ CREATE TABLE IF NOT EXISTS room (
     semester TEXT NOT NULL
 );
 
-CREATE INDEX IF NOT EXISTS idx_room_fast
-    ON room(type, status, adapted);
+-- Partición lógica por semestre: asignación y conteos filtran por el
+-- semestre actual y recorren sólo su tramo del índice.
+CREATE INDEX IF NOT EXISTS idx_room_semester
+    ON room(semester, type, status, adapted, id);
+
+-- Semestres: abrir = INSERT … SELECT del inventario; cerrar / cambiar
+-- el actual = actualizar una fila de esta tabla.
+CREATE TABLE IF NOT EXISTS semester (
+    name       TEXT    PRIMARY KEY,
+    state      TEXT    NOT NULL DEFAULT 'OPEN' CHECK(state IN ('OPEN','CLOSED')),
+    is_current INTEGER NOT NULL DEFAULT 0 CHECK(is_current IN (0,1)),
+    opened_ts  INTEGER NOT NULL,                -- epoch s
+    closed_ts  INTEGER
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_semester_current
+    ON semester(is_current) WHERE is_current = 1;
+
+-- Contadores de salas libres por semestre y tipo. Los mantienen los
+-- triggers en la misma transacción que cambia `room`, así que las
+-- consultas de disponibilidad no recorren la tabla (O(1)).
+CREATE TABLE IF NOT EXISTS room_counters (
+    semester TEXT    NOT NULL,
+    type     TEXT    NOT NULL,
+    free     INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (semester, type)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_room_counters_ins AFTER INSERT ON room
+WHEN NEW.status = 'FREE' BEGIN
+    INSERT OR IGNORE INTO room_counters(semester, type, free) VALUES(NEW.semester, NEW.type, 0);
+    UPDATE room_counters SET free = free + 1 WHERE semester = NEW.semester AND type = NEW.type;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_room_counters_del AFTER DELETE ON room
+WHEN OLD.status = 'FREE' BEGIN
+    UPDATE room_counters SET free = free - 1 WHERE semester = OLD.semester AND type = OLD.type;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_room_counters_upd AFTER UPDATE OF status, type, semester ON room
+BEGIN
+    UPDATE room_counters SET free = free - 1
+     WHERE OLD.status = 'FREE' AND semester = OLD.semester AND type = OLD.type;
+    INSERT OR IGNORE INTO room_counters(semester, type, free) VALUES(NEW.semester, NEW.type, 0);
+    UPDATE room_counters SET free = free + 1
+     WHERE NEW.status = 'FREE' AND semester = NEW.semester AND type = NEW.type;
+END;
 
 ----------------------------------------------------------
 -- 3. Reservas de salas vinculadas a facultad y programa
@@ -62,6 +107,10 @@ CREATE TABLE IF NOT EXISTS reservation (
     status        TEXT NOT NULL CHECK(status IN ('PENDING','CONFIRMED','FAILED'))
 );
 
+-- Barrido de leases: reservas PENDING más antiguas primero.
+CREATE INDEX IF NOT EXISTS idx_reservation_pending
+    ON reservation(status, ts_req);
+
 CREATE TABLE IF NOT EXISTS reservation_room (
     reservation_id INTEGER NOT NULL REFERENCES reservation(id),
     room_id        INTEGER NOT NULL REFERENCES room(id),
@@ -72,11 +121,111 @@ CREATE TABLE IF NOT EXISTS reservation_room (
 -- 4. Registro de métricas de rendimiento
 ----------------------------------------------------------
 
-CREATE TABLE IF NOT EXISTS metric (
-    id    INTEGER PRIMARY KEY AUTOINCREMENT,
-    kind  TEXT    NOT NULL,
-    value REAL    NOT NULL,      -- en milisegundos o contadores
-    ts    INTEGER NOT NULL,      -- epoch s
-    src   TEXT,                  -- facultad, programa, server…
-    dst   TEXT
+-- kind / src / dst se internan en tablas de dimensión: cada muestra
+-- guarda sólo enteros + el valor.
+CREATE TABLE IF NOT EXISTS metric_kind (
+    id   INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE        -- ej. faculty_server_sol_prop_roundtrip_ms
 );
+
+CREATE TABLE IF NOT EXISTS endpoint (
+    id   INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE        -- facultad, programa, server… (ej. FacultadAsync:1)
+);
+
+CREATE TABLE IF NOT EXISTS metric_sample (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind_id INTEGER NOT NULL REFERENCES metric_kind(id),
+    value   REAL    NOT NULL,        -- en milisegundos o contadores
+    ts      INTEGER NOT NULL,        -- epoch s
+    src_id  INTEGER REFERENCES endpoint(id),
+    dst_id  INTEGER REFERENCES endpoint(id)
+);
+
+-- Cubre los escaneos por tipo y rango de tiempo sin tocar la tabla.
+CREATE INDEX IF NOT EXISTS idx_metric_sample_kind_ts
+    ON metric_sample(kind_id, ts, value);
+
+-- Vista de compatibilidad: mismas columnas que la antigua tabla `metric`
+-- (id, kind, value, ts, src, dst), así que los exports case*.csv no cambian.
+CREATE VIEW IF NOT EXISTS metric AS
+    SELECT s.id, k.name AS kind, s.value, s.ts, se.name AS src, de.name AS dst
+      FROM metric_sample s
+      JOIN metric_kind k ON k.id = s.kind_id
+      LEFT JOIN endpoint se ON se.id = s.src_id
+      LEFT JOIN endpoint de ON de.id = s.dst_id;
+
+-- Agregados por intervalo (res_s = 1 ó 60) que mantienen el MetricSink y
+-- trg_metric_rollup:
+-- count/sum/min/max + histograma de buckets fijos (ms):
+--   h0 ≤1 < h1 ≤2 < h2 ≤5 < h3 ≤10 < h4 ≤25 < h5 ≤50 < h6 ≤100
+--   < h7 ≤250 < h8 ≤500 < h9 ≤1000 < h10 ≤2500 < h11
+CREATE TABLE IF NOT EXISTS metric_rollup (
+    kind_id   INTEGER NOT NULL REFERENCES metric_kind(id),
+    src_id    INTEGER NOT NULL DEFAULT 0,     -- 0 = sin origen
+    res_s     INTEGER NOT NULL,               -- 1 | 60
+    bucket_ts INTEGER NOT NULL,               -- epoch s, múltiplo de res_s
+    count     INTEGER NOT NULL,
+    sum       REAL    NOT NULL,
+    min       REAL    NOT NULL,
+    max       REAL    NOT NULL,
+    h0 INTEGER NOT NULL DEFAULT 0,
+    h1 INTEGER NOT NULL DEFAULT 0,
+    h2 INTEGER NOT NULL DEFAULT 0,
+    h3 INTEGER NOT NULL DEFAULT 0,
+    h4 INTEGER NOT NULL DEFAULT 0,
+    h5 INTEGER NOT NULL DEFAULT 0,
+    h6 INTEGER NOT NULL DEFAULT 0,
+    h7 INTEGER NOT NULL DEFAULT 0,
+    h8 INTEGER NOT NULL DEFAULT 0,
+    h9 INTEGER NOT NULL DEFAULT 0,
+    h10 INTEGER NOT NULL DEFAULT 0,
+    h11 INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind_id, res_s, bucket_ts, src_id)
+) WITHOUT ROWID;
+
+-- INSERT INTO metric(kind,value,ts,src,dst) sigue funcionando.
+CREATE TRIGGER IF NOT EXISTS trg_metric_insert INSTEAD OF INSERT ON metric
+BEGIN
+    INSERT OR IGNORE INTO metric_kind(name) VALUES(NEW.kind);
+    INSERT OR IGNORE INTO endpoint(name) SELECT NEW.src WHERE NEW.src IS NOT NULL;
+    INSERT OR IGNORE INTO endpoint(name) SELECT NEW.dst WHERE NEW.dst IS NOT NULL;
+    INSERT INTO metric_sample(kind_id, value, ts, src_id, dst_id) VALUES(
+        (SELECT id FROM metric_kind WHERE name = NEW.kind), NEW.value, NEW.ts,
+        (SELECT id FROM endpoint WHERE name = NEW.src),
+        (SELECT id FROM endpoint WHERE name = NEW.dst));
+END;
+
+-- Los INSERT por la vista (modo síncrono, scripts) también acumulan en
+-- metric_rollup, con los mismos buckets que rollup.py. El MetricSink escribe
+-- directo en metric_sample y acumula él mismo, así que no pasa por aquí.
+CREATE TRIGGER IF NOT EXISTS trg_metric_rollup INSTEAD OF INSERT ON metric
+BEGIN
+    INSERT OR IGNORE INTO metric_kind(name) VALUES(NEW.kind);
+    INSERT OR IGNORE INTO endpoint(name) SELECT NEW.src WHERE NEW.src IS NOT NULL;
+    INSERT INTO metric_rollup(kind_id, src_id, res_s, bucket_ts, count, sum, min, max,
+                              h0, h1, h2, h3, h4, h5, h6, h7, h8, h9, h10, h11)
+    SELECT (SELECT id FROM metric_kind WHERE name = NEW.kind),
+           COALESCE((SELECT id FROM endpoint WHERE name = NEW.src), 0),
+           r.res_s, NEW.ts - NEW.ts % r.res_s, 1, NEW.value, NEW.value, NEW.value,
+           NEW.value <= 1,
+           NEW.value > 1 AND NEW.value <= 2,
+           NEW.value > 2 AND NEW.value <= 5,
+           NEW.value > 5 AND NEW.value <= 10,
+           NEW.value > 10 AND NEW.value <= 25,
+           NEW.value > 25 AND NEW.value <= 50,
+           NEW.value > 50 AND NEW.value <= 100,
+           NEW.value > 100 AND NEW.value <= 250,
+           NEW.value > 250 AND NEW.value <= 500,
+           NEW.value > 500 AND NEW.value <= 1000,
+           NEW.value > 1000 AND NEW.value <= 2500,
+           NEW.value > 2500
+      FROM (SELECT 1 AS res_s UNION ALL SELECT 60) AS r
+     WHERE true
+    ON CONFLICT(kind_id, res_s, bucket_ts, src_id) DO UPDATE SET
+        count = count + excluded.count, sum = sum + excluded.sum,
+        min = MIN(min, excluded.min), max = MAX(max, excluded.max),
+        h0 = h0 + excluded.h0, h1 = h1 + excluded.h1, h2 = h2 + excluded.h2, h3 = h3 + excluded.h3,
+        h4 = h4 + excluded.h4, h5 = h5 + excluded.h5, h6 = h6 + excluded.h6, h7 = h7 + excluded.h7,
+        h8 = h8 + excluded.h8, h9 = h9 + excluded.h9, h10 = h10 + excluded.h10, h11 = h11 + excluded.h11;
+END;
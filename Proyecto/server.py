@@ -5,21 +5,48 @@ server.py   Broker binario PRIMARY / BACKUP (Asíncrono)
 • Patrón Binary Star con heart beats (PUB/SUB tcp://*:7000)
 • Async Client Server (ROUTER↔DEALER) con workers concurrentes
 • Persistencia en SQLite compartido mediante datastore.py
+• --replication: cada servidor con su BD local; el activo envía sus cambios
+  al standby (replication.py, PUB 7001 / snapshots 7002).
+• Mensajes JSON o binario compacto (wire.py); a cada facultad se le
+  responde en el formato que usa.
 • Reserva de recursos y métricas se escriben en las tablas.
+• Log por niveles asíncrono (applog.py, --log-level); el flujo de cada TX es debug.
+• Control de admisión (admission.py): HWMs, tope de TX abiertas y RES BUSY
+  inmediata al saturarse (--max-inflight, --frontend-hwm, --backend-hwm).
+• --alloc-window MS: las SOL que llegan en MS ms se resuelven juntas
+  maximizando programas completos (allocator.py).
+• --fair: reparto justo por facultad (deficit round-robin con pesos) entre
+  el frontend y los workers del pool (dispatch.FairQueue).
+• --mirror: las TX abiertas (PROP sin ACK) se copian al standby, que al
+  promoverse las adopta y las completa o cancela (txmirror.py, PUB 7003).
 • Salida en consola optimizada.
 """
 
 import argparse
-import json
+import asyncio
+import heapq
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
 from socket import gethostname
 
 import zmq
+import zmq.asyncio
+
+import admission
+import allocator
+import dispatch
+import procpool
+import wire
+import applog
+from applog import LOG, install_dump_signal
 from datastore import (
     seed_inventory, allocate_rooms, confirm_reservation,
-    fail_reservation, _conn, timed, ensure_faculty, ensure_program
+    fail_reservation, register_server, timed, ensure_faculty, ensure_program,
+    free_counts, enable_memory_inventory, disable_memory_inventory,
+    enable_group_commit, allocate_rooms_batch, preload_catalog, STORAGE_MODE,
+    start_lease_sweeper, stop_lease_sweeper, record_event_metric
 )
 
 # --- Constantes y Configuración ---
@@ -27,6 +54,15 @@ HB_INT   = 1.0  # Intervalo de Heartbeat en segundos
 HB_LIVENESS  = 3    # Número de intervalos de HB para considerar un peer muerto
 WORKERS  = 5    # Número de hilos worker
 ACK_TIMEOUT = 5 # Segundos para esperar el ACK de la facultad
+SOL_BATCH_MAX = 1 # >1: cada worker drena hasta N mensajes encolados y reserva sus SOL en lote
+INVENTORY_MODE = "sql" # "sql" (directo a SQLite) o "memory" (inventario en memoria + write-behind)
+ACK_MODE = "monitor" # "monitor" (el monitor completa los ACK) o "inline" (el worker que recibe el ACK responde)
+ASYNC_DB_THREADS = 4 # --engine asyncio: hilos del executor para las llamadas (bloqueantes) a datastore
+PROCS = 0 # >0: WORKERS pasan a ser PROCS procesos parser + un dueño de la asignación (procpool)
+POOL_BOUNDS = None # (min, max): pool de workers adaptable según la espera en cola (dispatch)
+FAIR_WEIGHTS = None # dict faculty_id → peso: cola del pool con un carril por facultad (dispatch.FairQueue)
+ALLOCATOR: allocator.BatchAllocator = None # Con --alloc-window: reserva por micro-lotes
+MIRROR = None # Con --mirror: txmirror.TxMirror (copia de las TX abiertas en el par)
 
 # --- Iconos ---
 ICN_INIT = "\n🔧 RECURSOS INICIALES:"
@@ -47,35 +83,42 @@ ICN_INFO = "\nℹ️ INFO:"
 # --- Fin Iconos ---
 
 # Para gestionar transacciones pendientes de ACK
-# transactions[tx_id] = {'event': threading.Event(), 'ack_message': None, 'faculty_identity': ident, 
-#                        'server_reply_socket': sock, 'res_id': res_id, 'proposal_data': proposal}
+# transactions[tx_id] = {'ack_message': None, 'faculty_identity': ident, 'res_id': res_id,
+#                        'proposal_data': proposal, 'deadline': t_monotonic, 'fac_nombre': nombre,
+#                        'adopted': bool}
 transactions: Dict[str, Dict[str, Any]] = {}
 transactions_lock = threading.Lock() # Lock para proteger el acceso a 'transactions'
-
-now_epoch = lambda: int(time.time())
+transactions_cv = threading.Condition(transactions_lock) # Despierta al monitor de ACKs
+_deadlines: list[tuple[float, str]] = [] # heap (deadline, tx_id); entradas completadas o viejas (otro deadline) se descartan al salir
+_acks_ready: list[str] = []              # tx_id con ACK recibido, pendientes de completar
+ACK_REPLY_ENDPOINT = "inproc://ack_replies" # RES del monitor → proxy → frontend
+WIRE = wire.Negotiator() # Responde a cada facultad en el formato (JSON/binario) que ella usa
 
 def _register_server_state_db(role: str, host: str):
     # print(f"{ICN_HB_EVENT} Registrando estado en BD: {role} en {host}", flush=True)
-    with _conn() as c: # Usar with para asegurar commit/rollback
-        c.execute("INSERT OR REPLACE INTO server(host,role,last_hb) VALUES(?,?,?)",
-                   (host, role, now_epoch()))
+    register_server(host, role)
 
 class ResourceView:
     @staticmethod
     def free_counts() -> tuple[int,int]:
-        cur = _conn().execute("SELECT type, COUNT(*) AS cnt FROM room WHERE status='FREE' GROUP BY type")
-        data = {row["type"]: row["cnt"] for row in cur.fetchall()}
-        return data.get("CLASS", 0), data.get("LAB", 0)
+        return free_counts()
 
 seed_inventory()
+preload_catalog() # ensure_faculty/ensure_program sólo escriben en fallos reales de caché
 cls_init, lab_init = ResourceView.free_counts()
-print(ICN_INIT + f"\n| Salones: {cls_init}\n| Laboratorios: {lab_init}\n" + "─"*30, flush=True)
+LOG.info(ICN_INIT + f"\n| Salones: {cls_init}\n| Laboratorios: {lab_init}\n" + "─"*30)
 
 
 class ServerCore:
     frontend_socket: zmq.Socket = None
     backend_socket: zmq.Socket = None
     control_socket: zmq.Socket = None # Para controlar el proxy
+    replies_socket: zmq.Socket = None # PULL con las RES del monitor de ACKs
+    owner: procpool.AllocationOwner = None # Con PROCS > 0
+    pump: dispatch.FrontendPump = None     # Con POOL_BOUNDS
+    pool: dispatch.WorkerPool = None
+    admission_ctl: admission.Admission = None  # Tope de TX abiertas + RES BUSY
+    generation = 0                    # +1 por activación (el monitor reconecta su PUSH)
     proxy_thread: threading.Thread = None
     worker_threads: list[threading.Thread] = []
     ack_monitor_thread: threading.Thread = None
@@ -87,19 +130,46 @@ class ServerCore:
             # print(f"{ICN_SERVER_STATE} ServerCore ya está activo.", flush=True)
             return
 
-        print(f"{ICN_SERVER_STATE} Activando ServerCore...", flush=True)
+        LOG.info(f"{ICN_SERVER_STATE} Activando ServerCore...")
+        if INVENTORY_MODE == "memory":
+            enable_memory_inventory() # Recarga desde la BD lo que haya escrito el par
+            LOG.info(f"{ICN_INFO} Inventario en memoria cargado (write-behind a SQLite).")
+        start_lease_sweeper() # Libera reservas PENDING huérfanas (p. ej. de un activo caído)
+        if MIRROR: # TX que el par dejó abiertas (antes del bind: ningún ACK llega antes que su TX)
+            for tx_id, ident, res_id, proposal_data, fac_nombre, timeout in MIRROR.adopt():
+                _register_tx(tx_id, ident, res_id, proposal_data, fac_nombre, timeout, adopted=True)
         cls.frontend_socket = ctx.socket(zmq.ROUTER)
+        admission.set_hwm(cls.frontend_socket, admission.FRONTEND_HWM)
         cls.frontend_socket.bind("tcp://*:5555")
         cls.backend_socket = ctx.socket(zmq.DEALER)
-        cls.backend_socket.bind("inproc://backend_processing") # Nombre diferente para evitar colisiones
-
-        # Iniciar el proxy en un hilo
-        cls.proxy_thread = threading.Thread(target=lambda: zmq.proxy(cls.frontend_socket, cls.backend_socket), daemon=True)
-        cls.proxy_thread.start()
+        admission.set_hwm(cls.backend_socket, admission.BACKEND_HWM)
+        cls.backend_socket.bind(procpool.WORKERS_EP if PROCS else "inproc://backend_processing") # Nombre diferente para evitar colisiones
+        cls.replies_socket = ctx.socket(zmq.PULL)
+        cls.replies_socket.bind(ACK_REPLY_ENDPOINT)
+        cls.generation += 1
 
-        # Iniciar workers
         cls.worker_threads = []
-        for i in range(WORKERS):
+        if POOL_BOUNDS and not PROCS:
+            # Pool adaptable: el pump encola lo del frontend y los workers (entre
+            # POOL_BOUNDS) sólo responden por el backend
+            fair = None if FAIR_WEIGHTS is None else dispatch.FairQueue(dispatch.faculty_classifier(WIRE), FAIR_WEIGHTS)
+            cls.pool = dispatch.WorkerPool(ctx, "inproc://backend_processing", _process_batch, *POOL_BOUNDS,
+                                           batch_max=SOL_BATCH_MAX, src="ServidorAsync", work=fair)
+            # Abiertas = esperando ACK + encoladas para los workers
+            cls.admission_ctl = admission.Admission(lambda: len(transactions) + cls.pool.work.qsize(), WIRE, "ServidorAsync")
+            cls.pump = dispatch.FrontendPump(cls.frontend_socket, cls.backend_socket, cls.pool.work, (cls.replies_socket,),
+                                             admission=cls.admission_ctl)
+        else:
+            # Iniciar el proxy (con admisión) en un hilo; la cola la acota BACKEND_HWM
+            cls.admission_ctl = admission.Admission(lambda: len(transactions), WIRE, "ServidorAsync")
+            cls.proxy_thread = threading.Thread(target=admission.proxy, args=(cls.frontend_socket, cls.backend_socket,
+                                                cls.admission_ctl, (cls.replies_socket,)), daemon=True)
+            cls.proxy_thread.start()
+
+        # Iniciar workers (o, con PROCS, el dueño de la asignación al que llaman los parsers)
+        if PROCS:
+            cls.owner = procpool.AllocationOwner(ctx, _owner_handle)
+        for i in range(0 if PROCS or cls.pool else WORKERS):
             thread = threading.Thread(target=server_worker, args=(ctx, i), daemon=True)
             cls.worker_threads.append(thread)
             thread.start()
@@ -110,23 +180,220 @@ class ServerCore:
             cls.ack_monitor_thread.start()
             
         cls.is_active = True
-        print(f"{ICN_SERVER_STATE} SERVIDOR ASÍNCRONO activo en TCP *:5555 (Workers: {WORKERS})", flush=True)
+        workers_desc = f"Procesos parser: {PROCS}" if PROCS else f"Workers: {WORKERS}"
+        if cls.pool: workers_desc = f"Workers adaptables: {cls.pool.min_workers}-{cls.pool.max_workers}"
+        if cls.pool and FAIR_WEIGHTS is not None: workers_desc += ", reparto justo por facultad"
+        LOG.info(f"{ICN_SERVER_STATE} SERVIDOR ASÍNCRONO activo en TCP *:5555 ({workers_desc})")
 
     @classmethod
     def deactivate(cls):
         if not cls.is_active:
             # print(f"{ICN_SERVER_STATE} ServerCore ya está inactivo.", flush=True)
             return
-        print(f"{ICN_SERVER_STATE} Desactivando ServerCore...", flush=True)
+        LOG.info(f"{ICN_SERVER_STATE} Desactivando ServerCore...")
         # Detener el proxy y los workers de forma limpia es complejo con zmq.proxy en un hilo.
         # Se podría usar un socket de control para el proxy o cerrar sockets y unirse a hilos.
         # Por simplicidad en este contexto, solo marcamos como inactivo.
         # En un sistema real, se necesitaría una parada más robusta.
+        if cls.pump: cls.pump.stop(); cls.pump = None # Cierra él mismo sus sockets
+        if cls.pool: cls.pool.stop(); cls.pool = None
         if cls.frontend_socket: cls.frontend_socket.close(linger=0)
         if cls.backend_socket: cls.backend_socket.close(linger=0)
+        if cls.replies_socket: cls.replies_socket.close(linger=0)
+        if cls.owner: cls.owner.close(); cls.owner = None
+        stop_lease_sweeper()
+        disable_memory_inventory() # Vacía el write-behind antes de ceder el rol
+        if MIRROR: # Las TX abiertas las adoptó el par; el monitor ya no debe cancelarlas
+            MIRROR.hand_off()
+            with transactions_lock:
+                transactions.clear()
+                _deadlines.clear()
         # Los hilos worker y ack_monitor son daemon, terminarán si el programa principal sale.
         cls.is_active = False
-        print(f"{ICN_SERVER_STATE} ServerCore marcado como inactivo. Sockets principales cerrados.", flush=True)
+        LOG.info(f"{ICN_SERVER_STATE} ServerCore marcado como inactivo. Sockets principales cerrados.")
+
+
+class AsyncServerCore:
+    """
+    Motor alternativo (--engine asyncio) con la misma interfaz que ServerCore.
+    • Un único ROUTER en *:5555 (zmq.asyncio) atendido por un event loop en
+      su propio hilo; sin proxy, workers ni monitor de ACKs.
+    • Una corrutina por transacción: SOL → PROP → ACK → RES. El ACK se espera
+      con asyncio.wait_for(…, ACK_TIMEOUT); la corrutina del receptor sólo
+      resuelve el future de la TX.
+    • Las llamadas a datastore bloquean, así que van a un ThreadPoolExecutor
+      de ASYNC_DB_THREADS hilos.
+    La concurrencia crece con las transacciones abiertas, no con WORKERS.
+    """
+    loop: asyncio.AbstractEventLoop = None
+    loop_thread: threading.Thread = None
+    main_task: asyncio.Task = None
+    executor: ThreadPoolExecutor = None
+    adopted: list[tuple] = [] # TX abiertas del par (--mirror), las toma _serve al arrancar
+    is_active = False
+
+    @classmethod
+    def activate(cls, ctx: zmq.Context):
+        if cls.is_active:
+            return
+
+        LOG.info(f"{ICN_SERVER_STATE} Activando ServerCore (asyncio)...")
+        if INVENTORY_MODE == "memory":
+            enable_memory_inventory()
+            LOG.info(f"{ICN_INFO} Inventario en memoria cargado (write-behind a SQLite).")
+        start_lease_sweeper()
+        cls.executor = ThreadPoolExecutor(ASYNC_DB_THREADS, thread_name_prefix="async-db")
+        cls.adopted = MIRROR.adopt() if MIRROR else [] # Puede esperar la copia del par: fuera del loop
+        cls.loop = asyncio.new_event_loop()
+        bound = threading.Event()
+        cls.loop_thread = threading.Thread(target=cls._run_loop, args=(ctx, bound), daemon=True)
+        cls.loop_thread.start()
+        bound.wait()
+
+        cls.is_active = True
+        LOG.info(f"{ICN_SERVER_STATE} SERVIDOR ASÍNCRONO (asyncio) activo en TCP *:5555 (Executor BD: {ASYNC_DB_THREADS})")
+
+    @classmethod
+    def deactivate(cls):
+        if not cls.is_active:
+            return
+        LOG.info(f"{ICN_SERVER_STATE} Desactivando ServerCore (asyncio)...")
+        # Cancela el receptor y las transacciones abiertas; sus reservas PENDING
+        # las libera el lease sweeper (del par, que pasa a activo, o de este nodo)
+        # o, con --mirror, las completa el par, que las adoptó.
+        cls.loop.call_soon_threadsafe(cls.main_task.cancel)
+        cls.loop_thread.join(timeout=5)
+        cls.executor.shutdown(wait=True)
+        stop_lease_sweeper()
+        disable_memory_inventory()
+        if MIRROR: MIRROR.hand_off()
+        cls.is_active = False
+        LOG.info(f"{ICN_SERVER_STATE} ServerCore (asyncio) detenido. Socket principal cerrado.")
+
+    @classmethod
+    def _run_loop(cls, ctx: zmq.Context, bound: threading.Event):
+        asyncio.set_event_loop(cls.loop)
+        sock = zmq.asyncio.Context.shadow(ctx).socket(zmq.ROUTER) # Mismo contexto, sockets asyncio
+        admission.set_hwm(sock, admission.FRONTEND_HWM)
+        try:
+            sock.bind("tcp://*:5555")
+            cls.main_task = cls.loop.create_task(cls._serve(sock))
+            bound.set()
+            cls.loop.run_until_complete(cls.main_task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            LOG.error(f"{ICN_ERROR} ServerCore (asyncio): {repr(e)}")
+        finally:
+            bound.set()
+            sock.close(linger=0)
+            cls.loop.close()
+
+    @classmethod
+    async def _serve(cls, sock: zmq.asyncio.Socket):
+        acks: Dict[str, tuple[asyncio.Future, dict]] = {} # tx_id → (future que recibe el ACK, propuesta)
+        open_txs: set[asyncio.Task] = set()
+        adm = admission.Admission(lambda: len(open_txs), WIRE, "ServidorAsync")
+
+        def spawn(coro):
+            task = asyncio.create_task(coro)
+            open_txs.add(task)
+            task.add_done_callback(open_txs.discard)
+
+        for tx_id, ident, res_id, proposal_data, fac_nombre, timeout in cls.adopted:
+            ack_future = cls._open_tx(acks, ident, tx_id, res_id, proposal_data, fac_nombre, timeout)
+            spawn(cls._await_ack(sock, acks, ack_future, ident, tx_id, res_id, proposal_data, fac_nombre, timeout,
+                                 adopted=True))
+        try:
+            while True:
+                parsed = _parse_frames("Async", await sock.recv_multipart())
+                adm.tick()
+                if parsed is None:
+                    continue
+                faculty_identity, msg = parsed
+                msg_type = msg.get("tipo", "N/A_TIPO")
+                tx_id = msg.get("transaction_id", "N/A_TX")
+                if msg_type == "SOL" and tx_id in acks: # SOL reenviada (FailoverReq): misma PROP
+                    prop_msg_payload = {"tipo": "PROP", "data": acks[tx_id][1], "transaction_id": tx_id}
+                    await sock.send_multipart([faculty_identity, b'', WIRE.encode(faculty_identity, prop_msg_payload)])
+                elif msg_type == "SOL" and adm.saturated():
+                    await sock.send_multipart(adm.busy(faculty_identity, tx_id, "shed_inflight"))
+                elif msg_type == "SOL":
+                    spawn(cls._transaction(sock, acks, faculty_identity, msg))
+                elif msg_type == "ACK":
+                    LOG.debug(ICN_ACK_RECV + f" (Async, TX:{tx_id}, Fac:{msg.get('facultad', 'Fac_Desconocida')})")
+                    fut, _ = acks.pop(tx_id, (None, None))
+                    replayed = MIRROR.replay(tx_id) if MIRROR and fut is None else None
+                    if replayed is not None: # El par la cerró pero su RES pudo perderse en la caída
+                        await sock.send_multipart([faculty_identity, b'', WIRE.encode(faculty_identity, replayed)])
+                    elif fut is None or fut.done():
+                        LOG.warning(f"{ICN_WARNING} Async: ACK para TX:{tx_id} desconocida o ya procesada.", key="tx_desconocida")
+                    else:
+                        fut.set_result(msg)
+                else:
+                    LOG.warning(f"{ICN_WARNING} Async: Mensaje tipo '{msg_type}' desconocido (TX:{tx_id})", key="tipo_desconocido")
+        finally:
+            for task in open_txs:
+                task.cancel()
+
+    @classmethod
+    async def _transaction(cls, sock: zmq.asyncio.Socket, acks: Dict[str, tuple[asyncio.Future, dict]],
+                           faculty_identity: bytes, msg: dict):
+        loop = asyncio.get_running_loop()
+        tx_id = msg.get("transaction_id", "N/A_TX")
+        fac_nombre = msg.get("facultad", "Fac_Desconocida")
+        try:
+            proposal_data, res_id, reason = await loop.run_in_executor(cls.executor, _reserve_sol, msg, "Async")
+            if res_id is None:
+                denied_res = {"tipo": "RES", "status": "DENIED", "reason": reason, "transaction_id": tx_id}
+                await sock.send_multipart([faculty_identity, b'', WIRE.encode(faculty_identity, denied_res)])
+                LOG.debug(ICN_RES_SENT + f" DENIED (Async, TX:{tx_id}, Fac:{fac_nombre})")
+                return
+
+            # Registrar antes de enviar la PROP para que un ACK rápido no llegue a una TX desconocida
+            ack_future = cls._open_tx(acks, faculty_identity, tx_id, res_id, proposal_data, fac_nombre, ACK_TIMEOUT)
+            prop_msg_payload = {"tipo": "PROP", "data": proposal_data, "transaction_id": tx_id}
+            await sock.send_multipart([faculty_identity, b'', WIRE.encode(faculty_identity, prop_msg_payload)])
+            LOG.debug(ICN_PROP_SENT + f" (Async, TX:{tx_id}, Fac:{fac_nombre})")
+            await cls._await_ack(sock, acks, ack_future, faculty_identity, tx_id, res_id, proposal_data, fac_nombre, ACK_TIMEOUT)
+        except Exception as e:
+            LOG.error(f"{ICN_ERROR} Async: Excepción en TX:{tx_id}: {repr(e)}")
+
+    @classmethod
+    def _open_tx(cls, acks: Dict[str, tuple[asyncio.Future, dict]], faculty_identity: bytes, tx_id: str,
+                 res_id: int, proposal_data: dict, fac_nombre: str, timeout: float) -> asyncio.Future:
+        """Registra la TX (y su copia en el par); devuelve el future que recibe el ACK."""
+        ack_future = asyncio.get_running_loop().create_future()
+        acks[tx_id] = (ack_future, proposal_data)
+        if MIRROR: MIRROR.opened(tx_id, faculty_identity, res_id, proposal_data, fac_nombre, timeout)
+        return ack_future
+
+    @classmethod
+    async def _await_ack(cls, sock: zmq.asyncio.Socket, acks: Dict[str, tuple[asyncio.Future, dict]], ack_future: asyncio.Future,
+                         faculty_identity: bytes, tx_id: str, res_id: int, proposal_data: dict, fac_nombre: str, timeout: float,
+                         adopted: bool = False):
+        """Espera el ACK (o el timeout), confirma/libera la reserva y envía la RES. También para TX adoptadas."""
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        try:
+            try:
+                ack_msg = await asyncio.wait_for(ack_future, timeout)
+            except asyncio.TimeoutError:
+                acks.pop(tx_id, None)
+                lag_ms = (time.monotonic() - deadline) * 1000
+                final_res_payload = await loop.run_in_executor(cls.executor, _timeout_outcome, tx_id, res_id, fac_nombre,
+                                                               lag_ms, not adopted)
+            else:
+                final_res_payload = await loop.run_in_executor(cls.executor, _ack_outcome, tx_id, ack_msg, res_id,
+                                                               proposal_data, fac_nombre, "Async", "prop->res_async")
+            if MIRROR: MIRROR.closed(tx_id, final_res_payload)
+            await sock.send_multipart([faculty_identity, b'', WIRE.encode(faculty_identity, final_res_payload)])
+            LOG.debug(ICN_RES_SENT + f" {final_res_payload.get('status')} (Async, TX:{tx_id}, Fac:{fac_nombre})")
+        except Exception as e:
+            LOG.error(f"{ICN_ERROR} Async: Excepción en TX:{tx_id}: {repr(e)}")
+
+
+CORE = ServerCore # --engine asyncio lo cambia por AsyncServerCore
 
 
 class BinaryStarServer:
@@ -146,7 +413,7 @@ class BinaryStarServer:
         self.sub_socket.connect(f"tcp://{self.peer_address}:7000")
         self.sub_socket.setsockopt_string(zmq.SUBSCRIBE, "HB_ALIVE")
         
-        print(f"{ICN_HB_EVENT} Servidor {self.role} ({self.host_name}) PUB en *:7000, SUB a {self.peer_address}:7000", flush=True)
+        LOG.info(f"{ICN_HB_EVENT} Servidor {self.role} ({self.host_name}) PUB en *:7000, SUB a {self.peer_address}:7000")
         _register_server_state_db(self.role, self.host_name)
 
     def start_monitoring(self):
@@ -169,27 +436,28 @@ class BinaryStarServer:
             # Lógica de Binary Star
             if self.role == "PRIMARY":
                 if not self.is_server_core_active:
-                    ServerCore.activate(self.ctx)
+                    CORE.activate(self.ctx)
                     self.is_server_core_active = True
-                    print(f"{ICN_SERVER_STATE} {self.role} ({self.host_name}) ServerCore ACTIVADO.", flush=True)
+                    LOG.info(f"{ICN_SERVER_STATE} {self.role} ({self.host_name}) ServerCore ACTIVADO.")
                     _register_server_state_db("PRIMARY", self.host_name)
             
             elif self.role == "BACKUP":
                 if peer_is_alive: # Primario está vivo
                     if self.is_server_core_active: # Si backup estaba activo (failover)
-                        ServerCore.deactivate()
+                        CORE.deactivate()
                         self.is_server_core_active = False
-                        print(f"{ICN_SERVER_STATE} {self.role} ({self.host_name}) ServerCore DESACTIVADO (Primario recuperado).", flush=True)
+                        LOG.info(f"{ICN_SERVER_STATE} {self.role} ({self.host_name}) ServerCore DESACTIVADO (Primario recuperado).")
                         _register_server_state_db("BACKUP", self.host_name)
                 else: # Primario parece caído
                     if not self.is_server_core_active:
-                        ServerCore.activate(self.ctx)
+                        CORE.activate(self.ctx)
                         self.is_server_core_active = True
-                        print(f"{ICN_SERVER_STATE} {self.role} ({self.host_name}) ServerCore ACTIVADO (Failover).", flush=True)
+                        LOG.info(f"{ICN_SERVER_STATE} {self.role} ({self.host_name}) ServerCore ACTIVADO (Failover).")
                         _register_server_state_db("PRIMARY", self.host_name) # Backup asume rol primario
 
 def server_worker(ctx: zmq.Context, worker_id: int):
     worker_sock = ctx.socket(zmq.DEALER)
+    worker_sock.setsockopt(zmq.RCVHWM, admission.BACKEND_HWM)
     worker_sock.connect("inproc://backend_processing")
     # print(f"{ICN_INFO} Worker-{worker_id} conectado.", flush=True)
 
@@ -197,166 +465,432 @@ def server_worker(ctx: zmq.Context, worker_id: int):
         try:
             # ROUTER-DEALER (proxy) - DEALER (worker)
             # Worker recibe: [identidad_cliente_original, frame_vacio, payload_json]
-            frames = worker_sock.recv_multipart()
-            if len(frames) != 3 or frames[1] != b'':
-                print(f"{ICN_ERROR} Worker-{worker_id}: Framing incorrecto recibido del proxy: {frames}", flush=True)
-                continue
-            
-            faculty_identity, _, payload_bytes = frames
-            
-            try:
-                msg = json.loads(payload_bytes.decode('utf-8'))
-            except (json.JSONDecodeError, UnicodeDecodeError) as e:
-                print(f"{ICN_ERROR} Worker-{worker_id}: Error decodificando JSON: {e}. Payload: {payload_bytes}", flush=True)
-                continue
-
-            tx_id = msg.get("transaction_id", "N/A_TX")
-            msg_type = msg.get("tipo", "N/A_TIPO")
-            fac_nombre = msg.get("facultad", "Fac_Desconocida")
-
-            if msg_type == "SOL":
-                print(ICN_SOL_RECV + f" (W-{worker_id}, TX:{tx_id}, Fac:{fac_nombre}, Prog:{msg.get('programa')})", flush=True)
-                salones_req, labs_req = msg.get("salones", 0), msg.get("laboratorios", 0)
-                faculty_id_db, program_id_db = msg.get("faculty_id",0), msg.get("program_id",0)
-                semester_db = msg.get("semester", "N/A")
-
-                # Asegurar que la facultad y el programa existan en la BD
-                ensure_faculty(faculty_id_db, fac_nombre, semester_db)
-                ensure_program(program_id_db, faculty_id_db, msg.get("programa","N/A"), semester_db)
-
-                print(ICN_PROP_CALC + f" (W-{worker_id}, TX:{tx_id})", flush=True)
-                proposal_data = {}
-                res_id = -1
-
-                with timed(f"sol->prop_w{worker_id}", fac_nombre, "ServidorAsync"):
-                    cls_free, lab_free = ResourceView.free_counts()
-                    s_prop = min(salones_req, cls_free)
-                    l_prop = min(labs_req, lab_free)
-                    mob_needed = labs_req - l_prop
-                    mob_alloc = min(mob_needed, max(0, cls_free - s_prop))
-                    proposal_data = {
-                        "salones_propuestos": s_prop,
-                        "laboratorios_propuestos": l_prop,
-                        "aulas_moviles": mob_alloc
-                    }
-                
+            batch = [worker_sock.recv_multipart()]
+            # Bajo carga, drenar sin bloquear lo que ya esté encolado (hasta SOL_BATCH_MAX)
+            while len(batch) < SOL_BATCH_MAX:
                 try:
-                    res_id = allocate_rooms(s_prop, l_prop, faculty_id_db, program_id_db) # Nota: allocate_rooms podría necesitar adaptar para aulas móviles
-                    print(ICN_RESV + f" (W-{worker_id}, TX:{tx_id}, ResID:{res_id}) Salones:{s_prop+mob_alloc}, Labs:{l_prop}", flush=True)
-                    
-                    prop_msg_payload = {"tipo": "PROP", "data": proposal_data, "transaction_id": tx_id}
-                    worker_sock.send_multipart([faculty_identity, b'', json.dumps(prop_msg_payload).encode('utf-8')])
-                    print(ICN_PROP_SENT + f" (W-{worker_id}, TX:{tx_id}, Fac:{fac_nombre})", flush=True)
-
-                    with transactions_lock:
-                        transactions[tx_id] = {
-                            'event': threading.Event(), 'ack_message': None, 
-                            'faculty_identity': faculty_identity, 
-                            'res_id': res_id, 'proposal_data': proposal_data,
-                            'timestamp': time.time(), 'fac_nombre': fac_nombre # Guardar para timeout y logs
-                        }
-                except ValueError as e_alloc: # Fallo en allocate_rooms
-                    print(f"{ICN_ERROR} W-{worker_id}: DENIED (allocate_rooms) (TX:{tx_id}, Fac:{fac_nombre}) - {e_alloc}", flush=True)
-                    denied_res = {"tipo": "RES", "status": "DENIED", "reason": str(e_alloc), "transaction_id": tx_id}
-                    try: worker_sock.send_multipart([faculty_identity, b'', json.dumps(denied_res).encode('utf-8')])
-                    except Exception as e: print(f"{ICN_ERROR} W-{worker_id}: EXCP enviando DENIED RES (TX:{tx_id}): {repr(e)}", flush=True)
-                    print(ICN_RES_SENT + f" DENIED (W-{worker_id}, TX:{tx_id}, Fac:{fac_nombre})", flush=True)
-
-
-            elif msg_type == "ACK":
-                print(ICN_ACK_RECV + f" (W-{worker_id}, TX:{tx_id}, Fac:{fac_nombre})", flush=True)
-                with transactions_lock:
-                    tx_entry = transactions.get(tx_id)
-                    if tx_entry:
-                        tx_entry['ack_message'] = msg
-                        tx_entry['event'].set() # Notificar al hilo monitor de ACKs
-                    else:
-                        print(f"{ICN_WARNING} W-{worker_id}: ACK para TX:{tx_id} desconocida o ya procesada.", flush=True)
-            else:
-                print(f"{ICN_WARNING} W-{worker_id}: Mensaje tipo '{msg_type}' desconocido (TX:{tx_id})", flush=True)
+                    batch.append(worker_sock.recv_multipart(zmq.NOBLOCK))
+                except zmq.Again:
+                    break
+            _process_batch(worker_sock, worker_id, batch)
 
         except Exception as e:
-            print(f"{ICN_ERROR} Worker-{worker_id}: Excepción en bucle: {repr(e)}", flush=True)
+            LOG.error(f"{ICN_ERROR} Worker-{worker_id}: Excepción en bucle: {repr(e)}")
             time.sleep(1) # Evitar un ciclo de error rápido
 
+def _process_batch(worker_sock: zmq.Socket, worker_id: int, batch: list):
+    """Procesa los mensajes que un worker tomó de una vez (del proxy o de la cola del pool)."""
+    sols = []
+    for frames in batch:
+        parsed = _parse_frames(f"W-{worker_id}", frames)
+        if parsed is None:
+            continue
+        faculty_identity, msg = parsed
+        msg_type = msg.get("tipo", "N/A_TIPO")
+        if msg_type == "SOL":
+            sols.append((faculty_identity, msg))
+        elif msg_type == "ACK":
+            _handle_ack(worker_sock, worker_id, faculty_identity, msg)
+        else:
+            LOG.warning(f"{ICN_WARNING} W-{worker_id}: Mensaje tipo '{msg_type}' desconocido (TX:{msg.get('transaction_id', 'N/A_TX')})", key="tipo_desconocido")
+
+    if sols:
+        _handle_sols(worker_sock, worker_id, sols)
+
+def _parse_frames(who: str, frames: list):
+    """Devuelve (identidad_facultad, msg) o None si el mensaje es inválido. `who` etiqueta los logs (W-3, Async)."""
+    if len(frames) != 3 or frames[1] != b'':
+        LOG.error(f"{ICN_ERROR} {who}: Framing incorrecto recibido del proxy: {frames}", key="framing")
+        return None
+
+    faculty_identity, _, payload_bytes = frames
+
+    try:
+        msg = WIRE.decode(faculty_identity, payload_bytes) # JSON o binario (wire)
+    except (ValueError, UnicodeDecodeError) as e:
+        LOG.error(f"{ICN_ERROR} {who}: Error decodificando mensaje: {e}. Payload: {payload_bytes}", key="decode")
+        return None
+    return faculty_identity, msg
+
+def _compute_proposal(salones_req: int, labs_req: int, cls_free: int, lab_free: int) -> dict:
+    s_prop = min(salones_req, cls_free)
+    l_prop = min(labs_req, lab_free)
+    mob_needed = labs_req - l_prop
+    mob_alloc = min(mob_needed, max(0, cls_free - s_prop))
+    return {
+        "salones_propuestos": s_prop,
+        "laboratorios_propuestos": l_prop,
+        "aulas_moviles": mob_alloc
+    }
+
+def _reserve_sol(msg: dict, who: str) -> tuple[dict, int, str]:
+    """Una SOL (motor asyncio o dueño de la asignación): (propuesta, res_id, None) o (propuesta, None, motivo)."""
+    tx_id = msg.get("transaction_id", "N/A_TX")
+    fac_nombre = msg.get("facultad", "Fac_Desconocida")
+    LOG.debug(ICN_SOL_RECV + f" ({who}, TX:{tx_id}, Fac:{fac_nombre}, Prog:{msg.get('programa')})")
+    faculty_id_db, program_id_db = msg.get("faculty_id",0), msg.get("program_id",0)
+    semester_db = msg.get("semester", "N/A")
+    ensure_faculty(faculty_id_db, fac_nombre, semester_db)
+    ensure_program(program_id_db, faculty_id_db, msg.get("programa","N/A"), semester_db)
+
+    if ALLOCATOR is not None: # Espera el lote del optimizador
+        proposal_data, res_id, reason = ALLOCATOR.submit(msg.get("salones", 0), msg.get("laboratorios", 0),
+                                                         faculty_id_db, program_id_db).result()
+        if res_id is None:
+            LOG.error(f"{ICN_ERROR} {who}: DENIED (allocate_rooms) (TX:{tx_id}, Fac:{fac_nombre}) - {reason}", key="denied")
+            return proposal_data, None, reason
+    else:
+        with timed(f"sol->prop_{who.lower()}", fac_nombre, "ServidorAsync"):
+            cls_free, lab_free = ResourceView.free_counts()
+            proposal_data = _compute_proposal(msg.get("salones", 0), msg.get("laboratorios", 0), cls_free, lab_free)
+        try:
+            res_id = allocate_rooms(proposal_data["salones_propuestos"],
+                                    proposal_data["laboratorios_propuestos"] + proposal_data["aulas_moviles"],
+                                    faculty_id_db, program_id_db)
+        except ValueError as e_alloc:
+            LOG.error(f"{ICN_ERROR} {who}: DENIED (allocate_rooms) (TX:{tx_id}, Fac:{fac_nombre}) - {e_alloc}", key="denied")
+            return proposal_data, None, str(e_alloc)
+    s_prop, l_prop = proposal_data["salones_propuestos"], proposal_data["laboratorios_propuestos"]
+    LOG.debug(ICN_RESV + f" ({who}, TX:{tx_id}, ResID:{res_id}) Salones:{s_prop+proposal_data['aulas_moviles']}, Labs:{l_prop}")
+    return proposal_data, res_id, None
+
+def _handle_sols(worker_sock: zmq.Socket, worker_id: int, sols: list):
+    """
+    Calcula propuestas y reserva para una o varias SOL. Con varias SOL se
+    reserva todo en una sola llamada (allocate_rooms_batch): un lock y una
+    transacción por lote. Con ALLOCATOR, las SOL van al lote del
+    optimizador y el worker espera su resultado.
+    """
+    cls_free, lab_free = ResourceView.free_counts()
+    pending_allocs = []   # (faculty_identity, tx_id, fac_nombre, proposal_data, alloc_args)
+
+    for faculty_identity, msg in sols:
+        tx_id = msg.get("transaction_id", "N/A_TX")
+        fac_nombre = msg.get("facultad", "Fac_Desconocida")
+        LOG.debug(ICN_SOL_RECV + f" (W-{worker_id}, TX:{tx_id}, Fac:{fac_nombre}, Prog:{msg.get('programa')})")
+        with transactions_lock: known = transactions.get(tx_id)
+        if known is not None: # SOL reenviada (FailoverReq, con o sin --mirror): la TX ya tiene reserva, misma PROP
+            prop_msg_payload = {"tipo": "PROP", "data": known['proposal_data'], "transaction_id": tx_id}
+            worker_sock.send_multipart([faculty_identity, b'', WIRE.encode(faculty_identity, prop_msg_payload)])
+            continue
+        salones_req, labs_req = msg.get("salones", 0), msg.get("laboratorios", 0)
+        faculty_id_db, program_id_db = msg.get("faculty_id",0), msg.get("program_id",0)
+        semester_db = msg.get("semester", "N/A")
+
+        # Asegurar que la facultad y el programa existan en la BD
+        ensure_faculty(faculty_id_db, fac_nombre, semester_db)
+        ensure_program(program_id_db, faculty_id_db, msg.get("programa","N/A"), semester_db)
+
+        LOG.debug(ICN_PROP_CALC + f" (W-{worker_id}, TX:{tx_id})")
+        if ALLOCATOR is not None:
+            pending_allocs.append((faculty_identity, tx_id, fac_nombre, None,
+                                   ALLOCATOR.submit(salones_req, labs_req, faculty_id_db, program_id_db)))
+            continue
+        with timed(f"sol->prop_w{worker_id}", fac_nombre, "ServidorAsync"):
+            proposal_data = _compute_proposal(salones_req, labs_req, cls_free, lab_free)
+        s_prop, l_prop, mob = (proposal_data["salones_propuestos"], proposal_data["laboratorios_propuestos"],
+                               proposal_data["aulas_moviles"])
+        # Lo propuesto a las SOL anteriores del mismo lote ya no está libre
+        cls_free -= s_prop + mob
+        lab_free -= l_prop
+        # Las aulas móviles se piden como labs: allocate_rooms adapta aulas al faltar labs (igual que el allocator)
+        pending_allocs.append((faculty_identity, tx_id, fac_nombre, proposal_data,
+                               (s_prop, l_prop + mob, faculty_id_db, program_id_db)))
+
+    if ALLOCATOR is not None:
+        results = [p[4].result() for p in pending_allocs] # (propuesta, res_id, motivo)
+        pending_allocs = [(*p[:3], proposal_data, None) for p, (proposal_data, _, _) in zip(pending_allocs, results)]
+        outcomes = [(res_id, reason) for _, res_id, reason in results]
+    elif len(pending_allocs) == 1:
+        try:
+            outcomes = [(allocate_rooms(*pending_allocs[0][4]), None)]
+        except ValueError as e_alloc: # Fallo en allocate_rooms
+            outcomes = [(None, str(e_alloc))]
+    else:
+        outcomes = allocate_rooms_batch([p[4] for p in pending_allocs])
+
+    for (faculty_identity, tx_id, fac_nombre, proposal_data, _), (res_id, reason) in zip(pending_allocs, outcomes):
+        if res_id is None:
+            LOG.error(f"{ICN_ERROR} W-{worker_id}: DENIED (allocate_rooms) (TX:{tx_id}, Fac:{fac_nombre}) - {reason}", key="denied")
+            denied_res = {"tipo": "RES", "status": "DENIED", "reason": reason, "transaction_id": tx_id}
+            try: worker_sock.send_multipart([faculty_identity, b'', WIRE.encode(faculty_identity, denied_res)])
+            except Exception as e: LOG.error(f"{ICN_ERROR} W-{worker_id}: EXCP enviando DENIED RES (TX:{tx_id}): {repr(e)}")
+            LOG.debug(ICN_RES_SENT + f" DENIED (W-{worker_id}, TX:{tx_id}, Fac:{fac_nombre})")
+            continue
+
+        s_prop, l_prop = proposal_data["salones_propuestos"], proposal_data["laboratorios_propuestos"]
+        LOG.debug(ICN_RESV + f" (W-{worker_id}, TX:{tx_id}, ResID:{res_id}) Salones:{s_prop+proposal_data['aulas_moviles']}, Labs:{l_prop}")
+
+        # Registrar antes de enviar la PROP para que un ACK rápido no llegue a una TX desconocida
+        _register_tx(tx_id, faculty_identity, res_id, proposal_data, fac_nombre)
+        prop_msg_payload = {"tipo": "PROP", "data": proposal_data, "transaction_id": tx_id}
+        worker_sock.send_multipart([faculty_identity, b'', WIRE.encode(faculty_identity, prop_msg_payload)])
+        LOG.debug(ICN_PROP_SENT + f" (W-{worker_id}, TX:{tx_id}, Fac:{fac_nombre})")
+
+def _register_tx(tx_id: str, faculty_identity: bytes, res_id: int, proposal_data: dict, fac_nombre: str,
+                 timeout: float = ACK_TIMEOUT, adopted: bool = False):
+    deadline = time.monotonic() + timeout
+    if MIRROR: MIRROR.opened(tx_id, faculty_identity, res_id, proposal_data, fac_nombre, timeout)
+    with transactions_cv:
+        transactions[tx_id] = {
+            'ack_message': None,
+            'faculty_identity': faculty_identity,
+            'res_id': res_id, 'proposal_data': proposal_data,
+            'deadline': deadline, 'fac_nombre': fac_nombre, # Guardar para timeout y logs
+            'adopted': adopted # Del par caído (txmirror): al vencer no libera la reserva
+        }
+        heapq.heappush(_deadlines, (deadline, tx_id))
+        transactions_cv.notify()
+
+def _owner_handle(faculty_identity: bytes, msg: dict) -> list[dict]:
+    """
+    Dueño de la asignación (PROCS > 0): recibe de los parsers mensajes ya
+    validados, de a uno, y devuelve lo que hay que enviar a la facultad.
+    Los timeouts siguen en ack_timeout_monitor.
+    """
+    tx_id = msg["transaction_id"]
+    fac_nombre = msg.get("facultad", "Fac_Desconocida")
+    if msg["tipo"] == "SOL":
+        with transactions_lock: known = transactions.get(tx_id)
+        if known is not None: # SOL reenviada (FailoverReq): misma PROP
+            return [{"tipo": "PROP", "data": known['proposal_data'], "transaction_id": tx_id}]
+        proposal_data, res_id, reason = _reserve_sol(msg, "Owner")
+        if res_id is None:
+            return [{"tipo": "RES", "status": "DENIED", "reason": reason, "transaction_id": tx_id}]
+        _register_tx(tx_id, faculty_identity, res_id, proposal_data, fac_nombre)
+        return [{"tipo": "PROP", "data": proposal_data, "transaction_id": tx_id}]
+
+    LOG.debug(ICN_ACK_RECV + f" (Owner, TX:{tx_id}, Fac:{fac_nombre})")
+    with transactions_lock:
+        tx_entry = transactions.pop(tx_id, None)
+    if tx_entry is None:
+        replayed = MIRROR.replay(tx_id) if MIRROR else None
+        if replayed is None:
+            LOG.warning(f"{ICN_WARNING} Owner: ACK para TX:{tx_id} desconocida o ya procesada.", key="tx_desconocida")
+        return [replayed] if replayed else []
+    final_res_payload = _ack_outcome(tx_id, msg, tx_entry['res_id'], tx_entry['proposal_data'], fac_nombre,
+                                     "Owner", "prop->res_owner")
+    if MIRROR: MIRROR.closed(tx_id, final_res_payload)
+    return [final_res_payload]
+
+def _handle_ack(worker_sock: zmq.Socket, worker_id: int, faculty_identity: bytes, msg: dict):
+    tx_id = msg.get("transaction_id", "N/A_TX")
+    fac_nombre = msg.get("facultad", "Fac_Desconocida")
+    LOG.debug(ICN_ACK_RECV + f" (W-{worker_id}, TX:{tx_id}, Fac:{fac_nombre})")
+    if ACK_MODE == "inline":
+        # Sacar la TX bajo el lock la reclama para este worker; su deadline
+        # queda en el heap y el monitor lo descarta al vencer.
+        with transactions_lock:
+            tx_entry = transactions.pop(tx_id, None)
+        if tx_entry is None:
+            _unknown_ack(worker_sock, worker_id, faculty_identity, tx_id)
+            return
+        tx_entry['ack_message'] = msg
+        _finish_acked(worker_sock, tx_id, tx_entry, f"W-{worker_id}", "prop->res_inline")
+        return
+    with transactions_cv:
+        tx_entry = transactions.get(tx_id)
+        if tx_entry and tx_entry['ack_message'] is None:
+            tx_entry['ack_message'] = msg
+            _acks_ready.append(tx_id)
+            transactions_cv.notify() # El monitor la completa sin esperar a su deadline
+            return
+    _unknown_ack(worker_sock, worker_id, faculty_identity, tx_id)
+
+def _unknown_ack(worker_sock: zmq.Socket, worker_id: int, faculty_identity: bytes, tx_id: str):
+    """ACK sin TX abierta: si el par la cerró antes de caer, se repite su RES (txmirror)."""
+    replayed = MIRROR.replay(tx_id) if MIRROR else None
+    if replayed is None:
+        LOG.warning(f"{ICN_WARNING} W-{worker_id}: ACK para TX:{tx_id} desconocida o ya procesada.", key="tx_desconocida")
+        return
+    worker_sock.send_multipart([faculty_identity, b'', WIRE.encode(faculty_identity, replayed)])
+
+def _finish_acked(reply_sock: zmq.Socket, tx_id: str, entry: Dict[str, Any], who: str = "Monitor ACK",
+                  kind: str = "prop->res_mon"):
+    """Confirma o libera la reserva según el ACK recibido y envía la RES final."""
+    fac_nombre_orig = entry.get('fac_nombre', "Fac_Desconocida")
+    final_res_payload = _ack_outcome(tx_id, entry['ack_message'], entry['res_id'], entry['proposal_data'],
+                                     fac_nombre_orig, who, kind)
+    if MIRROR: MIRROR.closed(tx_id, final_res_payload)
+    try:
+        reply_sock.send_multipart([entry['faculty_identity'], b'', WIRE.encode(entry['faculty_identity'], final_res_payload)])
+        LOG.debug(ICN_RES_SENT + f" {final_res_payload.get('status')} ({who}, TX:{tx_id}, Fac:{fac_nombre_orig})")
+    except Exception as e_send:
+        LOG.error(f"{ICN_ERROR} {who}: Excepción al enviar RES FINAL (TX:{tx_id}): {repr(e_send)}")
+
+def _ack_outcome(tx_id: str, ack_msg: dict, res_id: int, proposal: dict, fac_nombre_orig: str, who: str,
+                 kind: str) -> dict:
+    """
+    Confirma o libera la reserva según el ACK; devuelve la RES final. `who`
+    sólo etiqueta los logs; `kind` es la métrica prop->res_* a registrar.
+    """
+    with timed(kind, fac_nombre_orig, "ServidorAsync"):
+        if ack_msg.get("confirm") == "ACCEPT" and not confirm_reservation(res_id):
+            final_res_payload = {"tipo": "RES", "status": "CANCELED", "reason": "Reserva expirada", "transaction_id": tx_id}
+            LOG.debug(ICN_CANC + f" {fac_nombre_orig} ({who}, TX:{tx_id}) - Razón: lease vencido")
+        elif ack_msg.get("confirm") == "ACCEPT":
+            final_res_payload = {"tipo": "RES", "status": "ACCEPTED", **proposal, "transaction_id": tx_id}
+            LOG.debug(ICN_CONF + f" {fac_nombre_orig} ({who}, TX:{tx_id})")
+        else:
+            fail_reservation(res_id)
+            reason = ack_msg.get("reason", "Rechazado por facultad")
+            final_res_payload = {"tipo": "RES", "status": "CANCELED", "reason": reason, "transaction_id": tx_id}
+            LOG.debug(ICN_CANC + f" {fac_nombre_orig} ({who}, TX:{tx_id}) - Razón: {reason}")
+    return final_res_payload
+
+def _finish_timeout(reply_sock: zmq.Socket, tx_id: str, entry: Dict[str, Any], lag_ms: float):
+    """Libera la reserva de una TX sin ACK y envía la RES CANCELED."""
+    timeout_res_payload = _timeout_outcome(tx_id, entry['res_id'], entry.get('fac_nombre', "N/A"), lag_ms,
+                                           not entry.get('adopted'))
+    if MIRROR: MIRROR.closed(tx_id, timeout_res_payload)
+    try:
+        reply_sock.send_multipart([entry['faculty_identity'], b'', WIRE.encode(entry['faculty_identity'], timeout_res_payload)])
+        LOG.debug(ICN_RES_SENT + f" CANCELED (Timeout ACK) (Monitor ACK, TX:{tx_id}, Fac:{entry.get('fac_nombre')})")
+    except Exception as e_send:
+        LOG.error(f"{ICN_ERROR} Monitor ACK: Excepción al enviar RES CANCELED por TIMEOUT (TX:{tx_id}): {repr(e_send)}")
+
+def _timeout_outcome(tx_id: str, res_id: int, fac_nombre: str, lag_ms: float, release: bool = True) -> dict:
+    """
+    Libera la reserva de una TX sin ACK; devuelve la RES CANCELED. Con
+    release=False (TX adoptada del par) la reserva queda al lease: el par
+    pudo haberla confirmado antes de caer.
+    """
+    LOG.debug(ICN_TIMEOUT + f" Esperando ACK para TX:{tx_id} de Fac:{fac_nombre}. Reserva será cancelada.")
+    if release:
+        fail_reservation(res_id)
+    record_event_metric("ack_timeout_lag_ms", lag_ms, fac_nombre, "ServidorAsync")
+    return {"tipo": "RES", "status": "CANCELED", "reason": "Timeout esperando ACK del servidor", "transaction_id": tx_id}
+
 def ack_timeout_monitor(ctx: zmq.Context):
     """
-    Monitorea las transacciones pendientes y maneja los timeouts de ACK.
-    Procesa las confirmaciones/cancelaciones de ACK y envía la RES final.
+    Completa las transacciones pendientes de ACK (con ACK_MODE="inline" los
+    ACK los completa el worker y aquí sólo llegan los timeouts).
+    • Duerme en transactions_cv hasta el deadline más próximo del heap o
+      hasta que un worker avise de un ACK (_acks_ready); la espera suelta
+      el lock, así que workers y ACKs nunca esperan al monitor.
+    • Con el ACK confirma/libera la reserva; sin ACK a tiempo la libera.
+      La BD y los envíos se hacen fuera del lock.
+    • La RES sale por un PUSH a inproc://ack_replies, que el proxy reenvía
+      al frontend. (Un DEALER en el backend recibiría su parte del reparto
+      round-robin de SOL/ACK y esos mensajes se perderían.)
     """
-    # Este socket es para que el monitor envíe la RES final a la facultad.
-    # Se conecta al backend del proxy, igual que los workers.
-    monitor_reply_sock = ctx.socket(zmq.DEALER)
-    monitor_reply_sock.connect("inproc://backend_processing")
-    print(f"{ICN_INFO} Monitor de ACKs conectado a inproc://backend_processing", flush=True)
+    reply_sock, generation = None, None
+    LOG.info(f"{ICN_INFO} Monitor de ACKs: deadlines en heap, RES por {ACK_REPLY_ENDPOINT}")
 
     while True:
-        tx_to_remove = []
-        with transactions_lock:
-            for tx_id, entry in list(transactions.items()): # Usar list() para poder modificar el dict
-                ack_received_event = entry['event']
-                
-                # Esperar por el ACK con timeout
-                if ack_received_event.wait(timeout=0.1): # Poll corto, no bloquear mucho
-                    ack_msg = entry['ack_message']
-                    fac_ident = entry['faculty_identity']
-                    res_id = entry['res_id']
-                    proposal = entry['proposal_data']
-                    fac_nombre_orig = entry.get('fac_nombre', "Fac_Desconocida")
-                    
-                    final_res_payload = {}
-                    with timed(f"prop->res_mon", fac_nombre_orig, "ServidorAsync"): # Usar un kind diferente o id de worker
-                        if ack_msg and ack_msg.get("confirm") == "ACCEPT":
-                            confirm_reservation(res_id)
-                            final_res_payload = {"tipo": "RES", "status": "ACCEPTED", **proposal, "transaction_id": tx_id}
-                            print(ICN_CONF + f" {fac_nombre_orig} (Monitor ACK, TX:{tx_id})", flush=True)
-                        else:
-                            fail_reservation(res_id)
-                            reason = ack_msg.get("reason", "Rechazado por facultad") if ack_msg else "ACK inválido o no ACCEPT"
-                            final_res_payload = {"tipo": "RES", "status": "CANCELED", "reason": reason, "transaction_id": tx_id}
-                            print(ICN_CANC + f" {fac_nombre_orig} (Monitor ACK, TX:{tx_id}) - Razón: {reason}", flush=True)
-                    
-                    try:
-                        monitor_reply_sock.send_multipart([fac_ident, b'', json.dumps(final_res_payload).encode('utf-8')])
-                        print(ICN_RES_SENT + f" {final_res_payload.get('status')} (Monitor ACK, TX:{tx_id}, Fac:{fac_nombre_orig})", flush=True)
-                    except Exception as e_send:
-                        print(f"{ICN_ERROR} Monitor ACK: Excepción al enviar RES FINAL (TX:{tx_id}): {repr(e_send)}", flush=True)
-                    
-                    tx_to_remove.append(tx_id)
-
-                elif (time.time() - entry.get('timestamp', time.time())) > ACK_TIMEOUT:
-                    # Timeout esperando ACK
-                    print(ICN_TIMEOUT + f" Esperando ACK para TX:{tx_id} de Fac:{entry.get('fac_nombre', 'N/A')}. Reserva será cancelada.", flush=True)
-                    fac_ident = entry['faculty_identity']
-                    res_id = entry['res_id']
-                    fail_reservation(res_id)
-                    timeout_res_payload = {"tipo": "RES", "status": "CANCELED", "reason": "Timeout esperando ACK del servidor", "transaction_id": tx_id}
-                    try:
-                        monitor_reply_sock.send_multipart([fac_ident, b'', json.dumps(timeout_res_payload).encode('utf-8')])
-                        print(ICN_RES_SENT + f" CANCELED (Timeout ACK) (Monitor ACK, TX:{tx_id}, Fac:{entry.get('fac_nombre')})", flush=True)
-                    except Exception as e_send:
-                         print(f"{ICN_ERROR} Monitor ACK: Excepción al enviar RES CANCELED por TIMEOUT (TX:{tx_id}): {repr(e_send)}", flush=True)
-                    tx_to_remove.append(tx_id)
-
-            # Limpiar transacciones procesadas o expiradas
-            for tx_id in tx_to_remove:
-                if tx_id in transactions:
-                    del transactions[tx_id]
-        
-        if not tx_to_remove: # Si no hubo actividad, dormir un poco más
-            time.sleep(0.2)
+        with transactions_cv:
+            while True:
+                now = time.monotonic()
+                if _acks_ready or (_deadlines and _deadlines[0][0] <= now):
+                    break
+                transactions_cv.wait(_deadlines[0][0] - now if _deadlines else None)
+            acked = [(tx_id, transactions.pop(tx_id)) for tx_id in _acks_ready if tx_id in transactions]
+            _acks_ready.clear()
+            expired = []
+            while _deadlines and _deadlines[0][0] <= now:
+                deadline, tx_id = heapq.heappop(_deadlines)
+                entry = transactions.get(tx_id) # None: ya completada por su ACK
+                if entry is None or entry['deadline'] != deadline:
+                    continue # Entrada vieja: la TX actual con ese id tiene otro deadline
+                del transactions[tx_id]
+                expired.append((tx_id, entry, (now - deadline) * 1000))
+
+        # Cada activación crea un proxy (y un PULL) nuevo: reconectar el PUSH
+        if generation != ServerCore.generation:
+            if reply_sock is not None: reply_sock.close(linger=0)
+            reply_sock = ctx.socket(zmq.PUSH)
+            reply_sock.connect(ACK_REPLY_ENDPOINT)
+            generation = ServerCore.generation
+        for tx_id, entry in acked:
+            _finish_acked(reply_sock, tx_id, entry)
+        for tx_id, entry, lag_ms in expired:
+            _finish_timeout(reply_sock, tx_id, entry, lag_ms)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--role", choices=["PRIMARY", "BACKUP"], required=True, help="Rol del servidor.")
     parser.add_argument("--peer", required=True, help="Dirección IP/hostname del servidor par.")
+    parser.add_argument("--inventory", choices=["sql", "memory"], default=INVENTORY_MODE,
+                        help="Motor de asignación: SQL directo o inventario en memoria con write-behind.")
+    parser.add_argument("--group-commit", action="store_true",
+                        help="Agrupar allocate/confirm/fail concurrentes en una sola transacción.")
+    parser.add_argument("--sol-batch", type=int, default=SOL_BATCH_MAX,
+                        help="Máximo de mensajes que un worker drena y reserva en un solo lote.")
+    parser.add_argument("--ack-mode", choices=["monitor", "inline"], default=ACK_MODE,
+                        help="Quién completa un ACK: el monitor de ACKs o el worker que lo recibe.")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads",
+                        help="threads: proxy + WORKERS hilos + monitor de ACKs; asyncio: una corrutina por transacción.")
+    parser.add_argument("--procs", type=int, default=PROCS,
+                        help="N>0: workers en N procesos parser + un único dueño de la asignación (ipc://).")
+    parser.add_argument("--pool", metavar="MIN:MAX",
+                        help="Pool de workers adaptable entre MIN y MAX según la espera en cola (p. ej. 2:32).")
+    parser.add_argument("--replication", action="store_true",
+                        help="BD local por servidor; el activo replica sus cambios al standby por ZMQ.")
+    parser.add_argument("--mirror", action="store_true",
+                        help="Copia las TX abiertas (PROP sin ACK) al standby, que las adopta al promoverse.")
+    parser.add_argument("--log-level", choices=["debug", "info", "warning", "error"], default=applog.DEFAULT_LEVEL,
+                        help="debug muestra el flujo SOL/PROP/ACK/RES de cada transacción.")
+    parser.add_argument("--max-inflight", type=int, default=admission.MAX_INFLIGHT,
+                        help="Tope de transacciones abiertas; al alcanzarlo cada SOL recibe RES BUSY (0 = sin tope).")
+    parser.add_argument("--frontend-hwm", type=int, default=admission.FRONTEND_HWM,
+                        help="HWM (mensajes por facultad) del ROUTER frontend.")
+    parser.add_argument("--backend-hwm", type=int, default=admission.BACKEND_HWM,
+                        help="Mensajes encolados por worker/parser; con la cola llena cada SOL recibe RES BUSY.")
+    parser.add_argument("--alloc-window", type=float, default=allocator.WINDOW_MS, metavar="MS",
+                        help="Junta las SOL que llegan en MS ms y las asigna en lote maximizando programas completos (0 = no).")
+    parser.add_argument("--fair", nargs="?", const="", metavar="ID=PESO,...",
+                        help="Reparto justo por facultad (DRR) en la cola del pool; pesos opcionales, p. ej. 1=2,3=0.5.")
     args = parser.parse_args()
+    LOG.set_level(args.log_level)
+    admission.MAX_INFLIGHT = max(0, args.max_inflight)
+    admission.FRONTEND_HWM = max(0, args.frontend_hwm)
+    admission.BACKEND_HWM = max(0, args.backend_hwm)
+    install_dump_signal() # SIGUSR1 → vuelca el anillo de log
+    INVENTORY_MODE = args.inventory
+    SOL_BATCH_MAX = max(1, args.sol_batch)
+    ACK_MODE = args.ack_mode
+    if args.engine == "asyncio":
+        CORE = AsyncServerCore
+    PROCS = max(0, args.procs)
+    if args.pool:
+        try:
+            POOL_BOUNDS = dispatch.parse_bounds(args.pool)
+        except ValueError as e:
+            parser.error(f"--pool: {e}")
+    if args.fair is not None:
+        try:
+            FAIR_WEIGHTS = dispatch.parse_weights(args.fair)
+        except ValueError as e:
+            parser.error(f"--fair: {e}")
+        if PROCS or CORE is AsyncServerCore:
+            LOG.warning(f"{ICN_WARNING} --fair sólo aplica al motor threads sin --procs; se ignora.")
+            FAIR_WEIGHTS = None
+        elif not POOL_BOUNDS:
+            POOL_BOUNDS = (WORKERS, WORKERS) # la cola del pool es la que se reparte
+    if PROCS:
+        procpool.start_parsers(PROCS) # fork antes de crear el contexto ZMQ
+    if args.group_commit:
+        enable_group_commit()
+    if args.alloc_window > 0:
+        if PROCS:
+            LOG.warning(f"{ICN_WARNING} --alloc-window no aplica con --procs (un solo dueño de la asignación); se ignora.")
+        else:
+            ALLOCATOR = allocator.BatchAllocator(ResourceView.free_counts, allocate_rooms_batch, args.alloc_window)
 
     hostname = gethostname()
-    print(f"\nServidor Asíncrono {args.role} ({hostname}) inicializado; peer: {args.peer}. Esperando eventos HB...", flush=True)
+    LOG.info(f"\nServidor Asíncrono {args.role} ({hostname}) inicializado; peer: {args.peer}. Esperando eventos HB...")
     
     ctx = zmq.Context()
+    if args.replication:
+        from replication import ReplicationLink
+        if STORAGE_MODE != "local":
+            LOG.warning(f"{ICN_WARNING} --replication espera CLASSROOM_DB_MODE=local (BD propia por servidor).")
+        link = ReplicationLink(ctx, args.peer, lambda: CORE.is_active)
+        link.sync_from_active() # Si el par está activo (failover previo), partir de su estado
+    if args.mirror:
+        from txmirror import TxMirror
+        MIRROR = TxMirror(ctx, args.peer, lambda: CORE.is_active)
     star = BinaryStarServer(ctx, args.role, args.peer, hostname)
     
     # El monitor de BinaryStar se encarga de activar/desactivar ServerCore
@@ -369,9 +903,9 @@ if __name__ == "__main__":
         while True:
             time.sleep(10) 
     except KeyboardInterrupt:
-        print("\nCerrando servidor Async (Ctrl+C)...", flush=True)
+        LOG.info("\nCerrando servidor Async (Ctrl+C)...")
     finally:
-        print("Terminando ServerCore y contexto ZMQ del servidor Async...", flush=True)
-        ServerCore.deactivate()
+        LOG.info("Terminando ServerCore y contexto ZMQ del servidor Async...")
+        CORE.deactivate()
         ctx.term()
-        print("Servidor Async terminado.", flush=True)
\ No newline at end of file
+        LOG.info("Servidor Async terminado.")
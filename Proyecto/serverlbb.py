@@ -4,25 +4,43 @@ server_lbb.py · Broker Load-Balancing (REQ ↔ ROUTER)
 ----------------------------------------------------
 • FRONTEND  ROUTER  tcp://*:5555
 • BACKEND   DEALER  inproc://backend
-• Proxy     zmq.proxy(front, back)
+• Proxy     admission.proxy(front, back): HWMs, tope de TX abiertas y RES BUSY
 • WORKERS   DEALER  conectados a backend
+• --pool MIN:MAX: pump + cola + workers adaptables (dispatch)
+• --fair [ID=PESO,...]: cola del pool con un carril por facultad (deficit round-robin)
+• --alloc-window MS: SOL agrupadas en micro-lotes que maximizan programas completos (allocator)
+• --procs N: N procesos parser en ipc:// + un dueño de la asignación (procpool)
+• Mensajes JSON o binario compacto (wire); se responde en el formato del cliente
 • Binary-Star PRIMARY/BACKUP (PUB/SUB 7000)
+• --log-level: log asíncrono por niveles (applog); el flujo de cada TX es debug
+• --replication: BD local por servidor + envío de cambios al standby (7001/7002)
+• --mirror: TX abiertas (PROP sin ACK) copiadas al standby, que las adopta al promoverse (txmirror, 7003)
 
 Flujo SOL → PROP → ACK → RES, emojis, métricas y registro en BD.
 Salida en consola optimizada.
 """
-import argparse, json, threading, time
+import argparse, threading, time
 from typing import Dict, Any
 from socket import gethostname
 
 import zmq
+import admission, allocator, applog, dispatch, procpool, wire
+from applog import LOG, install_dump_signal
 from datastore import (
-    seed_inventory, allocate_rooms, confirm_reservation, fail_reservation,
-    _conn, timed,
+    seed_inventory, allocate_rooms, allocate_rooms_batch, confirm_reservation, fail_reservation,
+    register_server, timed, free_counts, enable_memory_inventory, disable_memory_inventory,
+    enable_group_commit, STORAGE_MODE, start_lease_sweeper, stop_lease_sweeper, LEASE_S,
 )
 
 # ─────────── Config ──────────────────────────────────────────────
 WORKERS, HB_INT, HB_LIVE = 5, 1.0, 3
+INVENTORY_MODE = "sql"  # "sql" o "memory" (inventario en memoria + write-behind)
+PROCS = 0               # >0: procesos parser + un único dueño de la asignación (procpool)
+POOL_BOUNDS = None      # (min, max): pool de workers adaptable según la espera en cola (dispatch)
+FAIR_WEIGHTS = None     # dict faculty_id → peso: reparto justo por facultad (dispatch.FairQueue)
+ALLOCATOR: allocator.BatchAllocator = None  # --alloc-window: reserva por micro-lotes
+MIRROR = None           # --mirror: txmirror.TxMirror (copia de las TX abiertas en el par)
+WIRE = wire.Negotiator()  # responde a cada facultad en su formato (JSON o binario)
 ICN_INIT = "\n RECURSOS INICIALES:"
 ICN_PROP_CALC = "\n CALCULANDO PROPUESTA:"
 ICN_PROP_SENT = "\n📩 PROPUESTA ENVIADA A FACULTAD:"
@@ -38,30 +56,20 @@ ICN_WARNING = "\n⚠️ WARNING:"
 # ICN_DEBUG = "\n🐞 DEBUG:" # Comentado para salida más limpia
 # --- Fin Iconos ---
 
-now = lambda: int(time.time())
-
 def _register_server(role: str):
-    host = gethostname()
-    _conn().execute(
-        "INSERT OR REPLACE INTO server(host,role,last_hb) VALUES(?,?,?)",
-        (host, role, now())
-    )
-    _conn().commit()
+    register_server(gethostname(), role)
 
 seed_inventory()
-free_counts_result = _conn().execute("SELECT type,COUNT(*) FROM room WHERE status='FREE' GROUP BY type").fetchall()
-free = {row[0]: row[1] for row in free_counts_result}
-print(ICN_INIT,
-      f"\n| Salones: {free.get('CLASS',0)}"
-      f"\n| Laboratorios: {free.get('LAB',0)}\n" + "─"*30, flush=True)
+cls_init, lab_init = free_counts()
+LOG.info(ICN_INIT +
+         f" \n| Salones: {cls_init}"
+         f"\n| Laboratorios: {lab_init}\n" + "─"*30)
 
 pending: Dict[str, Dict[str,Any]] = {}
 lock = threading.Lock()
 
 def free_counts_fn(): 
-    d_fc_result = _conn().execute("SELECT type,COUNT(*) FROM room WHERE status='FREE' GROUP BY type").fetchall()
-    d = {row[0]: row[1] for row in d_fc_result}
-    return d.get("CLASS",0), d.get("LAB",0)
+    return free_counts()
 
 class BinaryStar:
     def __init__(self, ctx: zmq.Context, role: str, peer: str):
@@ -69,13 +77,13 @@ class BinaryStar:
         self.role = role.upper(); self.peer = peer
         self.pub = self.ctx.socket(zmq.PUB); self.sub = self.ctx.socket(zmq.SUB)
         self.sub.setsockopt_string(zmq.SUBSCRIBE,"HB")
-        print(f"{ICN_HB_EVENT} Servidor {self.role} PUB en tcp://*:7000, SUB a tcp://{peer}:7000", flush=True)
+        LOG.info(f"{ICN_HB_EVENT} Servidor {self.role} PUB en tcp://*:7000, SUB a tcp://{peer}:7000")
         self.pub.bind("tcp://*:7000")
         self.sub.connect(f"tcp://{peer}:7000")
         self.last_hb_peer_received = time.time() 
         self.active = False
         if self.role == "PRIMARY":
-            print(f"{ICN_HB_EVENT} {self.role} intentará activarse.", flush=True)
+            LOG.info(f"{ICN_HB_EVENT} {self.role} intentará activarse.")
         self.poller = zmq.Poller()
         self.poller.register(self.sub,zmq.POLLIN)
         # print(f"{ICN_HB_EVENT} Servidor {self.role} iniciando monitor HB. Peer: {self.peer}", flush=True)
@@ -98,18 +106,18 @@ class BinaryStar:
                 if not self.active: 
                     Broker.activate(self.ctx) 
                     self.active = True
-                    print(f"{ICN_HB_EVENT} {self.role} ahora ACTIVO.", flush=True)
+                    LOG.info(f"{ICN_HB_EVENT} {self.role} ahora ACTIVO.")
             elif self.role == "BACKUP":
                 if peer_is_alive: 
                     if self.active: 
                         Broker.deactivate() 
                         self.active = False
-                        print(f"{ICN_HB_EVENT} {self.role} ahora PASIVO (Primario {self.peer} detectado).", flush=True)
+                        LOG.info(f"{ICN_HB_EVENT} {self.role} ahora PASIVO (Primario {self.peer} detectado).")
                 else: 
                     if not self.active: 
                         Broker.activate(self.ctx) 
                         self.active = True
-                        print(f"{ICN_HB_EVENT} {self.role} ahora ACTIVO (Failover, Primario {self.peer} caído).", flush=True)
+                        LOG.info(f"{ICN_HB_EVENT} {self.role} ahora ACTIVO (Failover, Primario {self.peer} caído).")
             
             if self.active != previous_active_state: 
                  _register_server("PRIMARY" if self.active else "BACKUP")
@@ -118,141 +126,239 @@ class BinaryStar:
 class Broker:
     started=False
     proxy_thread = None; worker_threads = []; front_socket: zmq.Socket = None; back_socket: zmq.Socket = None
+    owner: procpool.AllocationOwner = None
+    pump: dispatch.FrontendPump = None; pool: dispatch.WorkerPool = None
+    admission_ctl: admission.Admission = None
     
     @staticmethod
     def activate(ctx: zmq.Context): 
         if Broker.started: return
-        print(f"{ICN_INFO} Activando Broker...", flush=True)
-        Broker.front_socket=ctx.socket(zmq.ROUTER); Broker.front_socket.bind("tcp://*:5555")
-        Broker.back_socket =ctx.socket(zmq.DEALER); Broker.back_socket.bind("inproc://backend")
-        Broker.proxy_thread = threading.Thread(target=lambda: zmq.proxy(Broker.front_socket,Broker.back_socket),daemon=True)
-        Broker.proxy_thread.start()
+        LOG.info(f"{ICN_INFO} Activando Broker...")
+        if INVENTORY_MODE == "memory":
+            enable_memory_inventory()
+            LOG.info(f"{ICN_INFO} Inventario en memoria cargado (write-behind a SQLite).")
+        start_lease_sweeper()  # sin ACK nunca, la reserva se libera al vencer su lease
+        if MIRROR:  # TX que el par dejó abiertas: las completa el ACK que reenvía la facultad
+            for tx, ident, res_id, proposal, fac_nombre, _ in MIRROR.adopt():
+                with lock: pending[tx] = {"ident": ident, "proposal": proposal, "sol": None, "res_id": res_id}
+                MIRROR.opened(tx, ident, res_id, proposal, fac_nombre, LEASE_S)
+        Broker.front_socket=ctx.socket(zmq.ROUTER); admission.set_hwm(Broker.front_socket, admission.FRONTEND_HWM)
+        Broker.front_socket.bind("tcp://*:5555")
+        Broker.back_socket =ctx.socket(zmq.DEALER); admission.set_hwm(Broker.back_socket, admission.BACKEND_HWM)
+        Broker.back_socket.bind(procpool.WORKERS_EP if PROCS else "inproc://backend")
+        if POOL_BOUNDS and not PROCS:  # pump → cola → workers adaptables (sólo responden por el backend)
+            fair = None if FAIR_WEIGHTS is None else dispatch.FairQueue(dispatch.faculty_classifier(WIRE), FAIR_WEIGHTS)
+            Broker.pool = dispatch.WorkerPool(ctx, "inproc://backend", lambda sock, wid, batch: [handle_parts(sock, wid, p) for p in batch],
+                                              *POOL_BOUNDS, src="ServidorLBB", work=fair)
+            Broker.admission_ctl = admission.Admission(lambda: len(pending) + Broker.pool.work.qsize(), WIRE, "ServidorLBB")
+            Broker.pump = dispatch.FrontendPump(Broker.front_socket, Broker.back_socket, Broker.pool.work,
+                                                admission=Broker.admission_ctl)
+        else:
+            Broker.admission_ctl = admission.Admission(lambda: len(pending), WIRE, "ServidorLBB")
+            Broker.proxy_thread = threading.Thread(target=admission.proxy,
+                                                   args=(Broker.front_socket, Broker.back_socket, Broker.admission_ctl),daemon=True)
+            Broker.proxy_thread.start()
         Broker.worker_threads = []
-        for i in range(WORKERS):
+        if PROCS: Broker.owner = procpool.AllocationOwner(ctx, lambda ident, msg: process(ident, msg, "Owner"))
+        for i in range(0 if PROCS or Broker.pool else WORKERS):
             thread = threading.Thread(target=worker,args=(ctx, i),daemon=True) 
             Broker.worker_threads.append(thread); thread.start()
         Broker.started=True
-        print(f"\n{ICN_INFO} SERVIDOR activo en TCP *:5555 (Workers: {WORKERS})", flush=True)
+        desc = f"Procesos parser: {PROCS}" if PROCS else f"Workers: {WORKERS}"
+        if Broker.pool: desc = f"Workers adaptables: {Broker.pool.min_workers}-{Broker.pool.max_workers}"
+        if Broker.pool and FAIR_WEIGHTS is not None: desc += ", reparto justo por facultad"
+        LOG.info(f"\n{ICN_INFO} SERVIDOR activo en TCP *:5555 ({desc})")
 
     @staticmethod
     def deactivate(): 
         if not Broker.started: return
-        print(f"{ICN_INFO} Broker.deactivate() llamado.", flush=True)
+        LOG.info(f"{ICN_INFO} Broker.deactivate() llamado.")
         Broker.started = False 
+        if Broker.owner: Broker.owner.close(); Broker.owner = None
+        if Broker.pump: Broker.pump.stop(); Broker.pump = None  # cierra frontend y backend
+        if Broker.pool: Broker.pool.stop(); Broker.pool = None
+        stop_lease_sweeper()
+        disable_memory_inventory()
+        if MIRROR:  # las TX abiertas las adoptó el par
+            MIRROR.hand_off()
+            with lock: pending.clear()
         # Detener hilos y sockets aquí de forma más robusta sería ideal
-        pass
 
 def worker(ctx: zmq.Context, worker_id: int): 
-    sock=ctx.socket(zmq.DEALER)
+    sock=ctx.socket(zmq.DEALER); sock.setsockopt(zmq.RCVHWM, admission.BACKEND_HWM)
     sock.connect("inproc://backend")
     # print(f"{ICN_INFO} Worker-{worker_id}: Conectado a inproc://backend", flush=True)
 
     while True:
-        ident = None; tx = "N/A"  
-        try:
-            parts = sock.recv_multipart()
-            if len(parts) < 2: 
-                print(f"{ICN_ERROR} Worker-{worker_id}: Mensaje < 2 partes: {repr(parts)}", flush=True)
-                continue
+        handle_parts(sock, worker_id, sock.recv_multipart())
 
-            ident = parts[0]; payload_bytes = parts[-1] 
-            
-            if not (len(parts) == 3 and parts[1] == b'' or len(parts) == 2):
-                print(f"{ICN_WARNING} Worker-{worker_id}: Framing inesperado: {len(parts)} partes. Parts: {repr(parts)}. Usando parts[-1].", flush=True)
+def handle_parts(sock: zmq.Socket, worker_id: int, parts: list):
+    """Un mensaje del backend: [identidad, b"", payload]. Responde por `sock`."""
+    ident = None; tx = "N/A"  
+    try:
+        if len(parts) < 2: 
+            LOG.error(f"{ICN_ERROR} Worker-{worker_id}: Mensaje < 2 partes: {repr(parts)}", key="framing")
+            return
 
-            if not payload_bytes: 
-                print(f"{ICN_ERROR} Worker-{worker_id}: Payload (parts[-1]) vacío. Parts: {repr(parts)}", flush=True)
-                continue
+        ident = parts[0]; payload_bytes = parts[-1] 
+        
+        if not (len(parts) == 3 and parts[1] == b'' or len(parts) == 2):
+            LOG.warning(f"{ICN_WARNING} Worker-{worker_id}: Framing inesperado: {len(parts)} partes. Parts: {repr(parts)}. Usando parts[-1].", key="framing")
+
+        if not payload_bytes: 
+            LOG.error(f"{ICN_ERROR} Worker-{worker_id}: Payload (parts[-1]) vacío. Parts: {repr(parts)}", key="payload")
+            return
 
+        try:
+            if not wire.is_binary(payload_bytes) and not payload_bytes.strip(): 
+                LOG.error(f"{ICN_ERROR} Worker-{worker_id}: Payload decodificado vacío. Bytes: {repr(payload_bytes)}. Parts: {repr(parts)}", key="decode")
+                return
+            msg = WIRE.decode(ident, payload_bytes)
+        except (ValueError, UnicodeDecodeError) as e_decode:
+            LOG.error(f"{ICN_ERROR} Worker-{worker_id}: Error decodificando (wire). Payload: {repr(payload_bytes)}. Parts: {repr(parts)}. Error: {repr(e_decode)}", key="decode")
+            return 
+
+        tx = msg.get("transaction_id", "N/A_TX"); fac_nombre = msg.get("facultad", "Fac_Desconocida")
+        for out in process(ident, msg, f"W-{worker_id}"):
             try:
-                msg_str = payload_bytes.decode()
-                if not msg_str.strip(): 
-                    print(f"{ICN_ERROR} Worker-{worker_id}: Payload decodificado vacío. Bytes: {repr(payload_bytes)}. Parts: {repr(parts)}", flush=True)
-                    continue
-                msg = json.loads(msg_str)
-            except (json.JSONDecodeError, UnicodeDecodeError) as e_decode:
-                print(f"{ICN_ERROR} Worker-{worker_id}: Error JSON/Unicode. Payload: {repr(payload_bytes)}. Parts: {repr(parts)}. Error: {repr(e_decode)}", flush=True)
-                continue 
+                sock.send_multipart([ident,b"", WIRE.encode(ident, out)])
+            except Exception as e_send:
+                LOG.error(f"{ICN_ERROR} W-{worker_id}: EXCP enviando {out['tipo']} (TX:{tx}): {repr(e_send)}")
+                if out["tipo"] == "PROP":
+                    with lock: entry = pending.pop(tx, None)
+                    if entry: fail_reservation(entry["res_id"])
+                    if MIRROR: MIRROR.closed(tx, {"tipo":"RES","status":"CANCELED","transaction_id":tx,"reason":"PROP no enviada"})
+                continue
+            if out["tipo"] == "PROP":
+                LOG.debug(ICN_PROP_SENT + f" (W-{worker_id}, TX:{tx}, Fac:{fac_nombre})")
+            else:
+                LOG.debug(ICN_RES_SENT + f" {out.get('status')} (W-{worker_id}, TX:{tx}, Fac:{fac_nombre})")
+    except Exception as e_loop:
+        LOG.error(f"{ICN_ERROR} W-{worker_id} (TX:{tx}): Excepción en bucle: {repr(e_loop)}")
+        LOG.error(f"{ICN_ERROR} W-{worker_id}: 'parts' antes de excepción: {repr(parts)}")
+        time.sleep(1)
 
-            tx = msg.get("transaction_id", "N/A_TX"); tipo = msg.get("tipo", "N/A_TIPO"); fac_nombre = msg.get("facultad", "Fac_Desconocida")
+def process(ident: bytes, msg: dict, who: str) -> list:
+    """
+    SOL → [PROP] o [RES DENIED]; ACK → [RES]. Lo usan los workers y, con
+    --procs, el dueño de la asignación (procpool) en nombre de los parsers.
+    """
+    tx = msg.get("transaction_id", "N/A_TX"); tipo = msg.get("tipo", "N/A_TIPO"); fac_nombre = msg.get("facultad", "Fac_Desconocida")
+    tag = who.replace("-", "").lower()   # "W-3" → "w3": mismos kinds de métrica que antes
 
-            if tipo=="SOL":
-                sal, lab = msg.get("salones",0), msg.get("laboratorios",0)
-                fid, pid = msg.get("faculty_id",0), msg.get("program_id",0)
-                
-                print(ICN_PROP_CALC + f" (W-{worker_id}, TX:{tx}, Fac:{fac_nombre})", flush=True)
-                with timed(f"sol->prop_w{worker_id}", fac_nombre, "SERVER"): 
-                    cls_free,lab_free = free_counts_fn()
-                    sal_p, lab_p = min(sal,cls_free), min(lab,lab_free)
-                    mob = min(max(0,lab-lab_free),max(0,cls_free-sal_p))
-                    proposal = {"salones_propuestos":sal_p, "laboratorios_propuestos":lab_p, "aulas_moviles":mob}
+    if tipo=="SOL":
+        with lock: entry = pending.get(tx)
+        if entry:  # SOL reenviada (FailoverReq, con o sin --mirror): la TX ya tiene reserva, misma PROP
+            return [{"tipo":"PROP","transaction_id":tx,"data":entry["proposal"]}]
+        sal, lab = msg.get("salones",0), msg.get("laboratorios",0)
+        fid, pid = msg.get("faculty_id",0), msg.get("program_id",0)
 
-                try:
-                    res_id = allocate_rooms(sal_p,lab_p,faculty_id=fid,program_id=pid)
-                except ValueError as e_alloc:
-                    print(f"{ICN_ERROR} Worker-{worker_id}: DENIED (allocate_rooms) (TX:{tx}, Fac:{fac_nombre}) - {e_alloc}", flush=True)
-                    res = {"tipo":"RES","status":"DENIED","reason":str(e_alloc),"transaction_id":tx}
-                    try: sock.send_multipart([ident,b"",json.dumps(res).encode()])
-                    except Exception as e: print(f"{ICN_ERROR} W-{worker_id}: EXCP enviando DENIED RES (TX:{tx}): {repr(e)}", flush=True)
-                    print(ICN_RES_SENT + f" DENIED (W-{worker_id}, TX:{tx}, Fac:{fac_nombre})", flush=True)
-                    continue 
+        LOG.debug(ICN_PROP_CALC + f" ({who}, TX:{tx}, Fac:{fac_nombre})")
+        if ALLOCATOR is not None:  # espera el lote del optimizador
+            proposal, res_id, reason = ALLOCATOR.submit(sal, lab, fid, pid).result()
+            sal_p, lab_p, mob = proposal["salones_propuestos"], proposal["laboratorios_propuestos"], proposal["aulas_moviles"]
+        else:
+            with timed(f"sol->prop_{tag}", fac_nombre, "SERVER"):
+                cls_free,lab_free = free_counts_fn()
+                sal_p, lab_p = min(sal,cls_free), min(lab,lab_free)
+                mob = min(max(0,lab-lab_free),max(0,cls_free-sal_p))
+                proposal = {"salones_propuestos":sal_p, "laboratorios_propuestos":lab_p, "aulas_moviles":mob}
+            LOG.debug(f"| Salones disp.: {cls_free}, Labs disp.: {lab_free} ({who}, TX:{tx})")
+            try:
+                res_id, reason = allocate_rooms(sal_p,lab_p+mob,faculty_id=fid,program_id=pid), None  # móviles = labs adaptados
+            except ValueError as e_alloc:
+                res_id, reason = None, str(e_alloc)
+        if res_id is None:
+            LOG.error(f"{ICN_ERROR} {who}: DENIED (allocate_rooms) (TX:{tx}, Fac:{fac_nombre}) - {reason}", key="denied")
+            return [{"tipo":"RES","status":"DENIED","reason":reason,"transaction_id":tx}]
+
+        with lock: pending[tx]={"ident":ident,"proposal":proposal,"sol":msg,"res_id":res_id}
+        if MIRROR: MIRROR.opened(tx, ident, res_id, proposal, fac_nombre, LEASE_S)  # sin timeout de ACK: vale el lease
+        LOG.debug(ICN_RESV + f" ({who}, TX:{tx}, Fac:{fac_nombre})")
+        LOG.debug(f"| Salones: {sal_p+mob}, Labs: {lab_p}")
+        return [{"tipo":"PROP","transaction_id":tx,"data":proposal}]
 
-                with lock: pending[tx]={"ident":ident,"proposal":proposal,"sol":msg,"res_id":res_id}
-                prop_payload = {"tipo":"PROP","transaction_id":tx,"data":proposal}
-                try:
-                    sock.send_multipart([ident,b"", json.dumps(prop_payload).encode()])
-                    print(ICN_PROP_SENT + f" (W-{worker_id}, TX:{tx}, Fac:{fac_nombre})", flush=True) 
-                except Exception as e_send_prop:
-                    print(f"{ICN_ERROR} Worker-{worker_id}: EXCEPCIÓN al enviar PROP (TX:{tx}). Error: {repr(e_send_prop)}", flush=True)
-                    with lock: pending.pop(tx, None); fail_reservation(res_id) 
-                    continue 
-                
-                print(f"| Salones disp.: {cls_free}, Labs disp.: {lab_free} (W-{worker_id}, TX:{tx})", flush=True)
-                print(ICN_RESV + f" (W-{worker_id}, TX:{tx}, Fac:{fac_nombre})", flush=True)
-                print(f"| Salones: {sal_p+mob}, Labs: {lab_p}", flush=True)
+    if tipo=="ACK":
+        LOG.debug(ICN_ACK_RECV + f" ({who}, TX:{tx}, Fac:{fac_nombre})")
+        with lock: entry=pending.pop(tx,None)
+        if not entry:
+            replayed = MIRROR.replay(tx) if MIRROR else None  # el par la cerró antes de caer: misma RES
+            if replayed is None:
+                LOG.warning(f"{ICN_WARNING} {who}: ACK TX:{tx} desconocida (Fac:{fac_nombre}).", key="tx_desconocida")
+            return [replayed] if replayed else []
+        proposal,res_id = entry["proposal"],entry["res_id"]
 
-            elif tipo=="ACK":
-                print(ICN_ACK_RECV + f" (W-{worker_id}, TX:{tx}, Fac:{fac_nombre})", flush=True)
-                with lock: entry=pending.pop(tx,None)
-                if not entry:
-                    print(f"{ICN_WARNING} W-{worker_id}: ACK TX:{tx} desconocida (Fac:{fac_nombre}).", flush=True)
-                    continue
-                proposal,res_id = entry["proposal"],entry["res_id"]
-                
-                with timed(f"prop->res_w{worker_id}", fac_nombre, "SERVER"):
-                    if msg.get("confirm")=="ACCEPT":
-                        confirm_reservation(res_id)
-                        res={"tipo":"RES","status":"ACCEPTED", **proposal,"transaction_id":tx}
-                        print(ICN_CONF + f" {fac_nombre} (W-{worker_id}, TX:{tx})", flush=True)
-                    else: 
-                        fail_reservation(res_id)
-                        res={"tipo":"RES","status":"CANCELED", "transaction_id":tx, "reason":msg.get("reason","Rechazado por facultad")}
-                        print(ICN_CANC + f" {fac_nombre} (W-{worker_id}, TX:{tx})", flush=True)
-                try: sock.send_multipart([ident,b"",json.dumps(res).encode()])
-                except Exception as e: print(f"{ICN_ERROR} W-{worker_id}: EXCP enviando RES final (TX:{tx}): {repr(e)}", flush=True)
-                print(ICN_RES_SENT + f" {res.get('status')} (W-{worker_id}, TX:{tx}, Fac:{fac_nombre})", flush=True)
+        with timed(f"prop->res_{tag}", fac_nombre, "SERVER"):
+            if msg.get("confirm")=="ACCEPT" and not confirm_reservation(res_id):
+                res={"tipo":"RES","status":"CANCELED", "transaction_id":tx, "reason":"Reserva expirada"}
+                LOG.debug(ICN_CANC + f" {fac_nombre} ({who}, TX:{tx}) - lease vencido")
+            elif msg.get("confirm")=="ACCEPT":
+                res={"tipo":"RES","status":"ACCEPTED", **proposal,"transaction_id":tx}
+                LOG.debug(ICN_CONF + f" {fac_nombre} ({who}, TX:{tx})")
             else:
-                print(f"{ICN_WARNING} W-{worker_id}: Tipo msg desconocido '{tipo}' (TX:{tx}, Fac:{fac_nombre}). Msg: {msg}", flush=True)
-        except Exception as e_loop:
-            print(f"{ICN_ERROR} W-{worker_id} (TX:{tx}): Excepción en bucle: {repr(e_loop)}", flush=True)
-            if 'parts' in locals(): print(f"{ICN_ERROR} W-{worker_id}: 'parts' antes de excepción: {repr(parts)}", flush=True)
-            time.sleep(1)
+                fail_reservation(res_id)
+                res={"tipo":"RES","status":"CANCELED", "transaction_id":tx, "reason":msg.get("reason","Rechazado por facultad")}
+                LOG.debug(ICN_CANC + f" {fac_nombre} ({who}, TX:{tx})")
+        if MIRROR: MIRROR.closed(tx, res)
+        return [res]
+
+    LOG.warning(f"{ICN_WARNING} {who}: Tipo msg desconocido '{tipo}' (TX:{tx}, Fac:{fac_nombre}). Msg: {msg}", key="tipo_desconocido")
+    return []
 
 if __name__=="__main__":
     ap=argparse.ArgumentParser()
     ap.add_argument("--role",choices=["PRIMARY","BACKUP"],required=True)
     ap.add_argument("--peer",required=True)
+    ap.add_argument("--inventory",choices=["sql","memory"],default=INVENTORY_MODE)
+    ap.add_argument("--group-commit",action="store_true")
+    ap.add_argument("--replication",action="store_true")  # BD local + envío de cambios al standby
+    ap.add_argument("--mirror",action="store_true")  # TX abiertas copiadas al standby (txmirror)
+    ap.add_argument("--procs",type=int,default=PROCS)  # N procesos parser + dueño de la asignación por ipc://
+    ap.add_argument("--pool",metavar="MIN:MAX")  # workers adaptables según la espera en cola
+    ap.add_argument("--log-level",choices=["debug","info","warning","error"],default=applog.DEFAULT_LEVEL)  # debug: flujo de cada TX
+    ap.add_argument("--max-inflight",type=int,default=admission.MAX_INFLIGHT)  # tope de TX abiertas → RES BUSY (0 = sin tope)
+    ap.add_argument("--frontend-hwm",type=int,default=admission.FRONTEND_HWM)
+    ap.add_argument("--backend-hwm",type=int,default=admission.BACKEND_HWM)  # cola por worker/parser; llena → RES BUSY
+    ap.add_argument("--alloc-window",type=float,default=allocator.WINDOW_MS)  # ms: SOL en micro-lotes (0 = no)
+    ap.add_argument("--fair",nargs="?",const="",metavar="ID=PESO,...")  # reparto justo por facultad en la cola del pool
     args=ap.parse_args()
+    LOG.set_level(args.log_level); install_dump_signal()  # SIGUSR1 → vuelca el anillo de log
+    admission.MAX_INFLIGHT = max(0, args.max_inflight)
+    admission.FRONTEND_HWM = max(0, args.frontend_hwm); admission.BACKEND_HWM = max(0, args.backend_hwm)
+    INVENTORY_MODE = args.inventory
+    PROCS = max(0, args.procs)
+    if args.pool:
+        try: POOL_BOUNDS = dispatch.parse_bounds(args.pool)
+        except ValueError as e: ap.error(f"--pool: {e}")
+    if args.fair is not None:
+        try: FAIR_WEIGHTS = dispatch.parse_weights(args.fair)
+        except ValueError as e: ap.error(f"--fair: {e}")
+        if PROCS:
+            LOG.warning(f"{ICN_WARNING} --fair no aplica con --procs; se ignora."); FAIR_WEIGHTS = None
+        elif not POOL_BOUNDS: POOL_BOUNDS = (WORKERS, WORKERS)  # la cola del pool es la que se reparte
+    if PROCS: procpool.start_parsers(PROCS)  # fork antes de crear el contexto ZMQ
+    if args.group_commit: enable_group_commit()
+    if args.alloc_window > 0:
+        if PROCS: LOG.warning(f"{ICN_WARNING} --alloc-window no aplica con --procs; se ignora.")
+        else: ALLOCATOR = allocator.BatchAllocator(free_counts_fn, allocate_rooms_batch, args.alloc_window)
     _register_server(args.role.upper())
-    print(f"\nServidor LBB {args.role.upper()} inicializado; peer: {args.peer}. Esperando eventos HB...", flush=True)
+    LOG.info(f"\nServidor LBB {args.role.upper()} inicializado; peer: {args.peer}. Esperando eventos HB...")
     ctx_main = zmq.Context()
+    if args.replication:
+        from replication import ReplicationLink
+        if STORAGE_MODE != "local":
+            LOG.warning(f"{ICN_WARNING} --replication espera CLASSROOM_DB_MODE=local (BD propia por servidor).")
+        ReplicationLink(ctx_main, args.peer, lambda: Broker.started).sync_from_active()
+    if args.mirror:
+        from txmirror import TxMirror
+        MIRROR = TxMirror(ctx_main, args.peer, lambda: Broker.started)
     BinaryStar(ctx_main,args.role,args.peer)
     try:
         while True: time.sleep(10)
     except KeyboardInterrupt:
-        print("\nCerrando servidor LBB (Ctrl+C)...", flush=True)
+        LOG.info("\nCerrando servidor LBB (Ctrl+C)...")
     finally:
-        print("Terminando contexto ZMQ del servidor LBB...", flush=True)
+        LOG.info("Terminando contexto ZMQ del servidor LBB...")
         if Broker.started: Broker.deactivate()
         ctx_main.term() 
-        print("Servidor LBB terminado.", flush=True)
\ No newline at end of file
+        LOG.info("Servidor LBB terminado.")
\ No newline at end of file
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+bench_alloc.py · Asignación greedy por orden de llegada vs. micro-lotes (allocator.py)
+--------------------------------------------------------------------------------------
+• Offline: `--sols` SOL con tamaños aleatorios (semilla fija; salones en
+  [1, --max-salones], labs en [0, --max-labs]) contra el inventario inicial
+  (INITIAL_CLASSROOMS / INITIAL_LABS). greedy atiende una a una; plan()
+  resuelve lotes de `--batch` SOL. Informa SOL completas, parciales y
+  vacías, aulas usadas y µs por SOL del cálculo.
+• --e2e: arranca server.py (BD local temporal) sin y con `--alloc-window`,
+  envía las mismas SOL con `--window` en vuelo y acepta cada PROP. Clasifica
+  cada PROP contra lo pedido y mide tx/s. Los modos se alternan durante
+  `--rounds` rondas (mediana).
+• Imprime JSON.
+
+Uso:
+    python3 test/bench_alloc.py --sols 60 --batch 8
+    python3 test/bench_alloc.py --e2e --sols 60 --window 16 --alloc-window 5 --server-args "--pool 8:8"
+"""
+import argparse, json, os, pathlib, random, shlex, statistics, subprocess, sys, tempfile, time, uuid
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+import allocator, wire                       # noqa: E402
+from bench_wire import HERE, SAMPLES         # noqa: E402
+
+INVENTORY = (380, 60)          # datastore.INITIAL_CLASSROOMS / INITIAL_LABS
+
+
+def workload(n: int, max_salones: int, max_labs: int, seed: int) -> list[tuple[int, int]]:
+    rng = random.Random(seed)
+    return [(rng.randint(1, max_salones), rng.randint(0, max_labs)) for _ in range(n)]
+
+
+def _classify(requests: list, proposals: list) -> dict:
+    out = {"full": 0, "partial": 0, "empty": 0, "classrooms_used": 0}
+    for (salones, labs), (s_prop, l_prop, mob) in zip(requests, proposals):
+        if s_prop == salones and l_prop + mob == labs:
+            out["full"] += 1
+        elif s_prop + l_prop + mob:
+            out["partial"] += 1
+        else:
+            out["empty"] += 1
+        out["classrooms_used"] += s_prop + mob
+    return out
+
+
+def offline(requests: list, batch: int, iters: int = 200) -> dict:
+    out = {}
+    for name, solve, size in (("greedy", allocator.greedy, 1), ("plan", allocator.plan, batch)):
+        def run():
+            cls_free, lab_free = INVENTORY
+            proposals = []
+            for i in range(0, len(requests), size):
+                chunk = solve(requests[i:i + size], cls_free, lab_free)
+                cls_free -= sum(s + m for s, _, m in chunk)
+                lab_free -= sum(l for _, l, _ in chunk)
+                proposals.extend(chunk)
+            return proposals
+        t0 = time.perf_counter_ns()
+        for _ in range(iters):
+            proposals = run()
+        out[name] = {**_classify(requests, proposals),
+                     "us_per_sol": round((time.perf_counter_ns() - t0) / iters / len(requests) / 1000, 2)}
+    return out
+
+
+# ──────────────────────────────────────────────────────────
+# Extremo a extremo contra server.py
+def _drive(requests: list, window: int, port: int) -> dict:
+    import zmq
+    sock = zmq.Context.instance().socket(zmq.DEALER)
+    sock.setsockopt(zmq.IDENTITY, f"bench-alloc-{uuid.uuid4().hex[:4]}".encode())
+    sock.connect(f"tcp://127.0.0.1:{port}")
+    time.sleep(0.3)
+    asked, proposals, sent, done = {}, {}, 0, 0
+    t0 = time.perf_counter()
+
+    def send_sol():
+        nonlocal sent
+        tx = uuid.uuid4().hex[:8]
+        salones, labs = requests[sent]
+        asked[tx] = (salones, labs)
+        sol = {**SAMPLES["SOL"], "transaction_id": tx, "program_id": sent + 1, "salones": salones, "laboratorios": labs}
+        sock.send_multipart([b"", wire.encode(sol, "json")])
+        sent += 1
+
+    while sent < min(window, len(requests)):
+        send_sol()
+    while done < len(requests):
+        if not sock.poll(10000):
+            break
+        msg = wire.decode(sock.recv_multipart()[-1])
+        tx = msg["transaction_id"]
+        if msg["tipo"] == "PROP":
+            data = msg["data"]
+            proposals[tx] = (data["salones_propuestos"], data["laboratorios_propuestos"], data["aulas_moviles"])
+            ack = {"tipo": "ACK", "transaction_id": tx, "confirm": "ACCEPT", "facultad": "Bench"}
+            sock.send_multipart([b"", wire.encode(ack, "json")])
+            continue
+        proposals.setdefault(tx, (0, 0, 0))                 # RES DENIED sin PROP
+        done += 1
+        if sent < len(requests):
+            send_sol()
+    elapsed = time.perf_counter() - t0
+    sock.close(linger=0)
+    txs = list(proposals)
+    return {**_classify([asked[tx] for tx in txs], [proposals[tx] for tx in txs]),
+            "done": done, "tx_per_s": round(done / elapsed, 1)}
+
+
+def _run_server(requests: list, window: int, server_args: str, startup: float) -> dict:
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix="bench_alloc_"))
+    env = {**os.environ, "CLASSROOM_DB_MODE": "local", "CLASSROOM_DB_PATH": str(tmp / "classroom.db")}
+    server = subprocess.Popen([sys.executable, str(HERE / "server.py"), "--role", "PRIMARY", "--peer", "127.0.0.1",
+                               *shlex.split(server_args)], cwd=HERE, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(startup)
+        return _drive(requests, window, 5555)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def e2e(requests: list, window: int, alloc_window: float, server_args: str, startup: float, rounds: int) -> dict:
+    modes = {"greedy": server_args, "plan": f"{server_args} --alloc-window {alloc_window}"}
+    runs = {mode: [] for mode in modes}
+    for _ in range(rounds):
+        for mode, args in modes.items():
+            runs[mode].append(_run_server(requests, window, args, startup))
+    out = {"window": window, "alloc_window_ms": alloc_window, "rounds": rounds, "server_args": server_args}
+    for mode, results in runs.items():
+        out[mode] = {key: round(statistics.median(r[key] for r in results), 1) for key in results[0]}
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sols", type=int, default=60)
+    ap.add_argument("--max-salones", type=int, default=16)
+    ap.add_argument("--max-labs", type=int, default=6)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--batch", type=int, default=8)
+    ap.add_argument("--e2e", action="store_true")
+    ap.add_argument("--window", type=int, default=16)
+    ap.add_argument("--alloc-window", type=float, default=5.0)
+    ap.add_argument("--server-args", default="")
+    ap.add_argument("--startup", type=float, default=3.0)
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+    requests = workload(args.sols, args.max_salones, args.max_labs, args.seed)
+    demand = (sum(s for s, _ in requests), sum(l for _, l in requests))
+    results = {"sols": args.sols, "demand": demand, "inventory": INVENTORY,
+               "offline": {"batch": args.batch, **offline(requests, args.batch)}}
+    if args.e2e:
+        results["e2e"] = e2e(requests, args.window, args.alloc_window, args.server_args, args.startup, args.rounds)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
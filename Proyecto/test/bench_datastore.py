@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+bench_datastore.py · Micro-benchmarks de datastore.py (sin ZMQ)
+--------------------------------------------------------------
+• Para cada tamaño de inventario crea una BD temporal y mide seed_inventory.
+• Para cada (tamaño, hilos, mezcla) corre `--seconds` s de operaciones
+  elegidas al azar según la mezcla:
+      free    → free_counts()
+      alloc   → allocate_rooms(2, 1, …)
+      confirm → confirm_reservation() de una reserva PENDING del hilo
+      fail    → fail_reservation() de una reserva del hilo (devuelve salas)
+      metric  → record_event_metric()
+  confirm / fail sin reservas disponibles se convierten en alloc.
+• Imprime JSON: ops/seg y latencias p50/p99 (ms) totales y por operación.
+
+Mezclas: "read", "write", "mixed" o pesos propios, p. ej. "free=70,alloc=30"
+(varias mezclas propias se separan con ";").
+
+Uso:
+    python3 test/bench_datastore.py --sizes 440,100000,1000000 --threads 1,4,8 \\
+        --mixes read,write,mixed --seconds 3 --mode local
+"""
+import argparse, json, pathlib, random, sys, tempfile, threading, time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import datastore  # noqa: E402
+
+MIXES = {
+    "read":  {"free": 100},
+    "write": {"alloc": 34, "confirm": 33, "fail": 33},
+    "mixed": {"free": 40, "alloc": 20, "confirm": 10, "fail": 20, "metric": 10},
+}
+LAB_RATIO = datastore.INITIAL_LABS / (datastore.INITIAL_CLASSROOMS + datastore.INITIAL_LABS)
+
+
+def parse_mix(spec: str) -> dict:
+    if spec in MIXES:
+        return MIXES[spec]
+    return {op: int(w) for op, w in (part.split("=") for part in spec.split(","))}
+
+
+def percentile(sorted_ns: list, q: float) -> float:
+    if not sorted_ns:
+        return None
+    return round(sorted_ns[min(len(sorted_ns) - 1, int(q * len(sorted_ns)))] / 1e6, 4)
+
+
+def setup(size: int, mode: str, backend: str) -> float:
+    """BD temporal nueva con `size` salas; devuelve segundos de seed_inventory."""
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix="bench_ds_"))
+    datastore.configure_backend("sqlite")
+    datastore.configure_storage(mode, tmp / "classroom.db")
+    if backend == "memory":
+        datastore.configure_backend("memory", tmp / "journal", fsync=False)
+    n_lab = round(size * LAB_RATIO)
+    t0 = time.perf_counter()
+    datastore.seed_inventory(size - n_lab, n_lab)
+    seed_s = time.perf_counter() - t0
+    datastore.ensure_faculty(1, "Bench", datastore.SEMESTER)
+    datastore.ensure_program(1, 1, "Bench", datastore.SEMESTER)
+    return seed_s
+
+
+def run(threads: int, mix: dict, seconds: float) -> dict:
+    ops, weights = list(mix), list(mix.values())
+    stop = threading.Event()
+    lat: dict[str, list] = {op: [] for op in ("free", "alloc", "confirm", "fail", "metric")}
+    denied = [0]
+    merge_lock = threading.Lock()
+
+    def worker(seed: int):
+        rnd = random.Random(seed)
+        local = {op: [] for op in lat}
+        pending, confirmed = [], []
+        n_denied = 0
+        while not stop.is_set():
+            op = rnd.choices(ops, weights)[0]
+            if (op == "confirm" and not pending) or (op == "fail" and not (pending or confirmed)):
+                op = "alloc"
+            t0 = time.perf_counter_ns()
+            if op == "free":
+                datastore.free_counts()
+            elif op == "alloc":
+                try:
+                    pending.append(datastore.allocate_rooms(2, 1, 1, 1))
+                except ValueError:
+                    n_denied += 1
+            elif op == "confirm":
+                res_id = pending.pop(0)
+                datastore.confirm_reservation(res_id)
+                confirmed.append(res_id)
+            elif op == "fail":
+                datastore.fail_reservation((confirmed or pending).pop(0))
+            elif op == "metric":
+                datastore.record_event_metric("bench_op_ms", 1.0, "bench", "datastore")
+            local[op].append(time.perf_counter_ns() - t0)
+        for res_id in pending + confirmed:          # devolver el inventario
+            datastore.fail_reservation(res_id)
+        with merge_lock:
+            for op, samples in local.items():
+                lat[op].extend(samples)
+            denied[0] += n_denied
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    per_op, everything = {}, []
+    for op, samples in lat.items():
+        if not samples:
+            continue
+        samples.sort()
+        everything.extend(samples)
+        per_op[op] = {"count": len(samples),
+                      "ops_per_s": round(len(samples) / elapsed, 1),
+                      "p50_ms": percentile(samples, 0.50),
+                      "p99_ms": percentile(samples, 0.99)}
+    everything.sort()
+    return {"seconds": round(elapsed, 3),
+            "ops_per_s": round(len(everything) / elapsed, 1),
+            "p50_ms": percentile(everything, 0.50),
+            "p99_ms": percentile(everything, 0.99),
+            "denied": denied[0],
+            "per_op": per_op}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="440,100000")
+    ap.add_argument("--threads", default="1,4")
+    ap.add_argument("--mixes", default="read,write,mixed")
+    ap.add_argument("--seconds", type=float, default=2.0)
+    ap.add_argument("--mode", choices=["nfs", "local"], default="local")
+    ap.add_argument("--backend", choices=["sqlite", "memory"], default="sqlite")
+    args = ap.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        seed_s = setup(size, args.mode, args.backend)
+        for threads in (int(t) for t in args.threads.split(",")):
+            for spec in args.mixes.split(";" if "=" in args.mixes else ","):
+                r = run(threads, parse_mix(spec), args.seconds)
+                results.append({"size": size, "threads": threads, "mix": spec,
+                                "mode": args.mode, "backend": args.backend,
+                                "seed_s": round(seed_s, 3), **r})
+        datastore.flush_metrics()
+    datastore.configure_backend("sqlite")
+    datastore.configure_storage("nfs")   # cierra las conexiones de la medición
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
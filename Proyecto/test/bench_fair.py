@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+bench_fair.py · Latencia de una facultad "educada" mientras otra inunda el servidor
+-----------------------------------------------------------------------------------
+• Arranca server.py (BD local temporal) en cada modo de --modes:
+      fifo → --pool W:W (cola FIFO del pool)
+      fair → --pool W:W --fair (un carril por facultad, deficit round-robin)
+• La facultad 1 (emulador de bench_wire.py, en otro proceso) mantiene
+  `--window` SOL en vuelo hasta completar `--flood`. Mientras tanto la
+  facultad 2 envía una SOL cada `--interval` s y espera su PROP. Ambas
+  rechazan las propuestas, así el inventario no se agota.
+• Informa la mediana, entre `--rounds` rondas, de p50/p99/máx de SOL→PROP
+  de la facultad 2 y de tx/s de la facultad 1.
+• Imprime JSON.
+
+Uso:
+    python3 test/bench_fair.py --flood 3000 --window 1000 --server-args "--inventory memory"
+"""
+import argparse, json, multiprocessing, os, pathlib, shlex, statistics, subprocess, sys, tempfile, threading, time, uuid
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+import wire                                  # noqa: E402
+from bench_wire import HERE, SAMPLES, drive  # noqa: E402
+
+MODES = {"fifo": "", "fair": "--fair"}
+
+
+def _pct(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def _polite(port: int, interval: float, stop: threading.Event) -> list:
+    """Facultad 2: una SOL a la vez (no espera la RES del ACK); devuelve las latencias SOL→PROP en ms."""
+    import zmq
+    sock = zmq.Context.instance().socket(zmq.DEALER)
+    sock.setsockopt(zmq.IDENTITY, f"polite-{uuid.uuid4().hex[:4]}".encode())
+    sock.connect(f"tcp://127.0.0.1:{port}")
+    time.sleep(0.3)
+    latencies, n = [], 0
+    while not stop.is_set():
+        n += 1
+        tx = uuid.uuid4().hex[:8]
+        sol = {**SAMPLES["SOL"], "transaction_id": tx, "faculty_id": 2, "program_id": n,
+               "salones": 1, "laboratorios": 0, "facultad": "Polite"}
+        t0 = time.perf_counter()
+        sock.send_multipart([b"", wire.encode(sol, "json")])
+        while sock.poll(10000):
+            msg = wire.decode(sock.recv_multipart()[-1])
+            if msg.get("transaction_id") != tx:
+                continue                                    # RES de una TX anterior
+            if msg["tipo"] == "PROP":
+                latencies.append((time.perf_counter() - t0) * 1000)
+                ack = {"tipo": "ACK", "transaction_id": tx, "confirm": "REJECT", "facultad": "Polite", "reason": "bench"}
+                sock.send_multipart([b"", wire.encode(ack, "json")])
+            break
+        stop.wait(interval)
+    sock.close(linger=0)
+    return latencies
+
+
+def _run_mode(mode: str, flood: int, window: int, interval: float, workers: int, server_args: str,
+              startup: float) -> dict:
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix="bench_fair_"))
+    env = {**os.environ, "CLASSROOM_DB_MODE": "local", "CLASSROOM_DB_PATH": str(tmp / "classroom.db")}
+    server = subprocess.Popen([sys.executable, str(HERE / "server.py"), "--role", "PRIMARY", "--peer", "127.0.0.1",
+                               "--pool", f"{workers}:{workers}", *shlex.split(MODES[mode]), *shlex.split(server_args)],
+                              cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(startup)
+        results = multiprocessing.Queue()
+        flooder = multiprocessing.Process(target=lambda: results.put(drive("json", flood, window, 5555)))
+        flooder.start()
+        stop, latencies = threading.Event(), []
+        polite = threading.Thread(target=lambda: latencies.extend(_polite(5555, interval, stop)))
+        polite.start()
+        res = results.get()
+        flooder.join()
+        stop.set()
+        polite.join()
+    finally:
+        server.terminate()
+        server.wait()
+    return {"flood_tx_per_s": res["tx_per_s"], "flood_done": res["done"], "polite_n": len(latencies),
+            "polite_p50_ms": round(_pct(latencies, 0.5), 1), "polite_p99_ms": round(_pct(latencies, 0.99), 1),
+            "polite_max_ms": round(max(latencies, default=0.0), 1)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--flood", type=int, default=3000)
+    ap.add_argument("--window", type=int, default=1000)
+    ap.add_argument("--interval", type=float, default=0.02, help="s entre SOL de la facultad 2")
+    ap.add_argument("--workers", type=int, default=5)
+    ap.add_argument("--modes", default="fifo,fair")
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--server-args", default="")
+    ap.add_argument("--startup", type=float, default=3.0)
+    args = ap.parse_args()
+    modes = args.modes.split(",")
+    runs = {mode: [] for mode in modes}
+    for _ in range(args.rounds):
+        for mode in modes:
+            runs[mode].append(_run_mode(mode, args.flood, args.window, args.interval, args.workers,
+                                        args.server_args, args.startup))
+    out = {"flood": args.flood, "window": args.window, "interval_s": args.interval, "workers": args.workers,
+           "rounds": args.rounds, "server_args": args.server_args}
+    for mode, results in runs.items():
+        out[mode] = {key: round(statistics.median(r[key] for r in results), 1) for key in results[0]}
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
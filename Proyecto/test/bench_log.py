@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+bench_log.py · Costo del log en el camino de cada transacción (applog.py)
+-------------------------------------------------------------------------
+• Micro: ns por línea desde el hilo que registra, escribiendo a un archivo:
+      print_flush  → print(..., flush=True) (lo que hacían los servidores)
+      log_queued   → LOG.debug() con nivel debug (se encola; escribe el hilo de fondo)
+                     y log_drained: lo mismo hasta que el hilo terminó de escribir
+      log_filtered → LOG.debug() con nivel info (sólo entra al anillo)
+      log_limited  → LOG.warning(..., key=...) suprimido por el límite de frecuencia
+• --e2e: arranca server.py (BD local temporal) con cada --log-level, stdout a
+  un archivo o, con --sink pty, a una terminal (pty) leída por un hilo, y lo carga con el emulador de facultad de bench_wire.py. Los
+  niveles se alternan durante `--rounds` rondas y se informa la mediana de
+  tx/s, CPU del servidor por transacción y bytes de log por transacción.
+• Imprime JSON.
+
+Uso:
+    python3 test/bench_log.py --lines 200000
+    python3 test/bench_log.py --e2e --n 3000 --server-args "--ack-mode inline"
+"""
+import argparse, json, os, pathlib, pty, shlex, statistics, subprocess, sys, tempfile, threading, time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+import applog                   # noqa: E402
+from bench_wire import HERE, _cpu_s, drive   # noqa: E402
+
+LINE = "\n✉️ PROPUESTA ENVIADA: (W-3, TX:a1b2c3d4, Fac:Ingeniería)"
+
+
+def micro(lines: int) -> dict:
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix="bench_log_"))
+    out = {}
+    with open(tmp / "print.log", "w", encoding="utf-8") as f:
+        t0 = time.perf_counter_ns()
+        for _ in range(lines):
+            print(LINE, file=f, flush=True)
+        out["print_flush_ns"] = round((time.perf_counter_ns() - t0) / lines, 1)
+
+    applog.QUEUE_MAX = max(applog.QUEUE_MAX, lines)     # medir el costo, no el descarte por ráfaga
+    with open(tmp / "applog.log", "w", encoding="utf-8") as f:
+        log = applog.AppLog("debug", stream=f)
+        t0 = time.perf_counter_ns()
+        for _ in range(lines):
+            log.debug(LINE)
+        out["log_queued_ns"] = round((time.perf_counter_ns() - t0) / lines, 1)
+        log.close(timeout=30)
+        out["log_drained_ns"] = round((time.perf_counter_ns() - t0) / lines, 1)
+        out["log_queued_stats"] = log.stats()
+
+        log = applog.AppLog("info", stream=f)
+        t0 = time.perf_counter_ns()
+        for _ in range(lines):
+            log.debug(LINE)
+        out["log_filtered_ns"] = round((time.perf_counter_ns() - t0) / lines, 1)
+
+        t0 = time.perf_counter_ns()
+        for _ in range(lines):
+            log.warning(LINE, key="bench")
+        out["log_limited_ns"] = round((time.perf_counter_ns() - t0) / lines, 1)
+        log.close()
+    return out
+
+
+class _PtySink:
+    """Terminal falsa: el servidor escribe en el esclavo; un hilo lee el maestro y cuenta bytes."""
+
+    def __init__(self):
+        self.master, self.slave = pty.openpty()
+        self.bytes = 0
+        threading.Thread(target=self._drain, daemon=True).start()
+
+    def _drain(self):
+        try:
+            while chunk := os.read(self.master, 65536):
+                self.bytes += len(chunk)
+        except OSError:
+            pass
+
+    def size(self) -> int:
+        return self.bytes
+
+
+def _run_level(level: str, n: int, window: int, server_args: str, startup: float, sink: str) -> dict:
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix="bench_log_"))
+    env = {**os.environ, "CLASSROOM_DB_MODE": "local", "CLASSROOM_DB_PATH": str(tmp / "classroom.db")}
+    if sink == "pty":
+        out_sink = _PtySink()
+        stdout, size = out_sink.slave, out_sink.size
+    else:
+        stdout = open(tmp / "server.log", "wb")
+        size = lambda: (tmp / "server.log").stat().st_size
+    server = subprocess.Popen([sys.executable, str(HERE / "server.py"), "--role", "PRIMARY",
+                               "--peer", "127.0.0.1", "--log-level", level, *shlex.split(server_args)],
+                              cwd=HERE, env=env, stdout=stdout, stderr=subprocess.STDOUT)
+    try:
+        time.sleep(startup)
+        size0, cpu0 = size(), _cpu_s(server.pid)
+        res = drive("json", n, window, 5555)
+        res["server_cpu_us_per_tx"] = round((_cpu_s(server.pid) - cpu0) / max(1, res["done"]) * 1e6, 1)
+        time.sleep(applog.FLUSH_S * 2)
+        res["log_bytes_per_tx"] = round((size() - size0) / max(1, res["done"]), 1)
+    finally:
+        server.terminate()
+        server.wait()
+        if sink != "pty":
+            stdout.close()
+    return res
+
+
+def e2e(n: int, window: int, server_args: str, startup: float, levels: list, rounds: int, sink: str) -> dict:
+    out = {"n": n, "window": window, "rounds": rounds, "sink": sink, "server_args": server_args}
+    runs = {level: [] for level in levels}
+    for _ in range(rounds):
+        for level in levels:
+            runs[level].append(_run_level(level, n, window, server_args, startup, sink))
+    for level, results in runs.items():
+        out[level] = {key: round(statistics.median(r[key] for r in results), 1)
+                      for key in ("tx_per_s", "server_cpu_us_per_tx", "client_cpu_us_per_tx", "log_bytes_per_tx")}
+        out[level]["done"] = sum(r["done"] for r in results)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=100000)
+    ap.add_argument("--e2e", action="store_true")
+    ap.add_argument("--n", type=int, default=2000)
+    ap.add_argument("--window", type=int, default=32)
+    ap.add_argument("--server-args", default="")
+    ap.add_argument("--startup", type=float, default=3.0)
+    ap.add_argument("--levels", default="debug,info")
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--sink", choices=["file", "pty"], default="file")
+    args = ap.parse_args()
+    results = {"micro": micro(args.lines)}
+    if args.e2e:
+        results["e2e"] = e2e(args.n, args.window, args.server_args, args.startup, args.levels.split(","),
+                             args.rounds, args.sink)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
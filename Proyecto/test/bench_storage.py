@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+bench_storage.py · Throughput NFS/DELETE (conexión única) vs local/WAL (conexión por hilo)
+----------------------------------------------------------------------------------------
+• Crea una BD temporal por modo con schema.sql + semilla de datastore.
+• WORKERS hilos imitan a los workers del servidor: free_counts → allocate →
+  confirm → fail (las salas vuelven al inventario y el stock no se agota).
+• READERS hilos sólo consultan free_counts (como las propuestas).
+• Imprime ops/seg por modo en JSON.
+
+Nota: el modo "nfs" se mide aquí sobre el mismo disco que "local"; sobre un
+NFS real cada commit es más caro, así que la diferencia medida es un mínimo.
+
+Uso:
+    python3 test/bench_storage.py --workers 5 --readers 1 --seconds 5
+"""
+import argparse, json, pathlib, sys, tempfile, threading, time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import datastore  # noqa: E402
+
+
+def run_mode(mode: str, workers: int, readers: int, seconds: float) -> dict:
+    tmp = tempfile.mkdtemp(prefix=f"bench_{mode}_")
+    datastore.configure_storage(mode, pathlib.Path(tmp) / "classroom.db")
+    datastore.seed_inventory()
+    datastore.ensure_faculty(1, "Bench", datastore.SEMESTER)
+    datastore.ensure_program(1, 1, "Bench", datastore.SEMESTER)
+
+    stop = threading.Event()
+    counts = {"write_cycles": 0, "reads": 0, "denied": 0}
+    counts_lock = threading.Lock()
+
+    def writer():
+        cycles = denied = 0
+        while not stop.is_set():
+            datastore.free_counts()
+            try:
+                res_id = datastore.allocate_rooms(2, 1, 1, 1)
+            except ValueError:
+                denied += 1
+                continue
+            datastore.confirm_reservation(res_id)
+            datastore.fail_reservation(res_id)
+            cycles += 1
+        with counts_lock:
+            counts["write_cycles"] += cycles
+            counts["denied"] += denied
+
+    def reader():
+        reads = 0
+        while not stop.is_set():
+            datastore.free_counts()
+            reads += 1
+        with counts_lock:
+            counts["reads"] += reads
+
+    threads = ([threading.Thread(target=writer) for _ in range(workers)]
+               + [threading.Thread(target=reader) for _ in range(readers)])
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    datastore.configure_storage("nfs")   # cierra conexiones del modo medido
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "readers": readers,
+        "seconds": round(elapsed, 3),
+        "write_cycles_per_s": round(counts["write_cycles"] / elapsed, 1),
+        "reads_per_s": round(counts["reads"] / elapsed, 1),
+        "denied": counts["denied"],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=5)
+    ap.add_argument("--readers", type=int, default=1)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    args = ap.parse_args()
+
+    results = [run_mode(m, args.workers, args.readers, args.seconds) for m in ("nfs", "local")]
+    base = results[0]["write_cycles_per_s"] or 1.0
+    for r in results:
+        r["write_speedup_vs_nfs"] = round(r["write_cycles_per_s"] / base, 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
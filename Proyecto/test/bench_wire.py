@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+bench_wire.py · JSON vs. formato binario compacto (wire.py)
+-----------------------------------------------------------
+• Micro: para cada tipo de mensaje (SOL, PROP, ACK, RES, programa) mide
+  bytes, ns por encode y ns por decode en "json" y "bin".
+• --e2e: arranca server.py (BD local temporal) y, por cada formato, un
+  emulador de facultad (DEALER) envía `--n` SOL con `--window` en vuelo y
+  responde a cada PROP con un ACK que rechaza la propuesta (las salas vuelven
+  al inventario, así no se agota con --n grande). Los formatos se alternan
+  durante `--rounds` rondas. Mide tx/s, CPU del servidor por transacción
+  (utime+stime de /proc/<pid>/stat) y CPU del cliente.
+• Imprime JSON.
+
+Uso:
+    python3 test/bench_wire.py --iters 200000
+    python3 test/bench_wire.py --e2e --n 3000 --window 64 --server-args "--ack-mode inline"
+"""
+import argparse, json, os, pathlib, shlex, subprocess, sys, tempfile, time, uuid
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import wire  # noqa: E402
+
+HERE = pathlib.Path(__file__).resolve().parent.parent
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+
+SAMPLES = {
+    "SOL":  {"programa": "Ingeniería de Sistemas", "salones": 3, "laboratorios": 1, "tipo": "SOL",
+             "transaction_id": "a1b2c3d4", "faculty_id": 1, "program_id": 17,
+             "facultad": "Ingeniería", "semester": "2025-2"},
+    "PROP": {"tipo": "PROP", "data": {"salones_propuestos": 3, "laboratorios_propuestos": 1, "aulas_moviles": 0},
+             "transaction_id": "a1b2c3d4"},
+    "ACK":  {"tipo": "ACK", "transaction_id": "a1b2c3d4", "confirm": "ACCEPT", "facultad": "Ingeniería"},
+    "RES":  {"tipo": "RES", "status": "ACCEPTED", "salones_propuestos": 3, "laboratorios_propuestos": 1,
+             "aulas_moviles": 0, "transaction_id": "a1b2c3d4"},
+    "programa": {"programa": "Ingeniería de Sistemas", "salones": 3, "laboratorios": 1},
+}
+
+
+def _ns_per_call(fn, arg, iters: int) -> float:
+    t0 = time.perf_counter_ns()
+    for _ in range(iters):
+        fn(arg)
+    return round((time.perf_counter_ns() - t0) / iters, 1)
+
+
+def micro(iters: int) -> dict:
+    out = {}
+    for name, msg in SAMPLES.items():
+        out[name] = {}
+        for fmt in wire.FORMATS:
+            data = wire.encode(msg, fmt)
+            assert wire.decode(data) == msg, (name, fmt)
+            out[name][fmt] = {
+                "bytes": len(data),
+                "encode_ns": _ns_per_call(lambda m: wire.encode(m, fmt), msg, iters),
+                "decode_ns": _ns_per_call(wire.decode, data, iters),
+            }
+    return out
+
+
+# ──────────────────────────────────────────────────────────
+# Extremo a extremo contra server.py
+def _cpu_s(pid: int) -> float:
+    fields = pathlib.Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLK_TCK       # utime + stime
+
+
+def drive(fmt: str, n: int, window: int, port: int) -> dict:
+    import zmq
+    ctx = zmq.Context.instance()
+    sock = ctx.socket(zmq.DEALER)
+    sock.setsockopt(zmq.IDENTITY, f"bench-{fmt}-{uuid.uuid4().hex[:4]}".encode())
+    sock.connect(f"tcp://127.0.0.1:{port}")
+    time.sleep(0.3)
+    statuses: dict[str, int] = {}
+    sent = done = 0
+    t0, c0 = time.perf_counter(), time.process_time()
+
+    def send_sol():
+        nonlocal sent
+        sol = {**SAMPLES["SOL"], "transaction_id": uuid.uuid4().hex[:8], "program_id": sent + 1, "salones": 1, "laboratorios": 0}
+        sock.send_multipart([b"", wire.encode(sol, fmt)])
+        sent += 1
+
+    while sent < min(window, n):
+        send_sol()
+    while done < n:
+        if not sock.poll(10000):
+            break                                           # el servidor dejó de responder
+        msg = wire.decode(sock.recv_multipart()[-1])
+        if msg["tipo"] == "PROP":
+            ack = {"tipo": "ACK", "transaction_id": msg["transaction_id"], "confirm": "REJECT",
+                   "facultad": "Bench", "reason": "bench"}
+            sock.send_multipart([b"", wire.encode(ack, fmt)])
+            continue
+        statuses[msg.get("status")] = statuses.get(msg.get("status"), 0) + 1
+        done += 1
+        if sent < n:
+            send_sol()
+    elapsed, client_cpu = time.perf_counter() - t0, time.process_time() - c0
+    sock.close(linger=0)
+    return {"done": done, "statuses": statuses, "tx_per_s": round(done / elapsed, 1),
+            "client_cpu_us_per_tx": round(client_cpu / max(1, done) * 1e6, 1)}
+
+
+def e2e(n: int, window: int, server_args: str, startup: float, rounds: int) -> dict:
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix="bench_wire_"))
+    env = {**os.environ, "CLASSROOM_DB_MODE": "local", "CLASSROOM_DB_PATH": str(tmp / "classroom.db")}
+    server = subprocess.Popen([sys.executable, str(HERE / "server.py"), "--role", "PRIMARY", "--peer", "127.0.0.1",
+                               *shlex.split(server_args)], cwd=HERE, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    out = {"n": n, "window": window, "rounds": rounds, "server_args": server_args}
+    runs = {fmt: [] for fmt in wire.FORMATS}
+    try:
+        time.sleep(startup)
+        for _ in range(rounds):
+            for fmt in wire.FORMATS:
+                cpu0 = _cpu_s(server.pid)
+                res = drive(fmt, n, window, 5555)
+                res["server_cpu_us_per_tx"] = round((_cpu_s(server.pid) - cpu0) / max(1, res["done"]) * 1e6, 1)
+                runs[fmt].append(res)
+    finally:
+        server.terminate()
+        server.wait()
+    for fmt, results in runs.items():
+        out[fmt] = {key: round(sum(r[key] for r in results) / len(results), 1)
+                    for key in ("tx_per_s", "server_cpu_us_per_tx", "client_cpu_us_per_tx")}
+        out[fmt]["done"] = sum(r["done"] for r in results)
+        out[fmt]["statuses"] = sorted({s for r in results for s in r["statuses"]})
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iters", type=int, default=100000)
+    ap.add_argument("--e2e", action="store_true")
+    ap.add_argument("--n", type=int, default=2000)
+    ap.add_argument("--window", type=int, default=32)
+    ap.add_argument("--server-args", default="")
+    ap.add_argument("--startup", type=float, default=3.0)
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+    results = {"micro": micro(args.iters)}
+    if args.e2e:
+        results["e2e"] = e2e(args.n, args.window, args.server_args, args.startup, args.rounds)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
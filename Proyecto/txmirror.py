@@ -0,0 +1,170 @@
+"""
+TxMirror · Copia de las transacciones abiertas (PROP sin ACK) en el standby
+==========================================================================
+• Las TX entre PROP y ACK viven sólo en memoria del activo (transactions en
+  server.py, pending en serverlbb.py). Sin copia, un failover las pierde y
+  sus aulas quedan PENDING hasta que vence el lease.
+• El activo publica en un PUB propio (--mirror, MIRROR_PORT):
+      [b"TXB", epoch, json(eventos)]    lote de aperturas y cierres, en orden:
+                                        ["O", registro] / ["C", tx_id, RES final]
+      [b"TXS", epoch, json(abiertas)]   todas las abiertas, cada SYNC_S s
+  registro = tx, res_id, propuesta, identidad de la facultad (hex), nombre
+  y deadline (reloj de pared: los servidores están en máquinas distintas).
+• opened()/closed() sólo encolan el evento; un hilo los publica juntos tras
+  FLUSH_S (como applog y group_commit). Publicar cada evento al momento
+  costaba ~90 µs de CPU por TX en el worker; el lote retrasa la copia a lo
+  sumo FLUSH_S.
+• El standby (SUB al par) mantiene la copia; TXS la reemplaza entera, así
+  un mensaje perdido o un standby que arranca tarde se corrige solo.
+• Al promoverse, adopt() entrega las TX abiertas del par: el servidor las
+  registra como propias y completa o cancela cada una con el ACK que la
+  facultad reenvía (o con el timeout, nunca menor a ADOPT_GRACE_S).
+  Una TX adoptada que vence NO libera su reserva: el par pudo confirmarla
+  justo antes de caer (cierre no publicado) y fail_reservation liberaría
+  una reserva CONFIRMED. Si sigue PENDING la libera el lease.
+  replay() devuelve la RES de una TX que el par cerró pero cuya RES pudo
+  perderse en la caída (últimas DONE_MAX).
+"""
+
+import json, threading, time, uuid
+from collections import OrderedDict
+
+import zmq
+
+from applog import LOG
+
+MIRROR_PORT   = 7003     # HB 7000, replicación 7001/7002
+SYNC_S        = 1.0      # s entre copias completas (TXS)
+FLUSH_S       = 0.002    # s que el hilo junta eventos antes de publicarlos
+ADOPT_GRACE_S = 5.0      # s mínimos para que la facultad reenvíe su ACK al nuevo activo
+DONE_MAX      = 4096     # RES finales del par que se recuerdan para replay()
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+class TxMirror:
+
+    def __init__(self, ctx: zmq.Context, peer: str, is_active_fn):
+        self.ctx, self.peer, self.is_active_fn = ctx, peer, is_active_fn
+        self.epoch = uuid.uuid4().hex.encode()
+        self._lock = threading.Lock()
+        self._cv = threading.Condition(self._lock)   # despierta al hilo que publica
+        self._open: dict[str, dict] = {}             # TX abiertas propias (registros)
+        self._events: list = []                      # eventos aún no publicados
+        self._peer_lock = threading.Lock()
+        self._peer: dict[str, dict] = {}             # copia de las abiertas del par
+        self._done: OrderedDict = OrderedDict()      # tx_id → RES final del par
+        self._synced = threading.Event()             # llegó al menos un TXS del par
+        self._stats = {"opened": 0, "closed": 0, "adopted": 0, "replayed": 0}
+
+        self._pub = ctx.socket(zmq.PUB)              # sólo lo usa _publish
+        self._pub.bind(f"tcp://*:{MIRROR_PORT}")
+        threading.Thread(target=self._publish, daemon=True).start()
+        threading.Thread(target=self._follow, daemon=True).start()
+        LOG.info(f"\n🔁 ESPEJO TX: PUB en *:{MIRROR_PORT}, siguiendo a {peer}:{MIRROR_PORT}")
+
+    # ──────────────────────────────────────────────────────────
+    # Lado activo
+    def opened(self, tx_id: str, ident: bytes, res_id: int, proposal: dict, fac: str, timeout: float):
+        record = {"tx": tx_id, "res_id": res_id, "proposal": proposal, "ident": ident.hex(),
+                  "fac": fac, "deadline": time.time() + timeout}
+        with self._cv:
+            self._open[tx_id] = record
+            self._events.append(("O", record))
+            self._stats["opened"] += 1
+            self._cv.notify()
+
+    def closed(self, tx_id: str, res: dict):
+        with self._cv:
+            if self._open.pop(tx_id, None) is None:
+                return
+            self._events.append(("C", tx_id, res))
+            self._stats["closed"] += 1
+            self._cv.notify()
+
+    def hand_off(self):
+        """Al ceder el rol: las TX abiertas quedan a cargo del par (que las adoptó)."""
+        with self._lock:
+            self._open.clear()
+
+    def _publish(self):
+        # También publica el standby (TXS vacío): un activo que arranca sabe que ya tiene la copia del par.
+        next_sync = time.monotonic() + SYNC_S
+        while True:
+            with self._cv:
+                if not self._events:
+                    self._cv.wait(max(0.0, next_sync - time.monotonic()))
+                gather = bool(self._events)
+            if gather:
+                time.sleep(FLUSH_S)
+            now = time.monotonic()
+            with self._lock:
+                events, self._events = self._events, []
+                snapshot = list(self._open.values()) if now >= next_sync else None
+            if events:
+                self._pub.send_multipart([b"TXB", self.epoch, _dumps(events)])
+            if snapshot is not None:
+                self._pub.send_multipart([b"TXS", self.epoch, _dumps(snapshot)])
+                next_sync = now + SYNC_S
+
+    # ──────────────────────────────────────────────────────────
+    # Lado standby
+    def _follow(self):
+        sub = self.ctx.socket(zmq.SUB)
+        sub.connect(f"tcp://{self.peer}:{MIRROR_PORT}")
+        sub.setsockopt(zmq.SUBSCRIBE, b"TX")
+        while True:
+            kind, epoch, *body = sub.recv_multipart()
+            if epoch == self.epoch or self.is_active_fn():
+                continue                                  # --peer apunta a este mismo servidor / ya es el dueño
+            try:
+                with self._peer_lock:
+                    if kind == b"TXB":
+                        for event in json.loads(body[0]):
+                            if event[0] == "O":
+                                self._peer[event[1]["tx"]] = event[1]
+                            else:
+                                self._peer.pop(event[1], None)
+                                self._done[event[1]] = event[2]
+                        while len(self._done) > DONE_MAX:
+                            self._done.popitem(last=False)
+                    elif kind == b"TXS":
+                        self._peer = {r["tx"]: r for r in json.loads(body[0])}
+                        self._synced.set()
+            except (ValueError, KeyError, IndexError) as e:
+                LOG.warning(f"\n⚠️ ESPEJO TX: mensaje {kind!r} del par ilegible: {e!r}", key="espejo")
+
+    def adopt(self) -> list[tuple]:
+        """
+        TX abiertas del par como (tx_id, ident, res_id, propuesta, facultad,
+        timeout restante). Si aún no llegó ninguna copia completa del par se
+        espera hasta 2·SYNC_S (sólo ocurre al arrancar).
+        """
+        self._synced.wait(2 * SYNC_S)
+        now = time.time()
+        with self._peer_lock:
+            records, self._peer = list(self._peer.values()), {}
+        adopted = [(r["tx"], bytes.fromhex(r["ident"]), r["res_id"], r["proposal"], r["fac"],
+                    max(r["deadline"] - now, ADOPT_GRACE_S)) for r in records]
+        with self._lock:
+            self._stats["adopted"] += len(adopted)
+        if adopted:
+            LOG.info(f"\n🔁 ESPEJO TX: {len(adopted)} transacciones abiertas del par adoptadas.")
+        return adopted
+
+    def replay(self, tx_id: str) -> dict | None:
+        """RES final de una TX que el par cerró antes de caer, o None."""
+        with self._peer_lock:
+            res = self._done.get(tx_id)
+        if res is not None:
+            with self._lock:
+                self._stats["replayed"] += 1
+        return res
+
+    def stats(self) -> dict:
+        with self._peer_lock:
+            peer_open = len(self._peer)
+        with self._lock:
+            return {**self._stats, "open": len(self._open), "peer_open": peer_open}
@@ -0,0 +1,184 @@
+"""
+Wire · Formato binario compacto para SOL / PROP / ACK / RES
+===========================================================
+• Un mensaje binario empieza con el byte de versión 0xB1 (nunca inicia un
+  JSON válido), seguido de:
+      código de tipo (1 B) · máscara de campos presentes (2 B, LE)
+      enteros presentes (int32 LE) · largos de los strings presentes (uint16 LE)
+      bytes UTF-8 de los strings, concatenados
+  Los campos de cada tipo tienen un orden fijo (_SCHEMAS): no viajan claves.
+• Si un mensaje no encaja en su esquema (clave extra, tipo de valor distinto,
+  entero fuera de int32, tipo desconocido) se envía como JSON.
+• decode() acepta ambos formatos. Negotiator recuerda qué formato usó cada
+  par y le responde en el mismo, así los clientes JSON siguen funcionando;
+  un cliente pasa a binario con --wire bin (o CLASSROOM_WIRE=bin).
+"""
+
+import json, os, struct, threading
+from collections import OrderedDict
+from operator import itemgetter
+
+VERSION = 0xB1
+DEFAULT_FORMAT = os.environ.get("CLASSROOM_WIRE", "json")    # "json" | "bin"
+FORMATS = ("json", "bin")
+
+# tipo → (código, campos int, campos str, clave que anida los int o None)
+_SCHEMAS = {
+    "SOL":  (1, ("salones", "laboratorios", "faculty_id", "program_id"),
+                ("transaction_id", "programa", "facultad", "semester"), None),
+    "PROP": (2, ("salones_propuestos", "laboratorios_propuestos", "aulas_moviles"),
+                ("transaction_id",), "data"),
+    "ACK":  (3, (), ("transaction_id", "confirm", "facultad", "reason"), None),
+    "RES":  (4, ("salones_propuestos", "laboratorios_propuestos", "aulas_moviles"),
+                ("status", "transaction_id", "reason"), None),
+    None:   (5, ("salones", "laboratorios"), ("programa",), None),    # programa → facultad
+}
+_BY_CODE = {code: (tipo, ints, strs, nested) for tipo, (code, ints, strs, nested) in _SCHEMAS.items()}
+_HEADER = struct.Struct("<BBH")
+
+
+class _Plan:
+    """Campos presentes de un (tipo, máscara): struct del cuerpo y getters precalculados."""
+    __slots__ = ("tipo", "nested", "ints", "strs", "header", "body", "int_keys", "get_ints", "get_strs")
+
+    def __init__(self, code: int, mask: int):
+        self.tipo, all_ints, all_strs, self.nested = _BY_CODE[code]
+        if mask >> (len(all_ints) + len(all_strs)):
+            raise KeyError(f"máscara {mask:#x}")
+        self.ints = tuple(n for i, n in enumerate(all_ints) if mask >> i & 1)
+        self.strs = tuple(n for j, n in enumerate(all_strs) if mask >> (len(all_ints) + j) & 1)
+        self.header = _HEADER.pack(VERSION, code, mask)
+        self.body = struct.Struct("<" + "i" * len(self.ints) + "H" * len(self.strs))
+        self.int_keys = frozenset(self.ints)
+        self.get_ints = _getter(self.ints)
+        self.get_strs = _getter(self.strs)
+
+
+def _getter(names: tuple):
+    if not names:
+        return lambda d: ()
+    if len(names) == 1:
+        return lambda d, _n=names[0]: (d[_n],)
+    return itemgetter(*names)
+
+
+_BY_MASK: dict[tuple[int, int], _Plan] = {}         # (código, máscara) → plan (decode)
+_BY_KEYS: dict[tuple, _Plan | None] = {}           # (tipo, claves, claves anidadas) → plan o None (encode)
+_MAX_SHAPES = 256                                  # tope de formas de mensaje cacheadas
+_MAX_PEERS = 4096                                  # tope de pares que recuerda un Negotiator (LRU)
+
+
+def _plan_for_keys(tipo, keys: frozenset, nested_keys: frozenset) -> _Plan | None:
+    schema = _SCHEMAS.get(tipo)
+    if schema is None:
+        return None
+    code, ints, strs, nested = schema
+    top = keys - {"tipo"} if tipo is not None else keys
+    if nested:
+        if nested not in top or not nested_keys <= set(ints):
+            return None
+        top = top - {nested}
+        present_ints = nested_keys
+    else:
+        present_ints = top & set(ints)
+    if not top - present_ints <= set(strs) or (tipo is not None and "tipo" not in keys):
+        return None                                   # claves fuera del esquema
+    mask = sum(1 << i for i, n in enumerate(ints) if n in present_ints)
+    mask |= sum(1 << (len(ints) + j) for j, n in enumerate(strs) if n in top)
+    return _plan(code, mask)
+
+
+def _plan(code: int, mask: int) -> _Plan:
+    plan = _BY_MASK.get((code, mask))
+    if plan is None:
+        plan = _BY_MASK[(code, mask)] = _Plan(code, mask)
+    return plan
+
+
+def _encode_bin(msg: dict) -> bytes | None:
+    """Bytes del mensaje en binario, o None si no encaja en su esquema."""
+    tipo = msg.get("tipo")
+    nested = _SCHEMAS[tipo][3] if tipo in _SCHEMAS else None
+    int_src = msg.get(nested) if nested else msg
+    if type(int_src) is not dict:
+        return None
+    cache_key = (tipo, frozenset(msg), frozenset(int_src) if nested else None)
+    plan = _BY_KEYS.get(cache_key, False)
+    if plan is False:
+        plan = _plan_for_keys(tipo, cache_key[1], cache_key[2] or frozenset())
+        if len(_BY_KEYS) < _MAX_SHAPES:
+            _BY_KEYS[cache_key] = plan
+    if plan is None:
+        return None
+    ints = plan.get_ints(int_src)
+    for v in ints:
+        if type(v) is not int:
+            return None
+    try:
+        blobs = [v.encode("utf-8") for v in plan.get_strs(msg)]
+        return plan.header + plan.body.pack(*ints, *map(len, blobs)) + b"".join(blobs)
+    except (AttributeError, struct.error):
+        return None                                   # valor no-str, int fuera de int32 o str > 64 KiB
+
+
+def encode(msg: dict, fmt: str = DEFAULT_FORMAT) -> bytes:
+    if fmt == "bin":
+        data = _encode_bin(msg)
+        if data is not None:
+            return data
+    return json.dumps(msg).encode("utf-8")
+
+
+def is_binary(data: bytes) -> bool:
+    return data[:1] == b"\xb1"
+
+
+def decode(data: bytes) -> dict:
+    """dict del mensaje (binario o JSON). Errores: ValueError / UnicodeDecodeError."""
+    if not is_binary(data):
+        return json.loads(data)
+    try:
+        _, code, mask = _HEADER.unpack_from(data)
+        plan = _plan(code, mask)
+        values = plan.body.unpack_from(data, _HEADER.size)
+    except (KeyError, struct.error) as e:
+        raise ValueError(f"mensaje binario inválido: {e!r}") from None
+    n_int = len(plan.ints)
+    msg = {} if plan.tipo is None else {"tipo": plan.tipo}
+    int_values = dict(zip(plan.ints, values))
+    if plan.nested:
+        msg[plan.nested] = int_values
+    else:
+        msg.update(int_values)
+    pos = _HEADER.size + plan.body.size
+    for name, size in zip(plan.strs, values[n_int:]):
+        msg[name] = data[pos:pos + size].decode("utf-8")
+        pos += size
+    if pos != len(data):
+        raise ValueError("mensaje binario inválido: largo inconsistente")
+    return msg
+
+
+class Negotiator:
+    """
+    Recuerda el formato que usó cada par (p. ej. identidad ZMQ) y le responde
+    en el mismo. Guarda los _MAX_PEERS pares más recientes: facultylbb abre un
+    REQ (identidad nueva) por transacción y el mapa crecería sin límite. Un
+    par olvidado recibe JSON hasta su próximo mensaje.
+    """
+
+    def __init__(self):
+        self._fmt: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def decode(self, peer, data: bytes) -> dict:
+        fmt = "bin" if is_binary(data) else "json"
+        with self._lock:
+            self._fmt[peer] = fmt
+            self._fmt.move_to_end(peer)
+            if len(self._fmt) > _MAX_PEERS:
+                self._fmt.popitem(last=False)
+        return decode(data)
+
+    def encode(self, peer, msg: dict) -> bytes:
+        return encode(msg, self._fmt.get(peer, "json"))